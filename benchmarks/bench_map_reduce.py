@@ -0,0 +1,108 @@
+"""長文記事の要約レイテンシ比較: 単一プロンプト vs 分割要約（map-reduce）
+
+実行: python benchmarks/bench_map_reduce.py [--sizes 10000,40000,80000] [--time-scale 0.05]
+
+Gemini を呼ばずに、入力長に応じて遅延する疑似モデルで実時間を計測する。
+疑似モデルの遅延 = 基本遅延 + 入力1文字あたりの処理時間 + 入力長の2乗に比例する項 + 出力生成時間。
+実環境の値は --base/--per-char/--quadratic/--output-chars/--per-output-char で合わせる。
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+
+from app.gemini_client import GeminiClient  # noqa: E402
+
+
+class _FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """入力長に応じて遅延する疑似 generate_content"""
+
+    def __init__(self, base, per_char, quadratic, output_chars, per_output_char, time_scale):
+        self.base = base
+        self.per_char = per_char
+        self.quadratic = quadratic
+        self.output_chars = output_chars
+        self.per_output_char = per_output_char
+        self.time_scale = time_scale
+        self.calls = 0
+
+    def latency(self, prompt_len: int) -> float:
+        return (
+            self.base
+            + self.per_char * prompt_len
+            + self.quadratic * prompt_len ** 2
+            + self.per_output_char * self.output_chars
+        )
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        time.sleep(self.latency(len(prompt)) * self.time_scale)
+        return _FakeResponse("- 要点\n" * max(1, self.output_chars // 6))
+
+
+def make_document(size: int) -> str:
+    """見出し・段落・コードを含む研究ノート風の本文を生成"""
+    parts = []
+    i = 0
+    while sum(len(p) for p in parts) < size:
+        i += 1
+        parts.append(f"## {i}. 実験セクション\n")
+        parts.append("本節では提案手法の評価設定と結果を述べる。" * 20 + "\n\n")
+        parts.append("- 精度: 0.9%d\n- 損失: 0.0%d\n\n" % (i % 10, i % 7))
+        if i % 3 == 0:
+            parts.append("```python\nfor epoch in range(10):\n    train(model)\n```\n\n")
+    return "".join(parts)[:size]
+
+
+def run_once(client: GeminiClient, body: str, map_reduce: bool) -> float:
+    client.map_reduce_threshold = 1 if map_reduce else 0
+    start = time.perf_counter()
+    client.summarize("ベンチマーク記事", body, "bench", "medium", "bullet")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,40000,80000,160000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=8000)
+    parser.add_argument("--parallelism", type=int, default=4)
+    parser.add_argument("--base", type=float, default=0.4, help="1呼び出しの基本遅延(秒)")
+    parser.add_argument("--per-char", type=float, default=2e-5, help="入力1文字あたりの遅延(秒)")
+    parser.add_argument("--quadratic", type=float, default=2e-10, help="入力長の2乗に比例する遅延係数")
+    parser.add_argument("--output-chars", type=int, default=400)
+    parser.add_argument("--per-output-char", type=float, default=4e-3, help="出力1文字あたりの生成時間(秒)")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="実際に待つ時間の倍率（1.0で等倍）")
+    args = parser.parse_args()
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    client = GeminiClient()
+    model = FakeModel(args.base, args.per_char, args.quadratic, args.output_chars,
+                      args.per_output_char, args.time_scale)
+    client.model = model
+    client.chunk_size = args.chunk_size
+    client.map_parallelism = args.parallelism
+
+    print(f"{'size':>8} {'single(s)':>10} {'map-reduce(s)':>14} {'speedup':>8} {'calls(mr)':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        body = make_document(size)
+        single = statistics.median(run_once(client, body, False) for _ in range(args.repeat))
+        model.calls = 0
+        mr = statistics.median(run_once(client, body, True) for _ in range(args.repeat))
+        calls = model.calls // args.repeat
+        # time-scale を戻して実時間換算で表示
+        single_real, mr_real = single / args.time_scale, mr / args.time_scale
+        print(f"{size:>8} {single_real:>10.2f} {mr_real:>14.2f} {single_real / mr_real:>8.2f} {calls:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""esa URL 抽出のマイクロベンチマーク: 従来の多段処理 vs 1回走査の抽出器
+
+実行: python benchmarks/bench_url_extractor.py [--fixtures benchmarks/fixtures/esa_notifications.json] [--rounds 2000]
+
+監視チャンネルに届く全メッセージで走る処理なので、esa の通知・人間の発言・他アプリの通知を
+混ぜたイベント群を繰り返し処理して1イベントあたりの時間を比べる。
+両者が同じ記事集合を返すことも確認する。
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+
+from app.url_extractor import scan_event  # noqa: E402
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "esa_notifications.json")
+
+
+# --- 従来の実装（SlackBot._extract_text_from_blocks / _collect_esa_urls 相当） ---
+
+def _legacy_clean(url):
+    url = url.split('|', 1)[0]
+    return url.strip('<>').rstrip(')')
+
+
+def _legacy_is_post(url):
+    return bool(re.search(r'https?://[^/\s]+\.esa\.io/posts/\d+', url))
+
+
+def _legacy_normalize(url):
+    match = re.search(r'(https?://[^/\s]+\.esa\.io/posts/\d+)', url)
+    return match.group(1) if match else url
+
+
+def _legacy_text_from_blocks(blocks):
+    texts = []
+    for block in blocks or []:
+        if block.get('type') == 'rich_text':
+            for el in block.get('elements', []):
+                if el.get('type') == 'rich_text_section':
+                    for sub in el.get('elements', []):
+                        if sub.get('type') == 'text':
+                            texts.append(sub.get('text', ''))
+                        elif sub.get('type') == 'link' and sub.get('url'):
+                            texts.append(sub.get('url', ''))
+        elif block.get('type') == 'section' and 'text' in block:
+            texts.append(block['text'].get('text', ''))
+    return ' '.join(texts).strip()
+
+
+def _legacy_add(urls, value):
+    for raw in re.findall(r'https?://[^\s>]+', value):
+        clean = _legacy_clean(raw)
+        if _legacy_is_post(clean):
+            urls.add(_legacy_normalize(clean))
+
+
+def legacy_extract(event):
+    text = event.get('text', '')
+    if not text and 'blocks' in event:
+        text = _legacy_text_from_blocks(event.get('blocks', [])) or text
+    urls = set()
+    _legacy_add(urls, text or "")
+    for block in event.get('blocks') or []:
+        if block.get('type') == 'rich_text':
+            for el in block.get('elements', []):
+                if el.get('type') == 'rich_text_section':
+                    for sub in el.get('elements', []):
+                        if sub.get('type') == 'link' and sub.get('url'):
+                            clean = _legacy_clean(sub.get('url', ''))
+                            if _legacy_is_post(clean):
+                                urls.add(_legacy_normalize(clean))
+                        elif sub.get('type') == 'text':
+                            _legacy_add(urls, sub.get('text', ''))
+        elif block.get('type') == 'section' and 'text' in block:
+            _legacy_add(urls, block['text'].get('text', ''))
+    for att in event.get('attachments') or []:
+        for key in ["original_url", "title_link", "from_url", "fallback", "text"]:
+            val = att.get(key)
+            if isinstance(val, str):
+                _legacy_add(urls, val)
+    return {re.sub(r'[)>]$', '', url) for url in urls}
+
+
+def new_extract(event):
+    return {post.url for post in scan_event(event).posts}
+
+
+def bench(fn, events, rounds, repeats):
+    per_event = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for event in events:
+                fn(event)
+        per_event.append((time.perf_counter() - start) / (rounds * len(events)) * 1e6)
+    return statistics.median(per_event)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="イベントのJSON配列")
+    parser.add_argument("--rounds", type=int, default=2000, help="1計測でイベント群を処理する回数")
+    parser.add_argument("--repeats", type=int, default=5, help="計測回数（中央値を報告）")
+    args = parser.parse_args()
+
+    with open(args.fixtures, encoding="utf-8") as f:
+        events = json.load(f)
+
+    for event in events:
+        legacy, new = legacy_extract(event), new_extract(event)
+        if legacy != new:
+            raise SystemExit(f"抽出結果が一致しません: legacy={sorted(legacy)} new={sorted(new)}")
+
+    legacy_us = bench(legacy_extract, events, args.rounds, args.repeats)
+    new_us = bench(new_extract, events, args.rounds, args.repeats)
+    print(f"イベント数: {len(events)} (記事URLを含む: {sum(1 for e in events if new_extract(e))})")
+    print(f"{'実装':<12}{'μs/イベント':>14}")
+    print(f"{'legacy':<12}{legacy_us:>14.2f}")
+    print(f"{'scan_event':<12}{new_us:>14.2f}")
+    print(f"高速化: x{legacy_us / new_us:.2f}")
+
+
+if __name__ == "__main__":
+    main()
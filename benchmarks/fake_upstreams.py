@@ -0,0 +1,246 @@
+"""負荷試験用のローカル疑似サーバ（esa posts API / Gemini generateContent / Slack Web API）
+
+それぞれ ThreadingHTTPServer をデーモンスレッドで動かし、応答ごとに遅延分布からの待ち時間と
+一定確率のエラー（esa・Gemini は 503、Slack は 429 ratelimited）を挟む。
+Bot 側は ESA_API_BASE / GEMINI_API_ENDPOINT / SLACK_API_URL をこれらの url に向ける。
+"""
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+_ESA_POST_PATH = re.compile(r"^/v1/teams/([^/]+)/posts/(\d+)$")
+_GEMINI_PATH = re.compile(r"^/v1beta/models/([^:]+):(generateContent|streamGenerateContent)")
+_SLACK_PATH = re.compile(r"^/api/([\w.]+)")
+
+
+class LatencyModel:
+    """応答遅延の分布
+
+    書式: "0.1"（固定）, "const:0.1", "uniform:0.05:0.3", "exp:0.2"（平均）,
+    "lognormal:0.2:0.5"（中央値, σ）。単位は秒。
+    """
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        parts = spec.split(":")
+        kind = parts[0] if len(parts) > 1 else "const"
+        values = [float(v) for v in (parts[1:] if len(parts) > 1 else parts)]
+        if kind == "const" and len(values) == 1:
+            self._sample = lambda: values[0]
+        elif kind == "uniform" and len(values) == 2:
+            self._sample = lambda: random.uniform(values[0], values[1])
+        elif kind == "exp" and len(values) == 1:
+            self._sample = lambda: random.expovariate(1.0 / values[0]) if values[0] > 0 else 0.0
+        elif kind == "lognormal" and len(values) == 2:
+            self._sample = lambda: random.lognormvariate(math.log(values[0]), values[1]) if values[0] > 0 else 0.0
+        else:
+            raise ValueError(f"遅延分布の指定が不正です: {spec}")
+
+    def sample(self) -> float:
+        return max(0.0, self._sample())
+
+    def __repr__(self):
+        return self.spec
+
+
+class FakeUpstream:
+    """疑似サーバの共通部分（起動・停止・遅延とエラーの注入・呼び出し回数の集計）"""
+
+    name = "upstream"
+
+    def __init__(self, latency: str = "0", error_rate: float = 0.0):
+        self.latency = LatencyModel(latency)
+        self.error_rate = error_rate
+        self.calls: Dict[str, int] = {}
+        self.errors = 0
+        self._lock = threading.Lock()
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                upstream._handle(self, "GET")
+
+            def do_POST(self):
+                upstream._handle(self, "POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, name=f"fake-{self.name}", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self) -> "FakeUpstream":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"calls": dict(self.calls), "injected_errors": self.errors, "latency": self.latency.spec}
+
+    def _handle(self, request: BaseHTTPRequestHandler, verb: str):
+        length = int(request.headers.get("Content-Length") or 0)
+        body = request.rfile.read(length) if length else b""
+        path = request.path.split("?", 1)[0]
+        time.sleep(self.latency.sample())
+        fail = self.error_rate > 0 and random.random() < self.error_rate
+        status, headers, payload = self.respond(verb, path, request.headers, body, fail)
+        with self._lock:
+            key = self.call_name(path)
+            self.calls[key] = self.calls.get(key, 0) + 1
+            if fail:
+                self.errors += 1
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json; charset=utf-8")
+        request.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(data)
+
+    def call_name(self, path: str) -> str:
+        return path
+
+    def respond(self, verb: str, path: str, headers, body: bytes, fail: bool):
+        """(ステータス, 追加ヘッダ, JSON) を返す"""
+        raise NotImplementedError
+
+
+class FakeEsa(FakeUpstream):
+    """esa の記事取得 API（どの記事番号にもフィクスチャの記事を番号だけ変えて返す）"""
+
+    name = "esa"
+
+    def __init__(self, latency: str = "0", error_rate: float = 0.0):
+        super().__init__(latency, error_rate)
+        with open(os.path.join(FIXTURES, "esa_post.json"), encoding="utf-8") as f:
+            self.template = json.load(f)
+
+    def call_name(self, path: str) -> str:
+        return "posts"
+
+    def respond(self, verb, path, headers, body, fail):
+        match = _ESA_POST_PATH.match(path)
+        if not match:
+            return 404, {}, {"error": "not_found", "message": "Not found"}
+        if fail:
+            return 503, {}, {"error": "service_unavailable", "message": "Service Unavailable"}
+        number = int(match.group(2))
+        post = dict(self.template, number=number, name=f"{self.template['name']} #{number}")
+        etag = f'W/"{number}-{post["revision_number"]}"'
+        # レート制限には掛からないよう十分な残数を返す（制限の扱いは EsaClient 側のテストで確認する）
+        limit_headers = {
+            "ETag": etag,
+            "X-RateLimit-Limit": "1000000",
+            "X-RateLimit-Remaining": "1000000",
+            "X-RateLimit-Reset": str(int(time.time()) + 900),
+        }
+        if headers.get("If-None-Match") == etag:
+            return 304, limit_headers, {}
+        return 200, limit_headers, post
+
+
+class FakeGemini(FakeUpstream):
+    """Gemini の generateContent / streamGenerateContent（REST）"""
+
+    name = "gemini"
+
+    def __init__(self, latency: str = "0", error_rate: float = 0.0, stream_chunks: int = 4):
+        super().__init__(latency, error_rate)
+        with open(os.path.join(FIXTURES, "summary.md"), encoding="utf-8") as f:
+            self.summary = f.read()
+        self.stream_chunks = max(1, stream_chunks)
+
+    def call_name(self, path: str) -> str:
+        match = _GEMINI_PATH.match(path)
+        return match.group(2) if match else path
+
+    def respond(self, verb, path, headers, body, fail):
+        match = _GEMINI_PATH.match(path)
+        if not match:
+            return 404, {}, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}}
+        if fail:
+            return 503, {}, {"error": {"code": 503, "message": "The model is overloaded.", "status": "UNAVAILABLE"}}
+        if match.group(2) == "generateContent":
+            return 200, {}, self._candidate(self.summary)
+        # ストリーミングは応答の配列として返す（REST トランスポートの形式）
+        size = math.ceil(len(self.summary) / self.stream_chunks)
+        parts = [self.summary[i:i + size] for i in range(0, len(self.summary), size)]
+        return 200, {}, [self._candidate(part) for part in parts]
+
+    def _candidate(self, text: str) -> Dict:
+        return {
+            "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": 0, "candidatesTokenCount": 0, "totalTokenCount": 0},
+        }
+
+
+class FakeSlack(FakeUpstream):
+    """Slack Web API（auth.test / chat.postMessage / chat.update / conversations.info）
+
+    chat.postMessage と chat.update の受信時に on_message(method, channel, text, received_at) を呼ぶ。
+    """
+
+    name = "slack"
+
+    def __init__(self, latency: str = "0", error_rate: float = 0.0,
+                 on_message: Optional[Callable[[str, str, str, float], None]] = None):
+        super().__init__(latency, error_rate)
+        self.on_message = on_message
+        self.bot_user_id = "UFAKEBOT"
+        self._ts = 0
+        self.messages: List[Dict] = []
+
+    def call_name(self, path: str) -> str:
+        match = _SLACK_PATH.match(path)
+        return match.group(1) if match else path
+
+    def respond(self, verb, path, headers, body, fail):
+        method = self.call_name(path)
+        if fail and method in ("chat.postMessage", "chat.update"):
+            return 429, {"Retry-After": "1"}, {"ok": False, "error": "ratelimited"}
+        args = self._parse_args(headers, body)
+        if method == "auth.test":
+            return 200, {}, {"ok": True, "user_id": self.bot_user_id, "bot_id": "BFAKEBOT", "team_id": "TFAKE"}
+        if method == "conversations.info":
+            channel = args.get("channel", "")
+            return 200, {}, {"ok": True, "channel": {"id": channel, "name": channel.lower(), "is_member": True}}
+        if method in ("chat.postMessage", "chat.update"):
+            channel = args.get("channel", "")
+            with self._lock:
+                if method == "chat.postMessage":
+                    self._ts += 1
+                    ts = f"{int(time.time())}.{self._ts:06d}"
+                else:
+                    ts = args.get("ts", "")
+            if self.on_message:
+                self.on_message(method, channel, args.get("text") or "", time.monotonic())
+            return 200, {}, {"ok": True, "channel": channel, "ts": ts, "message": {"text": args.get("text", "")}}
+        return 200, {}, {"ok": True}
+
+    def _parse_args(self, headers, body: bytes) -> Dict:
+        if not body:
+            return {}
+        if "json" in (headers.get("Content-Type") or ""):
+            return json.loads(body.decode("utf-8"))
+        return {k: v[0] for k, v in parse_qs(body.decode("utf-8")).items()}
@@ -0,0 +1,411 @@
+"""esa 通知の負荷試験: ローカルの疑似サーバを相手に SlackBot の実際のイベントハンドラを動かす
+
+実行:
+    python benchmarks/load_test.py --rate 120 --duration 60
+    python benchmarks/load_test.py --rate 600 --duration 30 --gemini-latency lognormal:1.5:0.4 --gemini-error-rate 0.02
+    python benchmarks/load_test.py --events benchmarks/fixtures/esa_notifications.json --rate 60 --json load.json
+    python benchmarks/load_test.py --async --rate 600 --duration 30
+
+esa posts API・Gemini generateContent・Slack Web API は benchmarks/fake_upstreams.py の疑似サーバが応答し、
+ネットワーク・APIキーは不要。イベントは Socket Mode と同じ経路（App.dispatch）で渡すので、
+重複判定・URL抽出・ワーカープール・キャッシュ・レート制限・再試行・並列投稿を含めた処理が測られる。
+報告するのはスループット、イベント受信から（最初の投稿先への）投稿までの p50/p95/p99、ジョブキューの深さ。
+
+Bot の設定は通常どおり環境変数で変えられる（例: SUMMARY_WORKER_COUNT=8 GEMINI_RPM=600 python benchmarks/load_test.py）。
+--async では asyncio 版（AsyncSlackBot）を別スレッドのイベントループで動かし、AsyncApp.async_dispatch で渡す。
+"""
+import argparse
+import asyncio
+import copy
+import json
+import math
+import os
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+
+from fake_upstreams import FakeEsa, FakeGemini, FakeSlack  # noqa: E402
+
+WATCH_CHANNEL = "CLOADWATCH"
+TEAM = "loadtest"
+_POSTED_URL_PATTERN = re.compile(r"esa: https?://\S+?/posts/(\d+)")
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """最近順位法によるパーセンタイル"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    # 値の pct% 以上を含む最小の順位（1始まり）
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class LatencyTracker:
+    """イベントの受信時刻と、要約が最初の投稿先に届いた時刻を突き合わせる"""
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self._pending: Dict[int, Deque[float]] = defaultdict(deque)
+        self._lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.first_sent: Optional[float] = None
+        self.last_done: Optional[float] = None
+        self.sent = 0
+
+    def sent_event(self, post_number: int, at: float):
+        with self._lock:
+            self._pending[post_number].append(at)
+            self.sent += 1
+            if self.first_sent is None:
+                self.first_sent = at
+
+    def on_message(self, method: str, channel: str, text: str, received_at: float):
+        # 要約本体（フォールバックテキストに記事URLを含む）だけを数え、生成中の表示は数えない
+        if channel != self.channel:
+            return
+        match = _POSTED_URL_PATTERN.search(text)
+        if not match:
+            return
+        with self._lock:
+            pending = self._pending.get(int(match.group(1)))
+            if not pending:
+                return
+            self.latencies.append(received_at - pending.popleft())
+            self.last_done = received_at
+
+    @property
+    def outstanding(self) -> int:
+        with self._lock:
+            return sum(len(q) for q in self._pending.values())
+
+
+class QueueSampler(threading.Thread):
+    """ワーカープールの待機ジョブ数・実行中ジョブ数を一定間隔で記録する"""
+
+    def __init__(self, pool, interval: float = 0.1):
+        super().__init__(name="queue-sampler", daemon=True)
+        self.pool = pool
+        self.interval = interval
+        self.depths: List[int] = []
+        self.active: List[int] = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.depths.append(self.pool.queue_depth)
+            self.active.append(self.pool.active)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def synthetic_event(post_number: int) -> Dict:
+    """esa アプリの「記事作成」通知を模したイベント"""
+    url = f"https://{TEAM}.esa.io/posts/{post_number}"
+    title = f"実験ノート/負荷試験/{post_number}"
+    return {
+        "type": "message",
+        "subtype": "bot_message",
+        "bot_id": "B01ESA0001",
+        "text": "",
+        "attachments": [{
+            "fallback": f"loadtest created <{url}|{title}>",
+            "pretext": "loadtest created a new post",
+            "title": title,
+            "title_link": url,
+            "text": "## 背景\n負荷試験用の通知です。",
+            "footer": "esa",
+        }],
+    }
+
+
+def envelope(event: Dict, index: int) -> Dict:
+    """Events API のエンベロープに包む（ts・event_id はイベントごとに変え、重複判定に掛からないようにする）"""
+    now = time.time()
+    event = dict(event, channel=WATCH_CHANNEL, ts=f"{now:.6f}{index % 10}", event_ts=f"{now:.6f}")
+    return {
+        "type": "event_callback",
+        "team_id": "TFAKE",
+        "api_app_id": "AFAKE",
+        "event": event,
+        "event_id": f"EvLOAD{index:08d}",
+        "event_time": int(now),
+    }
+
+
+def event_source(args):
+    """(イベント, 記事番号 or None) を順に返す"""
+    if args.events:
+        with open(args.events, encoding="utf-8") as f:
+            events = json.load(f)
+        from app.url_extractor import scan_event
+        index = 0
+        while True:
+            event = copy.deepcopy(events[index % len(events)])
+            posts = scan_event(event).posts
+            yield event, posts[0].number if posts else None
+            index += 1
+    number = 0
+    while True:
+        number += 1
+        post_number = (number - 1) % args.distinct_posts + 1 if args.distinct_posts else number
+        yield synthetic_event(post_number), post_number
+
+
+def configure_environment(args, esa: FakeEsa, gemini: FakeGemini, slack: FakeSlack, channels: List[str]):
+    """app を import する前に接続先と試験用の既定値を環境変数へ入れる"""
+    os.environ["ESA_API_BASE"] = f"{esa.url}/v1"
+    os.environ["GEMINI_API_ENDPOINT"] = gemini.url
+    os.environ["SLACK_API_URL"] = f"{slack.url}/api/"
+    os.environ["ESA_WATCH_CHANNEL_ID"] = WATCH_CHANNEL
+    os.environ["ESA_SUMMARY_CHANNEL_ID"] = ",".join(channels)
+    os.environ["ESA_TEAM_NAME"] = TEAM
+    os.environ["SUMMARY_STREAMING"] = "true" if args.streaming else "false"
+    os.environ["SLACK_ASYNC"] = "true" if args.use_async else "false"
+    defaults = {
+        "SLACK_BOT_TOKEN": "xoxb-loadtest",
+        "SLACK_APP_TOKEN": "xapp-loadtest",
+        "ESA_ACCESS_TOKEN": "loadtest",
+        "GEMINI_API_KEY": "loadtest",
+        # 実行のたびに前回の要約・イベントが残らないようディスク層は使わない
+        "SUMMARY_CACHE_PATH": "",
+        "EVENT_DEDUP_PATH": "",
+        "SLACK_AUTH_CACHE_PATH": "",
+        "SUMMARY_JOB_QUEUE_PATH": "",
+        "SUMMARY_SNAPSHOT_PATH": "",
+        "LOG_LEVEL": "WARNING",
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+
+
+def run(args) -> Dict:
+    channels = [f"CLOADSUM{i + 1}" for i in range(args.channels)]
+    tracker = LatencyTracker(channels[0])
+    esa = FakeEsa(args.esa_latency, args.esa_error_rate).start()
+    gemini = FakeGemini(args.gemini_latency, args.gemini_error_rate).start()
+    slack = FakeSlack(args.slack_latency, args.slack_error_rate, on_message=tracker.on_message).start()
+    configure_environment(args, esa, gemini, slack, channels)
+
+    if args.use_async:
+        bot, pool, dispatch, shutdown = _start_async_bot()
+    else:
+        bot, pool, dispatch, shutdown = _start_bot()
+    sampler = QueueSampler(pool)
+    sampler.start()
+    interval = 60.0 / args.rate
+    source = event_source(args)
+    dispatched = 0
+    start = time.monotonic()
+    next_at = start
+    while time.monotonic() - start < args.duration:
+        now = time.monotonic()
+        if next_at > now:
+            time.sleep(next_at - now)
+        event, post_number = next(source)
+        sent_at = time.monotonic()
+        if post_number is not None:
+            tracker.sent_event(post_number, sent_at)
+        dispatch(envelope(event, dispatched))
+        dispatched += 1
+        # ポアソン到着（指数分布の間隔）か一定間隔
+        next_at += random.expovariate(1.0 / interval) if args.arrival == "poisson" else interval
+    send_end = time.monotonic()
+
+    # 送信を止めてから、残りの要約が投稿されるかタイムアウトまで待つ
+    deadline = send_end + args.drain_timeout
+    while tracker.outstanding and time.monotonic() < deadline:
+        time.sleep(0.05)
+    sampler.stop()
+    shutdown()
+    esa.stop()
+    gemini.stop()
+    slack.stop()
+
+    latencies = tracker.latencies
+    completed = len(latencies)
+    window = (tracker.last_done - tracker.first_sent) if completed and tracker.first_sent is not None else 0.0
+    return {
+        "config": {
+            "rate_per_min": args.rate,
+            "duration": args.duration,
+            "arrival": args.arrival,
+            "channels": args.channels,
+            "streaming": args.streaming,
+            "async": args.use_async,
+            "events": args.events or "synthetic",
+            "workers": pool.workers,
+            "queue_size": pool.queue_size,
+        },
+        "events": {
+            "dispatched": dispatched,
+            "with_post": tracker.sent,
+            "completed": completed,
+            "unfinished": tracker.outstanding,
+            "rejected": pool.rejected,
+            "send_seconds": round(send_end - start, 3),
+        },
+        "throughput_per_min": round(completed / window * 60, 2) if window > 0 else None,
+        "latency_seconds": {
+            "p50": _round(percentile(latencies, 50)),
+            "p95": _round(percentile(latencies, 95)),
+            "p99": _round(percentile(latencies, 99)),
+            "max": _round(max(latencies) if latencies else None),
+            "mean": _round(statistics.mean(latencies) if latencies else None),
+        },
+        "queue_depth": {
+            "max": max(sampler.depths, default=0),
+            "mean": round(statistics.mean(sampler.depths), 2) if sampler.depths else 0,
+            "p95": percentile(sampler.depths, 95) or 0,
+            "max_active": max(sampler.active, default=0),
+        },
+        "upstreams": {"esa": esa.stats(), "gemini": gemini.stats(), "slack": slack.stats()},
+        "breakers": {name: b.snapshot() for name, b in bot.breakers.items()},
+    }
+
+
+def _start_bot():
+    """スレッド版の SlackBot（イベントは App.dispatch で渡す）"""
+    from slack_bolt.request import BoltRequest
+    from app.slack_handler import SlackBot
+
+    bot = SlackBot()
+    bot._authenticate()
+
+    def dispatch(body: Dict):
+        bot.app.dispatch(BoltRequest(body=body, mode="socket_mode"))
+
+    return bot, QueuedJobs(bot), dispatch, lambda: bot.shutdown(timeout=1.0)
+
+
+class QueuedJobs:
+    """SlackBot のワーカープールとジョブキューを合わせて読む（待機数はジョブキューの実行待ち件数）"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.workers = bot.worker_pool.workers
+        self.queue_size = bot.worker_pool.queue_size
+
+    @property
+    def queue_depth(self) -> int:
+        return self.bot.job_queue.ready_count()
+
+    @property
+    def active(self) -> int:
+        return self.bot.worker_pool.active
+
+    @property
+    def rejected(self) -> int:
+        return self.bot.worker_pool.rejected
+
+
+class AsyncTasks:
+    """AsyncSlackBot の実行中タスクを WorkerPool と同じ名前で読む（待機キューは無いので深さは常に 0）"""
+
+    queue_depth = 0
+    queue_size = 0
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.workers = bot.max_in_flight
+
+    @property
+    def active(self) -> int:
+        return len(self.bot._tasks)
+
+    @property
+    def rejected(self) -> int:
+        return self.bot.rejected
+
+
+def _start_async_bot():
+    """asyncio 版の AsyncSlackBot（別スレッドのイベントループで動かし、async_dispatch で渡す）"""
+    from slack_bolt.request.async_request import AsyncBoltRequest
+    from app.async_slack_handler import AsyncSlackBot
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="bot-loop", daemon=True).start()
+    bot = AsyncSlackBot()
+    asyncio.run_coroutine_threadsafe(bot._authenticate(), loop).result()
+
+    def dispatch(body: Dict):
+        request = AsyncBoltRequest(body=body, mode="socket_mode")
+        asyncio.run_coroutine_threadsafe(bot.app.async_dispatch(request), loop).result()
+
+    def shutdown():
+        asyncio.run_coroutine_threadsafe(bot.shutdown(timeout=1.0), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    return bot, AsyncTasks(bot), dispatch, shutdown
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 3) if value is not None else None
+
+
+def print_report(report: Dict):
+    config, events, latency, depth = report["config"], report["events"], report["latency_seconds"], report["queue_depth"]
+    print(f"負荷: {config['rate_per_min']}件/分 × {config['duration']}秒 ({config['arrival']}, {config['events']}) "
+          f"{'async max_in_flight' if config['async'] else 'workers'}={config['workers']} queue={config['queue_size']} "
+          f"channels={config['channels']}")
+    print(f"イベント: 送信 {events['dispatched']} / 記事あり {events['with_post']} / 投稿完了 {events['completed']} "
+          f"/ 未完了 {events['unfinished']} / キュー満杯で破棄 {events['rejected']}")
+    throughput = report["throughput_per_min"]
+    print(f"スループット: {throughput if throughput is not None else '-'} 件/分")
+
+    def fmt(value):
+        return f"{value:.3f}s" if value is not None else "-"
+
+    print(f"受信→投稿: p50 {fmt(latency['p50'])}  p95 {fmt(latency['p95'])}  p99 {fmt(latency['p99'])}  "
+          f"max {fmt(latency['max'])}")
+    print(f"キュー深さ: max {depth['max']}  mean {depth['mean']}  p95 {depth['p95']}  (実行中 max {depth['max_active']})")
+    for name, stats in report["upstreams"].items():
+        print(f"  {name:<7} calls={stats['calls']} injected_errors={stats['injected_errors']} latency={stats['latency']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=60.0, help="1分あたりの通知数")
+    parser.add_argument("--duration", type=float, default=30.0, help="通知を送り続ける秒数")
+    parser.add_argument("--arrival", choices=["poisson", "uniform"], default="poisson", help="通知の到着間隔")
+    parser.add_argument("--events", metavar="PATH", help="再生するイベントの JSON 配列（省略時は合成した esa 通知）")
+    parser.add_argument("--distinct-posts", type=int, default=0, help="合成通知で使う記事の種類（0 なら毎回別の記事）")
+    parser.add_argument("--channels", type=int, default=1, help="要約の投稿先チャンネル数")
+    parser.add_argument("--streaming", action="store_true", help="ストリーミング要約（SUMMARY_STREAMING）で動かす")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="asyncio 版（SLACK_ASYNC）で動かす")
+    parser.add_argument("--drain-timeout", type=float, default=60.0, help="送信終了後に残りの投稿を待つ秒数")
+    parser.add_argument("--esa-latency", default="lognormal:0.15:0.3", help="esa の応答遅延分布（秒）")
+    parser.add_argument("--gemini-latency", default="lognormal:1.5:0.4", help="Gemini の応答遅延分布（秒）")
+    parser.add_argument("--slack-latency", default="lognormal:0.1:0.3", help="Slack の応答遅延分布（秒）")
+    parser.add_argument("--esa-error-rate", type=float, default=0.0, help="esa が 503 を返す確率")
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0, help="Gemini が 503 を返す確率")
+    parser.add_argument("--slack-error-rate", type=float, default=0.0, help="Slack の投稿が 429 ratelimited になる確率")
+    parser.add_argument("--seed", type=int, help="乱数シード（到着間隔・遅延・エラー注入）")
+    parser.add_argument("--json", metavar="PATH", help="結果を JSON で保存（- で標準出力）")
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    report = run(args)
+    if args.json == "-":
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
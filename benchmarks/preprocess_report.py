@@ -0,0 +1,64 @@
+"""本文前処理による削減量のレポート
+
+実行:
+  python benchmarks/preprocess_report.py path/to/export/        # .md ファイルを再帰的に集計
+  python benchmarks/preprocess_report.py a.md b.md --json        # ファイルごとの結果を JSON で出力
+
+esa のエクスポート（Markdown）などの実コーパスに対して、前処理前後の文字数と
+推定トークン数を集計する。ネットワークは使わない。
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+
+from app.markdown_preprocess import preprocess_markdown  # noqa: E402
+
+
+def iter_markdown_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.endswith(".md"):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--json", action="store_true", help="ファイルごとの結果を JSON Lines で出力")
+    args = parser.parse_args()
+
+    totals = {"files": 0, "original_chars": 0, "processed_chars": 0, "original_tokens": 0, "processed_tokens": 0}
+    for path in iter_markdown_files(args.paths):
+        with open(path, encoding="utf-8") as f:
+            _, stats = preprocess_markdown(f.read())
+        totals["files"] += 1
+        for key in ["original_chars", "processed_chars", "original_tokens", "processed_tokens"]:
+            totals[key] += getattr(stats, key)
+        if args.json:
+            print(json.dumps({"path": path, **stats._asdict(), "saved_tokens": stats.saved_tokens}, ensure_ascii=False))
+        else:
+            print(f"{stats.original_tokens:>8} → {stats.processed_tokens:>8} tokens  (-{stats.saved_tokens:>6})  {path}")
+
+    if not totals["files"]:
+        print("Markdownファイルが見つかりません", file=sys.stderr)
+        return 1
+    saved = totals["original_tokens"] - totals["processed_tokens"]
+    ratio = saved / totals["original_tokens"] * 100 if totals["original_tokens"] else 0.0
+    summary = {**totals, "saved_tokens": saved, "saved_ratio_pct": round(ratio, 1)}
+    if args.json:
+        print(json.dumps({"total": summary}, ensure_ascii=False))
+    else:
+        print(f"合計 {totals['files']}件: {totals['original_tokens']} → {totals['processed_tokens']} トークン "
+              f"(削減 {saved}, {ratio:.1f}%) / {totals['original_chars']} → {totals['processed_chars']} 文字")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""Bot の純 Python 処理（1イベントあたりの CPU コスト）のベンチマークスイート
+
+実行:
+    python benchmarks/run_benchmarks.py                          # 表で表示
+    python benchmarks/run_benchmarks.py --json results.json      # 結果を JSON で保存
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json --threshold 0.25
+    python benchmarks/run_benchmarks.py --rounds 3 --baseline base.json --threshold 0.3   # CI と同じ比較
+
+ネットワーク・APIキー不要。benchmarks/fixtures/ の通知イベント・esa記事・要約を入力に使う。
+マシン差を吸収するため、各結果の最小値を固定の較正処理（calibration）の時間との比でも記録し、
+--baseline ではこの比どうしを比べる。threshold を超えて遅くなった項目があれば終了コード 1 を返す。
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+
+from app.gemini_client import GeminiClient, build_prompt  # noqa: E402
+from app.markdown_preprocess import estimate_tokens  # noqa: E402
+from app.markdown_sections import chunk_markdown  # noqa: E402
+from app.mrkdwn_renderer import chunk_mrkdwn, normalize_numbering, renderer  # noqa: E402
+from app.url_extractor import scan_event  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+RESULT_VERSION = 1
+
+
+class Benchmark(NamedTuple):
+    name: str
+    description: str
+    fn: Callable[[], object]
+    items: int  # 1回の呼び出しで処理する件数（イベント数など）
+
+
+def _load_fixtures():
+    with open(os.path.join(FIXTURES, "esa_notifications.json"), encoding="utf-8") as f:
+        events = json.load(f)
+    with open(os.path.join(FIXTURES, "esa_post.json"), encoding="utf-8") as f:
+        post = json.load(f)
+    with open(os.path.join(FIXTURES, "summary.md"), encoding="utf-8") as f:
+        summary = f.read()
+    return events, post, summary
+
+
+def _calibration():
+    """マシンの速さを測るための固定処理（文字列・辞書・整数演算の混在）"""
+    table = {}
+    total = 0
+    for i in range(20000):
+        key = f"k{i % 512}"
+        table[key] = table.get(key, 0) + i
+        total += len(key) * (i & 7)
+    return total
+
+
+def build_benchmarks() -> List[Benchmark]:
+    events, post, summary = _load_fixtures()
+    mrkdwn = renderer.render(normalize_numbering(summary)).text
+    long_mrkdwn = "\n\n".join([mrkdwn] * 8)
+
+    # SlackBot の生成は Slack への接続を伴うため、整形メソッドだけを使う
+    from app.slack_handler import SlackBot
+    formatter = SlackBot.__new__(SlackBot)
+
+    gemini = GeminiClient.__new__(GeminiClient)
+    gemini.preprocess_enabled = True
+    gemini.preprocess_saved_chars = 0
+    gemini.preprocess_saved_tokens = 0
+
+    def extract_urls():
+        for event in events:
+            scan_event(event).posts
+
+    def extract_block_text():
+        for event in events:
+            if event.get("blocks"):
+                scan_event(event).block_text
+
+    def format_message():
+        formatter._format_summary_message(
+            post["name"], post["category"], post["updated_at"], summary,
+            "https://labteam.esa.io/posts/241", "medium", "bullet", post["number"], len(post["body_md"]),
+        )
+
+    def prompt_construction():
+        # GeminiClient.summarize のうち API 呼び出しより前の処理（前処理 → プロンプト組み立て → トークン見積り）
+        body = gemini._preprocess(post["name"], post["body_md"])
+        estimate_tokens(build_prompt(post["name"], body, post["category"], "medium", "bullet"))
+
+    def map_reduce_chunking():
+        chunk_markdown(post["body_md"], 2000)
+
+    import logging
+    logging.getLogger("app.gemini_client").setLevel(logging.WARNING)
+
+    return [
+        Benchmark("calibration", "較正用の固定処理", _calibration, 1),
+        Benchmark("collect_esa_urls", "通知イベントからの esa 記事抽出", extract_urls, len(events)),
+        Benchmark("extract_text_from_blocks", "blocks からのテキスト復元", extract_block_text,
+                  sum(1 for e in events if e.get("blocks"))),
+        Benchmark("convert_markdown_to_mrkdwn", "要約の mrkdwn 変換", lambda: renderer.render(summary), 1),
+        Benchmark("chunk_text", "section 用の分割（長文）", lambda: chunk_mrkdwn(long_mrkdwn), 1),
+        Benchmark("normalize_numbering", "番号プレースホルダの正規化", lambda: normalize_numbering(summary), 1),
+        Benchmark("format_summary_message", "Block Kit ペイロードの組み立て", format_message, 1),
+        Benchmark("prompt_construction", "本文前処理とプロンプト組み立て", prompt_construction, 1),
+        Benchmark("map_reduce_chunking", "分割要約用の見出し単位チャンク分割", map_reduce_chunking, 1),
+    ]
+
+
+def measure(bench: Benchmark, repeats: int, min_time: float) -> Dict[str, float]:
+    """1回あたりの時間を repeats 回計測（1計測は min_time 秒以上になるよう回数を調整）"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            bench.fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            bench.fn()
+        samples.append((time.perf_counter() - start) / number * 1e6)
+    median = statistics.median(samples)
+    return {
+        "median_us": round(median, 3),
+        "min_us": round(min(samples), 3),
+        "stdev_us": round(statistics.stdev(samples), 3) if len(samples) > 1 else 0.0,
+        "per_item_us": round(median / max(bench.items, 1), 3),
+        "items": bench.items,
+        "loops": number,
+    }
+
+
+def run(selected: List[str], repeats: int, min_time: float) -> Dict:
+    benchmarks = build_benchmarks()
+    results = {}
+    for bench in benchmarks:
+        if bench.name != "calibration" and selected and not any(s in bench.name for s in selected):
+            continue
+        results[bench.name] = measure(bench, repeats, min_time)
+        results[bench.name]["description"] = bench.description
+    # 較正は最初と最後の2回測り、速かった方を使う（CPUのクロック変動の影響を抑える）
+    calibration_bench = benchmarks[0]
+    again = measure(calibration_bench, repeats, min_time)
+    if again["min_us"] < results["calibration"]["min_us"]:
+        again["description"] = calibration_bench.description
+        results["calibration"] = again
+    calibration = results["calibration"]["min_us"]
+    for result in results.values():
+        # 最小値はノイズ（他プロセス・GC）の影響を受けにくいので比較にはこちらを使う
+        result["relative"] = round(result["min_us"] / calibration, 5)
+    return {
+        "version": RESULT_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": results,
+    }
+
+
+def keep_best(report: Dict, other: Dict, names: List[str]):
+    """names の項目について、較正比の小さい（速かった）方の結果を report に残す"""
+    for name in names:
+        if other["results"][name]["relative"] < report["results"][name]["relative"]:
+            report["results"][name] = other["results"][name]
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """較正比で baseline より threshold 以上遅くなった項目の名前を返す"""
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if name == "calibration" or not base:
+            continue
+        change = result["relative"] / base["relative"] - 1.0
+        result["baseline_relative"] = base["relative"]
+        result["change"] = round(change, 4)
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def print_table(report: Dict):
+    print(f"Python {report['python']} / {report['platform']}")
+    print(f"{'benchmark':<28}{'median μs':>12}{'per item μs':>13}{'±stdev':>10}{'vs baseline':>13}")
+    for name, r in report["results"].items():
+        change = f"{r['change'] * 100:+.1f}%" if "change" in r else "-"
+        print(f"{name:<28}{r['median_us']:>12.2f}{r['per_item_us']:>13.2f}{r['stdev_us']:>10.2f}{change:>13}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--json", metavar="PATH", help="結果を JSON で保存（- で標準出力）")
+    parser.add_argument("--baseline", metavar="PATH", help="比較する過去の結果 JSON")
+    parser.add_argument("--threshold", type=float, default=0.25, help="回帰とみなす悪化率（0.25 = 25%%）")
+    parser.add_argument("--repeats", type=int, default=7, help="計測回数（中央値を報告）")
+    parser.add_argument("--min-time", type=float, default=0.05, help="1計測あたりの最短時間(秒)")
+    parser.add_argument("--rounds", type=int, default=1, help="スイートを繰り返す回数（項目ごとに最も速かった回を採る）")
+    parser.add_argument("--filter", action="append", default=[], help="名前に含まれる文字列で対象を絞る（複数可）")
+    args = parser.parse_args()
+
+    report = run(args.filter, args.repeats, args.min_time)
+    for _ in range(args.rounds - 1):
+        keep_best(report, run(args.filter, args.repeats, args.min_time), list(report["results"]))
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            # 一時的な負荷による誤検知を避けるため、悪化した項目だけ測り直して良い方を採る
+            keep_best(report, run(regressions, args.repeats, args.min_time), regressions)
+            regressions = compare(report, baseline, args.threshold)
+        report["regressions"] = regressions
+
+    if args.json == "-":
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print_table(report)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+    if regressions:
+        print(f"性能が {args.threshold * 100:.0f}% 以上悪化: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+import aiohttp
+
+from app.esa_client import EsaClient
+from app.tracing import tracer
+from app.resilience import EsaError, call_with_retry_async, classify_esa_error
+from config.settings import ESA_CONNECT_TIMEOUT, ESA_READ_TIMEOUT, ESA_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class _HttpStatusError(Exception):
+    """classify_esa_error() に渡すための、requests の HTTPError と同じ形の例外"""
+
+    def __init__(self, response: aiohttp.ClientResponse):
+        super().__init__(f"{response.status} {response.reason}")
+        self.response = SimpleNamespace(status_code=response.status, headers=response.headers)
+
+
+class AsyncEsaClient(EsaClient):
+    """aiohttp で記事を取得する EsaClient（ETag キャッシュ・レート制限・再試行は同期版と共有）
+
+    セッションはイベントループの中で start() してから使い、終了時に close() する。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.aiohttp_session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        if self.aiohttp_session is None:
+            self.aiohttp_session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=ESA_POOL_SIZE),
+                timeout=aiohttp.ClientTimeout(connect=ESA_CONNECT_TIMEOUT, sock_read=ESA_READ_TIMEOUT),
+            )
+
+    async def close(self):
+        if self.aiohttp_session is not None:
+            await self.aiohttp_session.close()
+            self.aiohttp_session = None
+
+    async def get_post_by_number_async(self, post_number: int) -> Optional[Dict]:
+        """記事番号から記事を取得（存在しない記事は None、上流の失敗は EsaError を送出）"""
+        with tracer.span("esa.get_post", post_number=post_number) as span:
+            post = await self._get_post_by_number_async(post_number, span)
+            if post:
+                span.set_attributes(body_length=len(post.get("body_md") or ""), revision=post.get("revision_number"))
+            return post
+
+    async def _get_post_by_number_async(self, post_number: int, span) -> Optional[Dict]:
+        await self.start()
+        url = f"{self.base_url}/posts/{post_number}"
+        cached = self._get_cached(post_number)
+        headers = self._conditional_headers(cached)
+        self._check_rate_limit()
+
+        async def attempt():
+            delay = self._throttle_delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                self._consume_after_throttle()
+            await self.rate_limiter.acquire_async("esa")
+            logger.debug(f"esa APIリクエスト(async): {url} (条件付き: {bool(headers)})")
+            try:
+                async with self.aiohttp_session.get(url, headers=headers) as response:
+                    self._update_rate_limit(response)
+                    if response.status >= 400 and response.status != 404:
+                        raise _HttpStatusError(response)
+                    data = await response.json() if response.status not in (304, 404) else None
+                    return response, data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise EsaError(f"esa API 通信エラー: {type(e).__name__}: {e}", retryable=True) from e
+
+        response, data = await call_with_retry_async(
+            attempt, self.breaker, classify_esa_error, self.retry_policy, f"(記事番号: {post_number})"
+        )
+        return self._post_from_response(post_number, response.status, response, data, cached, bool(headers), span)
+
+    async def get_post_from_url_async(self, url: str) -> Optional[Dict]:
+        """URLから記事を取得"""
+        post_number = self.extract_post_number_from_url(url)
+        if post_number:
+            return await self.get_post_by_number_async(post_number)
+        return None
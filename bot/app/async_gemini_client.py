@@ -0,0 +1,163 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from app.gemini_client import GeminiClient, REDUCE_BODY_HEADER, build_map_prompt, build_prompt
+from app.markdown_preprocess import estimate_tokens
+from app.markdown_sections import chunk_markdown
+from app.section_diff import SectionChange
+from app.tracing import set_attributes, tracer
+from app.resilience import GeminiError, call_with_retry_async, classify_gemini_error
+from config.settings import GEMINI_API_KEY, GEMINI_API_ENDPOINT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_ENDPOINT = "https://generativelanguage.googleapis.com"
+
+# 生成には時間がかかるため読み取りは長めに待つ（接続できないときは早めに諦める）
+_REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=600, sock_connect=10)
+
+
+class _GeminiHttpError(Exception):
+    """classify_gemini_error() に渡すための、google.api_core の例外と同じく code を持つ例外"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.code = status
+
+
+def _camel_case(name: str) -> str:
+    head, *rest = name.split("_")
+    return head + "".join(part.title() for part in rest)
+
+
+def response_text(data: Dict) -> str:
+    """generateContent の応答 JSON から本文を取り出す（ブロックされた応答は再試行しない GeminiError）"""
+    candidates = data.get("candidates") or []
+    if not candidates:
+        reason = (data.get("promptFeedback") or {}).get("blockReason", "不明")
+        raise GeminiError(f"Gemini API エラー: 応答に候補がありません (blockReason: {reason})", retryable=False)
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    text = "".join(part.get("text", "") for part in parts)
+    if not text:
+        raise GeminiError(f"Gemini API エラー: 応答が空です (finishReason: {candidates[0].get('finishReason')})",
+                          retryable=False)
+    return text
+
+
+class AsyncGeminiClient(GeminiClient):
+    """Gemini の REST API を aiohttp で呼ぶ GeminiClient（前処理・プロンプト・分割要約は同期版と共有）
+
+    google-generativeai の generate_content_async は gRPC の asyncio 実装が前提で、
+    REST で接続する場合（GEMINI_API_ENDPOINT）は使えないため、generateContent を直接呼ぶ。
+    """
+
+    def __init__(self, *args, api_endpoint: str = "", **kwargs):
+        super().__init__(*args, **kwargs)
+        endpoint = (api_endpoint or GEMINI_API_ENDPOINT or DEFAULT_API_ENDPOINT).rstrip("/")
+        if "://" not in endpoint:
+            endpoint = f"https://{endpoint}"
+        model = self.model_name if self.model_name.startswith("models/") else f"models/{self.model_name}"
+        self.generate_url = f"{endpoint}/v1beta/{model}:generateContent"
+        self.aiohttp_session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        if self.aiohttp_session is None:
+            self.aiohttp_session = aiohttp.ClientSession(
+                headers={"x-goog-api-key": GEMINI_API_KEY or "", "Content-Type": "application/json"},
+                timeout=_REQUEST_TIMEOUT,
+            )
+
+    async def close(self):
+        if self.aiohttp_session is not None:
+            await self.aiohttp_session.close()
+            self.aiohttp_session = None
+
+    async def summarize_async(
+        self,
+        title: str,
+        body: str,
+        category: str = "",
+        length: str = "medium",
+        style: str = "bullet"
+    ) -> str:
+        """ドキュメントを要約（失敗時は GeminiError / CircuitOpenError を送出）"""
+        body = self._preprocess(title, body)
+        logger.debug(f"Gemini API呼び出し(async): {title} (長さ: {length}, スタイル: {style})")
+        map_reduce = self.map_reduce_threshold > 0 and len(body) > self.map_reduce_threshold
+        set_attributes(preprocessed_length=len(body), map_reduce=map_reduce)
+        if map_reduce:
+            prompt = await self._map_reduce_prompt_async(title, body, category, length, style)
+        else:
+            prompt = build_prompt(title, body, category, length, style)
+        summary = await self._generate_async(prompt)
+        logger.info(f"要約生成完了: {title}")
+        return summary
+
+    async def summarize_incremental_async(
+        self,
+        title: str,
+        previous_summary: str,
+        changes: List[SectionChange],
+        category: str = "",
+        length: str = "medium",
+        style: str = "bullet"
+    ) -> str:
+        """前回の要約と変更されたセクションから要約を更新する（失敗時は GeminiError / CircuitOpenError を送出）"""
+        summary = await self._generate_async(
+            self._incremental_prompt(title, previous_summary, changes, category, length, style)
+        )
+        logger.info(f"要約更新完了(差分): {title}")
+        return summary
+
+    async def _map_reduce_prompt_async(self, title: str, body: str, category: str, length: str, style: str) -> str:
+        """map 段をチャンクごとに並行して実行し、reduce 段のプロンプトを返す"""
+        chunks = chunk_markdown(body, self.chunk_size)
+        total = len(chunks)
+        logger.info(f"長文のため分割要約: {title} (文字数: {len(body)}字, チャンク数: {total})")
+        if total <= 1:
+            return build_prompt(title, body, category, length, style)
+
+        semaphore = asyncio.Semaphore(max(1, self.map_parallelism))
+
+        async def summarize_chunk(prompt: str) -> str:
+            async with semaphore:
+                return await self._generate_async(prompt)
+
+        partials = await asyncio.gather(*(
+            summarize_chunk(build_map_prompt(title, chunk, i + 1, total)) for i, chunk in enumerate(chunks)
+        ))
+        reduced_body = REDUCE_BODY_HEADER + "\n\n" + "\n\n".join(
+            f"## パート{i + 1}/{total}\n{partial.strip()}" for i, partial in enumerate(partials)
+        )
+        return build_prompt(title, reduced_body, category, length, style)
+
+    async def _generate_async(self, prompt: str, generation_config: Optional[Dict] = None) -> str:
+        """プロンプトを送ってテキストを得る（一時的な失敗は再試行）"""
+        await self.start()
+        payload = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if generation_config:
+            payload["generationConfig"] = {_camel_case(k): v for k, v in generation_config.items()}
+
+        async def attempt():
+            await self.rate_limiter.acquire_async("gemini.requests")
+            await self.rate_limiter.acquire_async("gemini.tokens", estimate_tokens(prompt))
+            try:
+                async with self.aiohttp_session.post(self.generate_url, json=payload) as response:
+                    if response.status >= 400:
+                        raise _GeminiHttpError(response.status, (await response.text())[:500])
+                    return await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise GeminiError(f"Gemini API 通信エラー: {type(e).__name__}: {e}", retryable=True) from e
+
+        with tracer.span("gemini.generate_content", model=self.model_name, prompt_chars=len(prompt),
+                         estimated_prompt_tokens=estimate_tokens(prompt)) as span:
+            data = await call_with_retry_async(attempt, self.breaker, classify_gemini_error, self.retry_policy)
+            usage = data.get("usageMetadata") or {}
+            span.set_attributes(prompt_tokens=usage.get("promptTokenCount"), output_tokens=usage.get("candidatesTokenCount"))
+            self._record_usage(prompt, usage.get("promptTokenCount"), usage.get("candidatesTokenCount"))
+            text = response_text(data)
+            span.set_attribute("response_chars", len(text))
+            return text
@@ -0,0 +1,18 @@
+from slack_sdk.web.async_client import AsyncWebClient
+
+from app.rate_limiter import RateLimiter, rate_limiter as default_rate_limiter
+from app.slack_client import _request_channel, slack_bucket_name
+
+
+class RateLimitedAsyncWebClient(AsyncWebClient):
+    """RateLimitedWebClient の AsyncApp 版（待機中もイベントループを止めない）"""
+
+    def __init__(self, *args, rate_limiter: RateLimiter = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = rate_limiter or default_rate_limiter
+
+    async def api_call(self, api_method: str, *, http_verb="POST", files=None, data=None, params=None, json=None, headers=None, auth=None):
+        await self.rate_limiter.acquire_async(slack_bucket_name(api_method, _request_channel(json, data, params)))
+        return await super().api_call(
+            api_method, http_verb=http_verb, files=files, data=data, params=params, json=json, headers=headers, auth=auth
+        )
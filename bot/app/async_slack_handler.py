@@ -0,0 +1,558 @@
+from slack_bolt.async_app import AsyncApp
+from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+from slack_bolt.authorization import AuthorizeResult
+from slack_bolt.authorization.async_authorize import AsyncAuthorize
+from slack_bolt.request.async_request import AsyncBoltRequest
+from app.async_esa_client import AsyncEsaClient
+from app.async_gemini_client import AsyncGeminiClient
+from app.summary_cache import SummaryCache
+from app.post_snapshots import INCREMENTAL, TRIVIAL, UNCHANGED, PostSnapshotStore, TrivialEditSkipped
+from app.single_flight import AsyncSingleFlight
+from app.event_dedup import EventDeduplicator, event_dedup_keys
+from app.channel_fanout import deliver_async
+from app.lease import Lease, LeaseHeldError, LeaseLostError, build_lease_backend, instance_id
+from app.url_extractor import scan_event
+from app.rate_limiter import rate_limiter
+from app.resilience import UpstreamError, breakers, call_with_retry_async, classify_slack_error
+from app.async_slack_client import RateLimitedAsyncWebClient
+from app.slack_handler import SlackBotBase
+from app.metrics import MetricsServer, registry
+from app.tracing import install_log_correlation, set_attributes, tracer
+from app.startup import AuthCache, authorize_result, startup
+from config.settings import SLACK_BOT_TOKEN, SLACK_APP_TOKEN, SLACK_API_URL, SLACK_MODE, SLACK_SIGNING_SECRET, SLACK_EVENTS_PATH, SLACK_HTTP_ACK_TIMEOUT, ESA_WATCH_CHANNEL_ID, ESA_SUMMARY_CHANNEL_IDS, DEBUG_VERBOSE, SUMMARY_SHUTDOWN_TIMEOUT, SUMMARY_CACHE_ENABLED, SUMMARY_STREAMING, SUMMARY_BATCH_WINDOW, SUMMARY_ASYNC_MAX_IN_FLIGHT, SUMMARY_INCREMENTAL_ENABLED, SUMMARY_JOB_QUEUE_PATH, METRICS_ENABLED, METRICS_PORT, SLACK_STARTUP_CHANNEL_CHECK
+from app.debug_utils import step, log_kv, truncate
+import asyncio
+import concurrent.futures
+import logging
+import signal
+from typing import Awaitable, Callable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCachedAuthorize(AsyncAuthorize):
+    """startup.CachedAuthorize の asyncio 版（AsyncApp の authorize に渡す）"""
+
+    def __init__(self, fetch: Callable[[], Awaitable[None]]):
+        self.fetch = fetch
+        self.result: Optional[AuthorizeResult] = None
+        self._lock = asyncio.Lock()
+
+    def set(self, token: str, auth_response):
+        self.result = authorize_result(token, auth_response)
+
+    async def __call__(self, *, context, enterprise_id, team_id, user_id, **kwargs) -> Optional[AuthorizeResult]:
+        if self.result is None:
+            async with self._lock:
+                if self.result is None:
+                    await self.fetch()
+        return self.result
+
+
+class AsyncSlackBot(SlackBotBase):
+    """SlackBot の asyncio 版（SLACK_ASYNC=true で使う）
+
+    Bolt の AsyncApp と aiohttp の esa / Gemini クライアントを1つのイベントループで動かし、
+    要約1件をスレッドではなくタスクとして処理する。上流の応答を待つ間はスレッドを占有しないので、
+    ワーカー数に縛られず数百件の要約を同時に待たせておける（上流への送信速度はレートリミッタが決める）。
+    リースは同期版と同じく使える（SQLite の読み書きはスレッドで行う）。
+    ストリーミング要約・バッチ要約・ジョブキューには対応しない。
+    """
+
+    def __init__(self):
+        # ログの各行にイベントの trace_id を付ける（タスクごとに文脈が分かれるのでイベント単位で追える）
+        install_log_correlation()
+        self.rate_limiter = rate_limiter
+        # auth.test は起動時に1回だけ（保存済みなら呼ばずに）行い、その結果で全イベントを認可する
+        self.authorization = AsyncCachedAuthorize(self._authenticate)
+        self.app = AsyncApp(
+            client=RateLimitedAsyncWebClient(token=SLACK_BOT_TOKEN, base_url=SLACK_API_URL, rate_limiter=self.rate_limiter),
+            signing_secret=SLACK_SIGNING_SECRET or None,
+            authorize=self.authorization,
+        )
+        self.esa_client = AsyncEsaClient(rate_limiter=self.rate_limiter)
+        self.gemini_client = AsyncGeminiClient(rate_limiter=self.rate_limiter)
+        self.breakers = breakers
+        self.summary_cache = SummaryCache() if SUMMARY_CACHE_ENABLED else None
+        self.post_snapshots = PostSnapshotStore() if SUMMARY_INCREMENTAL_ENABLED else None
+        self.single_flight = AsyncSingleFlight()
+        self.event_dedup = EventDeduplicator()
+        # 複数インスタンスで動かすときは、記事の版ごとのリースを取れたインスタンスだけが要約・投稿する
+        self.leases = build_lease_backend()
+        self.instance_id = instance_id()
+        # 実行中の要約タスク（上限を超えたイベントは WorkerPool のキュー満杯と同じく破棄する）
+        self.max_in_flight = max(1, SUMMARY_ASYNC_MAX_IN_FLIGHT)
+        self._tasks: Set[asyncio.Task] = set()
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.socket_handler: Optional[AsyncSocketModeHandler] = None
+        self.metrics_server = None
+        self.mode = SLACK_MODE
+        self.auth_cache = AuthCache()
+        self.bot_user_id = None
+        self._draining = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._register_metrics()
+        if SUMMARY_STREAMING or SUMMARY_BATCH_WINDOW > 0:
+            logger.warning("SLACK_ASYNC=true ではストリーミング要約・バッチ要約は使われません（通常の要約を行います）")
+        if SUMMARY_JOB_QUEUE_PATH:
+            logger.warning(
+                f"SLACK_ASYNC=true ではジョブキューを使いません（SUMMARY_JOB_QUEUE_PATH={SUMMARY_JOB_QUEUE_PATH} は無視されます）。"
+                "停止時に処理中だった自動要約は再開されません"
+            )
+
+        @self.app.middleware  # リスナーの client / say もレート制限付きクライアントを使う
+        async def use_rate_limited_client(context, next):
+            context["client"] = self.app.client
+            context.pop("say", None)
+            return await next()
+
+        if DEBUG_VERBOSE:
+            @self.app.middleware  # 全イベント生ボディをログ
+            async def log_raw(body, next):
+                logger.debug(f"[RAW EVENT] keys={list(body.keys())} body_trunc={truncate(str(body), 500)}")
+                return await next()
+        self.setup_handlers()
+
+    def setup_handlers(self):
+        """イベントハンドラのセットアップ"""
+
+        @self.app.event("message")
+        async def handle_message(event, client, body=None):
+            """メッセージイベントを処理（自動要約）"""
+            with tracer.start_trace("slack.message", channel=event.get('channel'), event_ts=event.get('ts'),
+                                    event_id=(body or {}).get('event_id')):
+                await self._handle_message(event, client, body)
+
+        @self.app.event("app_mention")
+        async def handle_mention(event, say, body=None):
+            """Botへのメンションを処理"""
+            with tracer.start_trace("slack.app_mention", channel=event.get('channel'), event_ts=event.get('ts'),
+                                    event_id=(body or {}).get('event_id'), user=event.get('user')):
+                await self._handle_mention(event, say, body)
+
+        @self.app.error
+        async def handle_errors(error):
+            logger.exception(f"Slack Bolt エラー: {error}")
+
+    async def _handle_message(self, event, client, body=None):
+        """メッセージイベントの本体（監視チャンネルの esa 通知なら記事ごとにタスクを起動）"""
+        self.events_received.inc(type="message")
+        with step("message_event"):
+            log_kv("message.meta", subtype=event.get('subtype'), channel=event.get('channel'))
+        if not self._is_watched_bot_message(event):
+            return
+        channel_id = event.get('channel')
+        if await asyncio.to_thread(self.event_dedup.is_duplicate, event_dedup_keys("message", event, body)):
+            logger.info(f"重複イベントのため無視: channel={channel_id} ts={event.get('ts')}")
+            return
+        scan = scan_event(event)
+        if not scan.posts:
+            return
+        set_attributes(post_numbers=",".join(str(post.number) for post in scan.posts))
+        for post in scan.posts:
+            if self._spawn(self._process_auto_summary, post.url, client, channel_id):
+                self.summary_jobs.inc(source="auto", result="queued")
+            else:
+                self.summary_jobs.inc(source="auto", result="rejected")
+                logger.error(f"同時処理数の上限に達したため自動要約をスキップ: {post.url}")
+
+    async def _handle_mention(self, event, say, body=None):
+        """メンションの本体（オプションを解釈してタスクを起動）"""
+        self.events_received.inc(type="app_mention")
+        with step("mention_event"):
+            log_kv("mention.meta", user=event.get('user'), channel=event.get('channel'))
+        if await asyncio.to_thread(self.event_dedup.is_duplicate, event_dedup_keys("app_mention", event, body)):
+            logger.info(f"重複メンションのため無視: channel={event.get('channel')} ts={event.get('ts')}")
+            return
+        scan = scan_event(event)
+        user_id, text = self._mention_text(event, scan)
+        if not text or 'help' in text.lower() or 'ヘルプ' in text:
+            await say(f"<@{user_id}>\n{self._get_help_message()}")
+            return
+        text, length, style = self._parse_summary_options(text)
+        if not scan.posts:
+            await say(f"<@{user_id}> ❌ エラー: esaのURLを指定してください\n\n{self._get_help_message()}")
+            return
+        url = scan.posts[0].url
+        await say(f"<@{user_id}> 📝 要約を生成中です... (長さ: {length}, 形式: {style})")
+        if self._spawn(self._process_mention_summary, url, user_id, length, style, say):
+            self.summary_jobs.inc(source="mention", result="queued")
+        else:
+            self.summary_jobs.inc(source="mention", result="rejected")
+            await say(f"<@{user_id}> ⚠️ 現在要約リクエストが混み合っています。しばらくしてから再度お試しください。")
+
+    def _spawn(self, fn, *args) -> bool:
+        """要約をタスクとして起動する（停止処理中・上限超過なら起動せず False）"""
+        if self._draining or len(self._tasks) >= self.max_in_flight:
+            self.rejected += 1
+            return False
+        task = asyncio.get_running_loop().create_task(self._run_task(fn, *args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run_task(self, fn, *args):
+        with tracer.span(f"task.{fn.__name__}", in_flight=len(self._tasks)):
+            try:
+                await fn(*args)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"要約タスクで未処理の例外: {e}", exc_info=True)
+
+    async def _fetch_and_summarize(self, url: str, length: str, style: str, skip_trivial: bool = False):
+        """記事を取得して要約する（同じ記事・オプションの同時リクエストは1回にまとめる）"""
+        post_number = self.esa_client.extract_post_number_from_url(url)
+        key = (post_number or url, length, style, skip_trivial)
+        return await self.single_flight.do(key, self._fetch_and_summarize_once, url, length, style, skip_trivial)
+
+    async def _fetch_and_summarize_once(self, url: str, length: str, style: str, skip_trivial: bool = False):
+        """記事取得と要約生成の本体（戻り値は SlackBot._fetch_and_summarize と同じ）"""
+        with step("esa_fetch"):
+            post = await self.esa_client.get_post_from_url_async(url)
+        if not post:
+            return None, None
+        post_data = post.get('post', post)
+        if not post_data.get('body_md', ''):
+            return post_data, None
+        logger.info(f"要約を生成中: {post_data.get('name', 'タイトルなし')} (文字数: {len(post_data['body_md'])}字)")
+        with step("gemini_summarize"):
+            summary = await self._summarize_post(post_data, length, style, skip_trivial)
+        return post_data, summary
+
+    async def _summarize_post(self, post_data, length: str, style: str, skip_trivial: bool = False) -> str:
+        """要約キャッシュを確認し、無ければGeminiで要約を生成して保存（SQLite はスレッドで読み書き）
+
+        判定は SlackBot._summarize_post と共通（SlackBotBase）で、ここでは読み書きと Gemini の呼び出しだけを行う。
+        """
+        title = post_data.get('name', 'タイトルなし')
+        category = post_data.get('category', '')
+        cache_key, snapshot_key = self._summary_keys(post_data, length, style)
+        cached = await asyncio.to_thread(self.summary_cache.get, cache_key) if cache_key else None
+        if self._use_cached_summary(post_data, length, style, cache_key, cached):
+            return cached
+        snapshot = await asyncio.to_thread(self.post_snapshots.get, snapshot_key) if snapshot_key else None
+        plan = self._decide_update(post_data, snapshot, skip_trivial)
+        if plan.mode == TRIVIAL:
+            return snapshot.summary
+        if plan.mode == UNCHANGED:
+            summary = snapshot.summary
+        elif plan.mode == INCREMENTAL:
+            summary = await self.gemini_client.summarize_incremental_async(
+                title, snapshot.summary, plan.diff.changes, category, length, style
+            )
+        else:
+            summary = await self.gemini_client.summarize_async(title, post_data.get('body_md', ''), category, length, style)
+        summary, next_snapshot = self._finish_summary(post_data, snapshot, plan, summary)
+        if cache_key and summary:
+            await asyncio.to_thread(self.summary_cache.set, cache_key, summary)
+        if snapshot_key and next_snapshot is not None:
+            await asyncio.to_thread(self.post_snapshots.set, snapshot_key, next_snapshot)
+        return summary
+
+    async def _process_mention_summary(self, url: str, user_id: str, length: str, style: str, say):
+        """メンションによる手動要約を処理"""
+        try:
+            post_data, summary = await self._fetch_and_summarize(url, length, style)
+            if post_data is None:
+                await say(f"<@{user_id}> ❌ 記事の取得に失敗しました。URLを確認してください。")
+                return
+            if summary is None:
+                await say(f"<@{user_id}> ❌ 記事の本文が空です。")
+                return
+            with step("format_and_send"):
+                await self._slack_call(say, **self._format_post_summary(post_data, summary, url, length, style))
+        except UpstreamError as e:
+            self.summary_errors.inc(source="mention", upstream=e.upstream)
+            logger.error(f"手動要約エラー ({url}): {e}")
+            await say(f"<@{user_id}> {self._upstream_error_message(e)}")
+        except Exception as e:
+            self.summary_errors.inc(source="mention", upstream="internal")
+            await say(f"<@{user_id}> ❌ 要約生成中にエラーが発生しました: {str(e)}")
+
+    async def _process_auto_summary(self, url: str, client, source_channel_id: str):
+        """自動要約を処理
+
+        リースを使う設定なら、記事の版ごとのリースを取れたインスタンスだけが要約・投稿する
+        （ジョブキューが無いので、同期版と違い失敗した要約・投稿は再試行せずリースを手放す）。
+        """
+        lease = None
+        try:
+            logger.info(f"自動要約処理を開始: {url}")
+            set_attributes(url=url)
+            summary_channel_ids = ESA_SUMMARY_CHANNEL_IDS or [source_channel_id]
+            length = "medium"
+            style = "bullet"
+            if self.leases is not None:
+                post_data, summary, lease = await self._fetch_and_summarize_leased(url, length, style)
+            else:
+                post_data, summary = await self._fetch_and_summarize(url, length, style, skip_trivial=True)
+            if post_data is None:
+                logger.warning(f"記事の取得に失敗: {url}")
+                return
+            if summary is None:
+                logger.warning(f"記事の本文が空: {url}")
+                return
+            # 要約に時間がかかってもリースを失っていないことを確かめてから投稿する
+            lease = await self._renew_lease(lease)
+            with step("format"):
+                message_payload = self._format_post_summary(post_data, summary, url, length, style)
+            with step("post_fanout"):
+                report = await deliver_async(
+                    lambda channel_id: self._post_to_channel(client, channel_id, message_payload, lease), summary_channel_ids
+                )
+            logger.info(f"✅ 自動要約完了: {post_data.get('name', 'タイトルなし')} - {url} 投稿結果: {report.summary()}")
+            if report.failed:
+                # 再試行はしないので、後から届いた通知で他のインスタンスが投稿し直せるよう手放す
+                await self._release_lease(lease)
+            else:
+                await self._complete_lease(lease)
+        except TrivialEditSkipped as e:
+            logger.info(f"自動要約をスキップ ({url}): {e}")
+            self.summary_jobs.inc(source="auto", result="skipped_trivial_edit")
+        except LeaseHeldError as e:
+            logger.info(f"自動要約をスキップ ({url}): {e}")
+            self.summary_jobs.inc(source="auto", result="skipped_by_lease")
+        except LeaseLostError as e:
+            logger.warning(f"自動要約を中断 ({url}): {e}")
+        except UpstreamError as e:
+            self.summary_errors.inc(source="auto", upstream=e.upstream)
+            logger.error(f"自動要約エラー ({url}): {e}")
+            await self._release_lease(lease)
+        except Exception as e:
+            self.summary_errors.inc(source="auto", upstream="internal")
+            logger.error(f"自動要約エラー ({url}): {str(e)}", exc_info=True)
+            await self._release_lease(lease)
+
+    async def _fetch_and_summarize_leased(self, url: str, length: str, style: str):
+        """記事を取得し、その版のリースを取れたときだけ要約する（SlackBot._fetch_and_summarize_leased と同じ）"""
+        with step("esa_fetch"):
+            post = await self.esa_client.get_post_from_url_async(url)
+        if not post:
+            return None, None, None
+        post_data = post.get('post', post)
+        if not post_data.get('body_md', ''):
+            return post_data, None, None
+        lease = await self._acquire_post_lease(post_data)
+        try:
+            with step("gemini_summarize"):
+                summary = await self._summarize_post(post_data, length, style, skip_trivial=True)
+        except TrivialEditSkipped:
+            # 他のインスタンスも同じ版を要約し直さないよう、処理済みにする
+            await self._complete_lease(lease)
+            raise
+        except Exception:
+            await self._release_lease(lease)
+            raise
+        return post_data, summary, lease
+
+    # リースの判定は SlackBotBase と共通で、保存先の同期呼び出しをスレッドで実行する
+    async def _acquire_post_lease(self, post_data) -> Optional[Lease]:
+        return await asyncio.to_thread(super()._acquire_post_lease, post_data)
+
+    async def _renew_lease(self, lease: Optional[Lease]) -> Optional[Lease]:
+        return await asyncio.to_thread(super()._renew_lease, lease)
+
+    async def _check_lease(self, lease: Optional[Lease]):
+        await asyncio.to_thread(super()._check_lease, lease)
+
+    async def _complete_lease(self, lease: Optional[Lease]):
+        await asyncio.to_thread(super()._complete_lease, lease)
+
+    async def _release_lease(self, lease: Optional[Lease]):
+        await asyncio.to_thread(super()._release_lease, lease)
+
+    async def _post_to_channel(self, client, channel_id: str, message_payload, lease: Optional[Lease] = None):
+        """1チャンネルへ投稿（一時的な失敗は再試行。lease を渡すと投稿の直前にまだ最新のリースか確かめる）"""
+        await self._check_lease(lease)
+        response = await self._slack_call(client.chat_postMessage, channel=channel_id, **message_payload)
+        logger.info(f"✅ チャンネル {channel_id} へ投稿完了")
+        return response
+
+    async def _slack_call(self, fn, **kwargs):
+        """Slack API をブレーカーと再試行（ratelimited は Retry-After を尊重）を通して呼ぶ"""
+        with tracer.span(f"slack.{getattr(fn, '__name__', 'call')}", channel=kwargs.get("channel")):
+            return await call_with_retry_async(lambda: fn(**kwargs), self.breakers["slack"], classify_slack_error)
+
+    def _register_metrics(self):
+        """共通のメトリクスに加え、実行中のタスク数と Socket Mode の状態を登録"""
+        self._register_common_metrics()
+        registry.gauge("worker_active_jobs", "実行中の要約ジョブ数").set_function(lambda: len(self._tasks))
+        registry.gauge("socket_mode_connected", "Socket Mode で接続中なら 1").set_function(
+            lambda: 1 if self._socket_connected() else 0
+        )
+        jobs = registry.counter("worker_jobs_total", "ワーカープールで処理したジョブ数")
+        jobs.set_function(lambda: self.completed, result="completed")
+        jobs.set_function(lambda: self.failed, result="failed")
+        jobs.set_function(lambda: self.rejected, result="rejected")
+
+    def _socket_connected(self) -> bool:
+        handler = self.socket_handler
+        session = getattr(handler.client, "current_session", None) if handler is not None else None
+        return session is not None and not session.closed
+
+    def liveness(self):
+        """プロセスが処理を続けられるか（イベントループが動いているか）"""
+        if self._loop is None or not self._loop.is_running():
+            return False, "event loop stopped"
+        return True, "ok"
+
+    def readiness(self):
+        """イベントを受け取って処理できるか"""
+        alive, reason = self.liveness()
+        if not alive:
+            return False, reason
+        if self._draining:
+            return False, "shutting down"
+        if self.mode != "http" and not self._socket_connected():
+            return False, "socket mode disconnected"
+        return True, "ok"
+
+    def handle_http_event(self, body: bytes, headers, query: str = ""):
+        """Events API の HTTP リクエストを処理する（サーバのスレッドからイベントループに渡して ack を待つ）
+
+        イベントループが詰まって SLACK_HTTP_ACK_TIMEOUT 秒以内に ack できなければ 503 を返す
+        （Slack の3秒制限を過ぎてから返すより、すぐ失敗にして再送に任せる。再送は重複判定で1回にまとまる）。
+        """
+        if self._draining or self._loop is None:
+            self.http_requests.inc(status="503")
+            return 503, {"Content-Type": "text/plain; charset=utf-8"}, "shutting down\n"
+        request = AsyncBoltRequest(body=body.decode("utf-8"), query=query, headers=headers)
+        future = asyncio.run_coroutine_threadsafe(self.app.async_dispatch(request), self._loop)
+        try:
+            response = future.result(timeout=SLACK_HTTP_ACK_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            logger.warning(f"{SLACK_HTTP_ACK_TIMEOUT}秒以内に ack できなかったため 503 を返します")
+            self.http_requests.inc(status="503")
+            return 503, {"Content-Type": "text/plain; charset=utf-8"}, "ack timeout\n"
+        self.http_requests.inc(status=str(response.status))
+        response_headers = {name: values[0] for name, values in response.headers.items() if values}
+        return response.status, response_headers, response.body or ""
+
+    def start(self):
+        """Botを起動（停止要求を受けるまでイベントループを回す）"""
+        if self.mode == "http" and not SLACK_SIGNING_SECRET:
+            raise SystemExit("SLACK_MODE=http には SLACK_SIGNING_SECRET の設定が必要です")
+        try:
+            asyncio.run(self._run())
+        except KeyboardInterrupt:
+            logger.info("停止要求を受信しました")
+
+    async def _run(self):
+        startup.mark("init")
+        http_mode = self.mode == "http"
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            self._loop.add_signal_handler(sig, self._request_stop, sig)
+        await self.esa_client.start()
+        await self.gemini_client.start()
+        if METRICS_ENABLED or http_mode:
+            try:
+                self.metrics_server = MetricsServer(METRICS_PORT, liveness=self.liveness, readiness=self.readiness)
+            except OSError as e:
+                if http_mode:
+                    raise
+                logger.error(f"メトリクスサーバを起動できません (port={METRICS_PORT}): {e}")
+            else:
+                if http_mode:
+                    self.metrics_server.add_post_route(SLACK_EVENTS_PATH, self.handle_http_event)
+                self.metrics_server.start()
+        startup.mark("metrics_server")
+        logger.info(f"⚡️ Bolt app is running! (mode={self.mode}, asyncio, 同時要約上限={self.max_in_flight})")
+        logger.info(f"📡 監視チャンネルID: {ESA_WATCH_CHANNEL_ID or '未設定'}")
+        background: Set[asyncio.Task] = set()
+        try:
+            # auth.test（保存済みなら呼ばない）は接続の前に済ませ、接続直後のイベントでも Bot のユーザーIDを使えるようにする
+            if http_mode:
+                logger.info(f"🌐 Events API を受信中: POST :{self.metrics_server.port}{SLACK_EVENTS_PATH}")
+                await self._authenticate()
+            else:
+                self.socket_handler = AsyncSocketModeHandler(self.app, SLACK_APP_TOKEN)
+                await self._authenticate()
+                await self._connect()
+            startup.ready()
+            # チャンネル確認は起動を待たせないよう、接続後にバックグラウンドで行う
+            if SLACK_STARTUP_CHANNEL_CHECK:
+                background.add(asyncio.create_task(self._check_channels()))
+            await self._stop_event.wait()
+        finally:
+            for task in background:
+                task.cancel()
+            await self.shutdown()
+
+    async def _connect(self):
+        await self.socket_handler.connect_async()
+        startup.mark("connect")
+
+    async def _authenticate(self):
+        """Bot のユーザーIDを取得し、Bolt の認可にも同じ結果を渡す"""
+        with startup.phase("auth"):
+            try:
+                auth = await asyncio.to_thread(self.auth_cache.load, self.app.client)
+                cached = auth is not None
+                if not cached:
+                    auth = await self.app.client.auth_test()
+                    await asyncio.to_thread(self.auth_cache.store, self.app.client, auth)
+            except Exception as e:
+                logger.error(f"Failed to get bot user ID: {e}")
+                return
+            self.bot_user_id = auth.get("user_id")
+            self.authorization.set(self.app.client.token, auth)
+            logger.info(f"🤖 Bot User ID: {self.bot_user_id}" + (" (保存済みの auth.test 結果)" if cached else ""))
+
+    async def _check_channels(self):
+        with startup.phase("channel_check"):
+            await asyncio.gather(*(self._check_channel(cid) for cid in [ESA_WATCH_CHANNEL_ID, *ESA_SUMMARY_CHANNEL_IDS] if cid))
+
+    async def _check_channel(self, channel_id: str):
+        """チャンネルの存在と参加状況を確認"""
+        try:
+            info = await self.app.client.conversations_info(channel=channel_id)
+            ch = info.get('channel', {})
+            logger.info(f"🔍 channel={channel_id} name={ch.get('name')} is_member={ch.get('is_member')} private={ch.get('is_private')}")
+            if not ch.get('is_member'):
+                logger.warning(f"Botはチャンネル {channel_id} に未参加です。/invite で追加してください。")
+        except Exception as e:
+            logger.warning(f"conversations.info 取得失敗 channel={channel_id}: {e}")
+
+    def _request_stop(self, signum):
+        logger.info(f"{signal.Signals(signum).name} を受信しました")
+        self._stop_event.set()
+
+    async def shutdown(self, timeout: float = SUMMARY_SHUTDOWN_TIMEOUT):
+        """新規イベントの受信を止め、処理中の要約を待ってから停止（時間内に終わらないものは取り消す）"""
+        self._draining = True
+        if self.socket_handler:
+            try:
+                await self.socket_handler.close_async()
+            except Exception as e:
+                logger.warning(f"Socket Mode 切断中にエラー: {e}")
+            self.socket_handler = None
+        if self._tasks:
+            logger.info(f"処理中の要約 {len(self._tasks)}件の完了を待ちます (最大 {timeout}秒)")
+            _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            if pending:
+                logger.warning(f"時間内に終わらなかった要約 {len(pending)}件を取り消します")
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+        await self.esa_client.close()
+        await self.gemini_client.close()
+        if self.summary_cache is not None:
+            logger.info(f"要約キャッシュ統計: {self.summary_cache.stats()}")
+        if self.post_snapshots is not None:
+            logger.info(f"記事スナップショット統計: {self.post_snapshots.stats()}")
+        logger.info(f"要約タスク統計: completed={self.completed} failed={self.failed} rejected={self.rejected}")
+        logger.info(f"レート制限統計: {self.rate_limiter.snapshot()}")
+        logger.info(f"同時リクエスト合流統計: {self.single_flight.stats()}")
+        logger.info(f"イベント重複判定統計: {self.event_dedup.stats()}")
+        logger.info(f"サーキットブレーカー統計: { {name: b.snapshot() for name, b in self.breakers.items()} }")
+        tracer.shutdown()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
@@ -0,0 +1,389 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set
+
+from app.esa_client import EsaClient
+from app.gemini_client import GeminiClient
+from app.post_snapshots import FULL, UNCHANGED, PostSnapshotStore
+from app.rate_limiter import rate_limiter
+from app.resilience import EsaError, SlackError, UpstreamError, breakers, call_with_retry, classify_slack_error
+from app.slack_client import RateLimitedWebClient
+from app.slack_handler import SlackBotBase
+from app.summary_cache import SummaryCache, post_revision
+from app.tracing import tracer
+from config.settings import (
+    SLACK_BOT_TOKEN, SLACK_API_URL, BACKFILL_CONCURRENCY, BACKFILL_PROGRESS_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+# 記事ごとの結果（チェックポイントの集計にも使う）
+SUMMARIZED = "summarized"  # Gemini で要約した
+REUSED = "reused"  # 要約キャッシュ・スナップショットにあった同じ版の要約を使った
+EMPTY = "empty"  # 本文が空
+FAILED = "failed"
+
+
+def build_search_query(category: str = "", tags: Iterable[str] = (), since: str = "", until: str = "",
+                       date_field: str = "updated", extra: str = "") -> str:
+    """esa の検索クエリを組み立てる（category は配下のカテゴリを含む。since / until は YYYY-MM-DD でその日を含まない）"""
+    def quote(value: str) -> str:
+        return f'"{value}"' if " " in value else value
+
+    terms = []
+    if category:
+        terms.append(f"in:{quote(category.strip('/'))}")
+    terms.extend(f"tag:{quote(tag)}" for tag in tags if tag)
+    if since:
+        terms.append(f"{date_field}:>{since}")
+    if until:
+        terms.append(f"{date_field}:<{until}")
+    if extra:
+        terms.append(extra)
+    return " ".join(terms)
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+class BackfillCheckpoint:
+    """一括要約の進み具合（JSON ファイル。path が空なら保存しない）
+
+    処理を終えた記事番号と、次に読む一覧のページを保存する。ページは一部の記事が終わっていなければ
+    進めないので、中断した実行はそのページから読み直し、終わった記事を飛ばして再開する。
+    失敗した記事は done に入れず、次の実行で要約し直す。投稿済みのチャンネルは記事ごとに delivered に残し、
+    一部のチャンネルへの投稿だけが失敗した記事は、再開時に残りのチャンネルにだけ投稿する。
+    """
+
+    def __init__(self, path: str, query: str, options: Dict):
+        self.path = path
+        self.query = query
+        self.options = options
+        self.done: Set[int] = set()
+        self.failed: Dict[int, str] = {}
+        self.delivered: Dict[int, List[str]] = {}
+        self.next_page = 1
+        self.totals: Dict[str, int] = {SUMMARIZED: 0, REUSED: 0, EMPTY: 0, "posted": 0, "prompt_tokens": 0, "output_tokens": 0}
+        self._lock = threading.Lock()
+        self._outstanding: Dict[int, Set[int]] = {}
+        self._fetched_through = 0
+
+    @classmethod
+    def load(cls, path: str, query: str, options: Dict, restart: bool = False) -> "BackfillCheckpoint":
+        """保存済みのチェックポイントを読む（無いか restart なら最初から。条件が違えば ValueError）"""
+        checkpoint = cls(path, query, options)
+        if not path or restart or not os.path.exists(path):
+            return checkpoint
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("query") != query or data.get("options") != options:
+            raise ValueError(
+                f"チェックポイント {path} は別の条件の実行のものです（query={data.get('query')!r} options={data.get('options')}）。"
+                f"最初からやり直すには --restart を指定してください"
+            )
+        checkpoint.done = set(data.get("done", []))
+        checkpoint.failed = {int(number): error for number, error in data.get("failed", {}).items()}
+        checkpoint.delivered = {int(number): list(channels) for number, channels in data.get("delivered", {}).items()}
+        # 前のページの記事が削除されると後ろの記事が前のページにずれるため、1ページ戻って読み直す
+        checkpoint.next_page = max(1, data.get("next_page", 1) - 1)
+        checkpoint.totals.update(data.get("totals", {}))
+        logger.info(
+            f"チェックポイントから再開します: {path} (処理済み {len(checkpoint.done)}件, "
+            f"失敗 {len(checkpoint.failed)}件, {checkpoint.next_page}ページから)"
+        )
+        return checkpoint
+
+    def begin_page(self, page: int, numbers: List[int]) -> List[int]:
+        """一覧の1ページ分を処理待ちとして登録し、まだ終わっていない記事番号を返す"""
+        with self._lock:
+            pending = [number for number in numbers if number not in self.done]
+            self._outstanding[page] = set(pending)
+            self._fetched_through = max(self._fetched_through, page)
+            self._advance()
+            return pending
+
+    def finish(self, page: int, number: int, result: str, error: str = ""):
+        """記事1件の処理が終わった（失敗なら次の実行で再試行する）"""
+        with self._lock:
+            if result == FAILED:
+                self.failed[number] = error
+            else:
+                self.done.add(number)
+                self.failed.pop(number, None)
+                self.delivered.pop(number, None)
+                self.totals[result] = self.totals.get(result, 0) + 1
+            self._outstanding.get(page, set()).discard(number)
+            self._advance()
+
+    def record_delivery(self, number: int, channel: str):
+        """記事をチャンネルに投稿した（再開時にそのチャンネルへは投稿し直さない）"""
+        with self._lock:
+            delivered = self.delivered.setdefault(number, [])
+            if channel not in delivered:
+                delivered.append(channel)
+
+    def delivered_channels(self, number: int) -> List[str]:
+        with self._lock:
+            return list(self.delivered.get(number, []))
+
+    def add(self, field: str, value: int):
+        with self._lock:
+            self.totals[field] = self.totals.get(field, 0) + value
+
+    def _advance(self):
+        # 未処理の記事が残っている最初のページ（無ければ読んだ次のページ）から再開する
+        while self._outstanding:
+            page = min(self._outstanding)
+            if self._outstanding[page]:
+                self.next_page = page
+                return
+            del self._outstanding[page]
+        self.next_page = self._fetched_through + 1
+
+    def save(self):
+        """一時ファイルに書いてから置き換える（書き込み中に止まっても前の内容が残る）"""
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                "query": self.query,
+                "options": self.options,
+                "next_page": self.next_page,
+                "done": sorted(self.done),
+                "failed": {str(number): error for number, error in sorted(self.failed.items())},
+                "delivered": {str(number): list(channels) for number, channels in sorted(self.delivered.items())},
+                "totals": dict(self.totals),
+                "saved_at": time.time(),
+            }
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+
+class Backfill(SlackBotBase):
+    """esa の記事一覧を順に読み、各記事を要約して要約キャッシュに保存する（channel_ids があれば Slack にも投稿）
+
+    一覧は記事番号の昇順に per_page 件ずつ読み、読んだ記事を concurrency 件まで並行して要約する
+    （一覧の取得と要約は並行して進む）。esa・Gemini・Slack への送信速度は Bot と同じレートリミッタが決める。
+    要約したときの本文はスナップショットにも残すので、その後の編集は Bot が差分で要約できる。
+    """
+
+    def __init__(
+        self,
+        query: str,
+        checkpoint: BackfillCheckpoint,
+        channel_ids: Iterable[str] = (),
+        length: str = "medium",
+        style: str = "bullet",
+        concurrency: int = BACKFILL_CONCURRENCY,
+        per_page: int = 100,
+        limit: int = 0,
+        progress_interval: float = BACKFILL_PROGRESS_INTERVAL,
+        esa_client: EsaClient = None,
+        gemini_client: GeminiClient = None,
+        slack_client=None,
+        summary_cache: SummaryCache = None,
+        post_snapshots: PostSnapshotStore = None,
+    ):
+        self.query = query
+        self.checkpoint = checkpoint
+        self.channel_ids = list(channel_ids)
+        self.length = length
+        self.style = style
+        self.concurrency = max(1, concurrency)
+        self.per_page = max(1, min(per_page, 100))
+        self.limit = limit
+        self.progress_interval = progress_interval
+        self.esa_client = esa_client or EsaClient(rate_limiter=rate_limiter)
+        self.gemini_client = gemini_client or GeminiClient(rate_limiter=rate_limiter)
+        if slack_client is None and self.channel_ids:
+            slack_client = RateLimitedWebClient(token=SLACK_BOT_TOKEN, base_url=SLACK_API_URL, rate_limiter=rate_limiter)
+        self.slack_client = slack_client
+        # 要約キャッシュがアーカイブを兼ねる（Bot と同じキーなので、後のメンションや通知はここから返る）
+        self.summary_cache = summary_cache or SummaryCache()
+        self.post_snapshots = post_snapshots
+        self.total_count: Optional[int] = None
+        self.submitted = 0
+        self.completed = 0
+        self.interrupted = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._started_at = time.monotonic()
+        self._usage_base = dict(self.gemini_client.usage())
+        self._token_totals = {field: checkpoint.totals.get(field, 0) for field in ("prompt_tokens", "output_tokens")}
+
+    def run(self) -> Dict[str, int]:
+        """最後のページまで（または limit 件まで）処理し、集計を返す
+
+        stop()（や Ctrl-C）で止めた場合は、実行中の記事だけを終わらせてチェックポイントを保存する。
+        """
+        slots = threading.BoundedSemaphore(self.concurrency * 2)
+        reporter = threading.Thread(target=self._report_periodically, name="backfill-progress", daemon=True)
+        reporter.start()
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="backfill")
+        try:
+            page = self.checkpoint.next_page
+            while page and not self._stop.is_set():
+                data = self._list_page(page)
+                if data is None:
+                    break
+                if self.total_count is None:
+                    self.total_count = data.get("total_count")
+                posts = {post["number"]: post for post in data.get("posts", [])}
+                for number in self.checkpoint.begin_page(page, list(posts)):
+                    if self.limit and self.submitted >= self.limit:
+                        break
+                    # 同時に抱える記事を concurrency の2倍までにし、一覧だけが先に進みすぎないようにする
+                    while not self._stop.is_set() and not slots.acquire(timeout=0.5):
+                        pass
+                    if self._stop.is_set():
+                        break
+                    self.submitted += 1
+                    future = executor.submit(self._process, page, posts[number])
+                    future.add_done_callback(lambda _: slots.release())
+                if self.limit and self.submitted >= self.limit:
+                    break
+                page = data.get("next_page")
+        except KeyboardInterrupt:
+            self.stop()
+        finally:
+            # 止められた場合は待機中の記事を取り消す（未処理のまま残り、次の実行で要約する）
+            executor.shutdown(wait=True, cancel_futures=self._stop.is_set())
+            self._stop.set()
+            self._save()
+            self._log_progress(final=True)
+        return self.summary()
+
+    def _list_page(self, page: int) -> Optional[Dict]:
+        """記事一覧を1ページ取得する（esa のレート制限で断られたらリセットまで待つ。その間に止められたら None）"""
+        while True:
+            try:
+                return self.esa_client.list_posts(self.query, page=page, per_page=self.per_page)
+            except EsaError as e:
+                if not e.retryable or e.retry_after is None:
+                    raise
+                logger.warning(f"esa APIのレート制限のため {e.retry_after:.0f}秒待ってから {page}ページ目を取得します")
+                if self._stop.wait(e.retry_after):
+                    return None
+
+    def stop(self):
+        """新しい記事の要約を止める（実行中の記事は終わらせてからチェックポイントを保存する）"""
+        if not self._stop.is_set():
+            logger.warning("中断を受け付けました。処理中の記事を終えてからチェックポイントを保存します")
+            self.interrupted = True
+        self._stop.set()
+
+    def _process(self, page: int, post: Dict):
+        number = post.get("number")
+        with tracer.start_trace("backfill.post", post_number=number, page=page):
+            try:
+                result = self._summarize_and_post(post)
+                self.checkpoint.finish(page, number, result)
+            except Exception as e:
+                logger.error(f"一括要約エラー (#{number}): {e}", exc_info=not isinstance(e, UpstreamError))
+                self.checkpoint.finish(page, number, FAILED, str(e))
+        with self._lock:
+            self.completed += 1
+        # 投稿する場合は処理済みの記事を再開時に投稿し直さないよう1件ごとに、そうでなければ進捗の出力に合わせて保存する
+        if self.channel_ids:
+            self._save()
+
+    def _summarize_and_post(self, post: Dict) -> str:
+        """1記事を要約して保存し、投稿先があれば投稿する
+
+        投稿済みのチャンネルは飛ばし、投稿するたびにチェックポイントに記録する（一部のチャンネルで
+        失敗しても残りには投稿し、記事は失敗として次の実行で失敗したチャンネルにだけ投稿し直す）。
+        """
+        body = post.get("body_md") or ""
+        if not body:
+            return EMPTY
+        summary, result = self._summarize(post)
+        number = post.get("number")
+        delivered = self.checkpoint.delivered_channels(number)
+        errors = []
+        for channel_id in self.channel_ids:
+            if channel_id in delivered:
+                continue
+            payload = self._format_post_summary(post, summary, post.get("url", ""), self.length, self.style)
+            try:
+                call_with_retry(
+                    lambda: self.slack_client.chat_postMessage(channel=channel_id, **payload), breakers["slack"], classify_slack_error
+                )
+            except UpstreamError as e:
+                errors.append(f"{channel_id}: {e}")
+                continue
+            self.checkpoint.record_delivery(number, channel_id)
+            self.checkpoint.add("posted", 1)
+            self._save()
+        if errors:
+            raise SlackError(f"投稿に失敗したチャンネルがあります（{' / '.join(errors)}）")
+        return result
+
+    def _summarize(self, post: Dict):
+        """要約キャッシュ（またはスナップショット）に同じ版の要約があれば使い、無ければ全文を要約する"""
+        cache_key = self._summary_cache_key(post, self.length, self.style)
+        cached = self.summary_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            return cached, REUSED
+        snapshot_key = self._snapshot_key(post, self.length, self.style)
+        snapshot = self.post_snapshots.get(snapshot_key) if snapshot_key else None
+        plan = self._plan_update(post, snapshot)
+        if plan.mode == UNCHANGED:
+            summary, result = snapshot.summary, REUSED
+        else:
+            summary = self.gemini_client.summarize(
+                post.get("name", "タイトルなし"), post.get("body_md", ""), post.get("category", ""), self.length, self.style
+            )
+            summary, result = self._normalize_numbering(summary), SUMMARIZED
+            if snapshot_key and summary:
+                self.post_snapshots.set(snapshot_key, self._next_snapshot(post, None, plan._replace(mode=FULL), summary))
+        if cache_key and summary:
+            self.summary_cache.set(cache_key, summary)
+        logger.info(f"一括要約: #{post.get('number')} {post.get('name', '')} ({post_revision(post)}, {result})")
+        return summary, result
+
+    def _save(self):
+        usage = self.gemini_client.usage()
+        for field, base in self._token_totals.items():
+            self.checkpoint.totals[field] = base + usage[field] - self._usage_base[field]
+        self.checkpoint.save()
+
+    def summary(self) -> Dict[str, int]:
+        """累計の集計（チェックポイントから再開した場合は前回までの分を含む）"""
+        totals = dict(self.checkpoint.totals)
+        totals.update(done=len(self.checkpoint.done), failed=len(self.checkpoint.failed), total=self.total_count or 0)
+        return totals
+
+    def _report_periodically(self):
+        while not self._stop.wait(self.progress_interval):
+            self._save()
+            self._log_progress()
+
+    def _log_progress(self, final: bool = False):
+        """処理速度・残り件数の見込み時間・トークン数をログに出す"""
+        totals = self.summary()
+        elapsed = max(time.monotonic() - self._started_at, 1e-6)
+        rate = self.completed / elapsed * 60
+        remaining = max(totals["total"] - totals["done"], 0) if self.total_count is not None else None
+        if remaining is not None and rate > 0:
+            eta = _format_duration(remaining / rate * 60)
+        else:
+            eta = "不明"
+        progress = f"{totals['done']}/{totals['total']}件" if self.total_count is not None else f"{totals['done']}件"
+        logger.info(
+            f"{'一括要約完了' if final else '一括要約の進捗'}: {progress} "
+            f"(要約 {totals[SUMMARIZED]} / 既存の要約 {totals[REUSED]} / 本文なし {totals[EMPTY]} / 失敗 {totals['failed']} / 投稿 {totals['posted']}) "
+            f"| 今回 {self.completed}件 {rate:.1f}件/分 | 残り約 {eta} "
+            f"| トークン 入力 {totals['prompt_tokens']:,} / 出力 {totals['output_tokens']:,}"
+        )
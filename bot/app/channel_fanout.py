@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from app.tracing import in_current_context, tracer
+from config.settings import SLACK_FANOUT_PARALLELISM
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelDelivery(NamedTuple):
+    """1チャンネル分の投稿結果"""
+    channel: str
+    ok: bool
+    latency: float
+    result: Any = None
+    error: Optional[str] = None
+
+
+class DeliveryReport:
+    """全チャンネルへの投稿結果（チャンネルの指定順）"""
+
+    def __init__(self, deliveries: List[ChannelDelivery], elapsed: float):
+        self.deliveries = deliveries
+        self.elapsed = elapsed
+
+    @property
+    def succeeded(self) -> List[ChannelDelivery]:
+        return [d for d in self.deliveries if d.ok]
+
+    @property
+    def failed(self) -> List[ChannelDelivery]:
+        return [d for d in self.deliveries if not d.ok]
+
+    def summary(self) -> Dict:
+        """ログ・メトリクス用の集計"""
+        latencies = [d.latency for d in self.deliveries]
+        return {
+            "channels": len(self.deliveries),
+            "succeeded": len(self.succeeded),
+            "failed": len(self.failed),
+            "elapsed": round(self.elapsed, 3),
+            "max_latency": round(max(latencies), 3) if latencies else 0.0,
+            "errors": {d.channel: d.error for d in self.failed},
+        }
+
+
+class ChannelFanout:
+    """同じ内容を複数チャンネルへ並列に投稿する
+
+    並列数は max_parallel で抑える。1チャンネルの失敗は他のチャンネルに影響させず、
+    結果は DeliveryReport にチャンネルごとのレイテンシと成否として残す。
+    再試行は send 側（ブレーカー付きの Slack 呼び出し）で行う。
+    """
+
+    def __init__(self, max_parallel: int = SLACK_FANOUT_PARALLELISM):
+        self.max_parallel = max(1, max_parallel)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix="slack-fanout")
+
+    def deliver(self, send: Callable[[str], Any], channels: Iterable[str]) -> DeliveryReport:
+        """各チャンネルについて send(channel) を呼び、全件の完了を待つ"""
+        channels = list(channels)
+        start = time.monotonic()
+        if len(channels) <= 1:
+            # 1件なら呼び出し元のスレッドでそのまま送る
+            deliveries = [self._deliver_one(send, channel) for channel in channels]
+        else:
+            # 各チャンネルの投稿も呼び出し元のトレースの区間として記録する
+            futures = [self._executor.submit(in_current_context(self._deliver_one), send, channel) for channel in channels]
+            deliveries = [future.result() for future in futures]
+        return DeliveryReport(deliveries, time.monotonic() - start)
+
+    def _deliver_one(self, send: Callable[[str], Any], channel: str) -> ChannelDelivery:
+        start = time.monotonic()
+        try:
+            with tracer.span("slack.deliver", channel=channel):
+                result = send(channel)
+        except Exception as e:
+            latency = time.monotonic() - start
+            logger.error(f"チャンネル {channel} への投稿失敗 ({latency:.2f}秒): {e}")
+            return ChannelDelivery(channel, False, latency, error=str(e))
+        return ChannelDelivery(channel, True, time.monotonic() - start, result=result)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+async def deliver_async(send: Callable[[str], Awaitable], channels: Iterable[str],
+                        parallelism: int = SLACK_FANOUT_PARALLELISM) -> DeliveryReport:
+    """ChannelFanout.deliver() のイベントループ版（send(channel) はコルーチンを返す）"""
+    channels = list(channels)
+    semaphore = asyncio.Semaphore(max(1, parallelism))
+    start = time.monotonic()
+
+    async def deliver_one(channel: str) -> ChannelDelivery:
+        async with semaphore:
+            sent_at = time.monotonic()
+            try:
+                with tracer.span("slack.deliver", channel=channel):
+                    result = await send(channel)
+            except Exception as e:
+                latency = time.monotonic() - sent_at
+                logger.error(f"チャンネル {channel} への投稿失敗 ({latency:.2f}秒): {e}")
+                return ChannelDelivery(channel, False, latency, error=str(e))
+            return ChannelDelivery(channel, True, time.monotonic() - sent_at, result=result)
+
+    deliveries = await asyncio.gather(*(deliver_one(channel) for channel in channels))
+    return DeliveryReport(list(deliveries), time.monotonic() - start)
@@ -1,19 +1,27 @@
 import time
 import logging
 from contextlib import contextmanager
+from app.metrics import stage_errors, stage_seconds
+from app.tracing import tracer
 
 logger = logging.getLogger("debug_utils")
 
 
 @contextmanager
-def step(name: str):
-    start = time.time()
+def step(name: str, **attributes):
+    """処理段階の所要時間を計測し、メトリクス（stage_duration_seconds）とトレースの区間に記録する"""
+    start = time.perf_counter()
     logger.debug(f"[STEP start] {name}")
     try:
-        yield
+        with tracer.span(name, **attributes) as span:
+            yield span
+    except BaseException:
+        stage_errors.inc(stage=name)
+        raise
     finally:
-        elapsed = (time.time() - start) * 1000
-        logger.debug(f"[STEP end] {name} elapsed={elapsed:.2f}ms")
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=name)
+        logger.debug(f"[STEP end] {name} elapsed={elapsed * 1000:.2f}ms")
 
 
 def log_kv(prefix: str, **kwargs):
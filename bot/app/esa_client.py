@@ -1,13 +1,30 @@
 import requests
 import logging
+import re
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional, Dict
-from config.settings import ESA_ACCESS_TOKEN, ESA_TEAM_NAME, ESA_API_BASE
+from requests.adapters import HTTPAdapter
+from app.rate_limiter import RateLimiter, rate_limiter as default_rate_limiter
+from app.tracing import tracer
+from app.resilience import CircuitBreaker, EsaError, RetryPolicy, breakers, call_with_retry, classify_esa_error
+from config.settings import (
+    ESA_ACCESS_TOKEN, ESA_TEAM_NAME, ESA_API_BASE,
+    ESA_CONNECT_TIMEOUT, ESA_READ_TIMEOUT, ESA_POOL_SIZE, ESA_POST_CACHE_SIZE,
+    ESA_RATE_LIMIT_RESERVE, ESA_RATE_LIMIT_MAX_WAIT,
+)
 
 logger = logging.getLogger(__name__)
 
+_POST_NUMBER_PATTERN = re.compile(r'/posts/(\d+)')
+
 
 class EsaClient:
-    def __init__(self):
+    def __init__(self, rate_limiter: RateLimiter = None, breaker: CircuitBreaker = None, retry_policy: RetryPolicy = None):
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        self.breaker = breaker or breakers["esa"]
+        self.retry_policy = retry_policy
         self.token = ESA_ACCESS_TOKEN
         self.team_name = ESA_TEAM_NAME
         self.base_url = f"{ESA_API_BASE}/teams/{self.team_name}"
@@ -15,32 +32,202 @@ class EsaClient:
             "Authorization": f"Bearer {self.token}",
             "Content-Type": "application/json"
         }
-    
+        # keep-alive で接続を使い回す（毎回のTLSハンドシェイクを避ける）
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=ESA_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(self.headers)
+        self.timeout = (ESA_CONNECT_TIMEOUT, ESA_READ_TIMEOUT)
+        # 記事キャッシュ: post_number -> {"etag", "last_modified", "data"}
+        self._post_cache: "OrderedDict[int, Dict]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_revalidated = 0
+        # esa のレート制限（75リクエスト/15分）の状態
+        self._rate_lock = threading.Lock()
+        self.rate_limit_limit: Optional[int] = None
+        self.rate_limit_remaining: Optional[int] = None
+        self.rate_limit_reset: Optional[float] = None
+
     def get_post_by_number(self, post_number: int) -> Optional[Dict]:
-        """記事番号から記事を取得"""
+        """記事番号から記事を取得（存在しない記事は None、上流の失敗は EsaError を送出）"""
+        with tracer.span("esa.get_post", post_number=post_number) as span:
+            post = self._get_post_by_number(post_number, span)
+            if post:
+                span.set_attributes(body_length=len(post.get("body_md") or ""), revision=post.get("revision_number"))
+            return post
+
+    def _get_post_by_number(self, post_number: int, span) -> Optional[Dict]:
         url = f"{self.base_url}/posts/{post_number}"
-        try:
-            logger.debug(f"esa APIリクエスト: {url}")
-            response = requests.get(url, headers=self.headers)
+        cached = self._get_cached(post_number)
+        headers = self._conditional_headers(cached)
+        self._check_rate_limit()
+        
+        def attempt():
+            self._throttle()
+            self.rate_limiter.acquire("esa")
+            logger.debug(f"esa APIリクエスト: {url} (条件付き: {bool(headers)})")
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            self._update_rate_limit(response)
+            if response.status_code != 404:
+                response.raise_for_status()
+            return response
+        
+        response = call_with_retry(attempt, self.breaker, classify_esa_error, self.retry_policy, f"(記事番号: {post_number})")
+        data = response.json() if response.status_code not in (304, 404) else None
+        return self._post_from_response(post_number, response.status_code, response, data, cached, bool(headers), span)
+
+    def list_posts(self, q: str = "", page: int = 1, per_page: int = 100, sort: str = "number", order: str = "asc") -> Dict:
+        """記事一覧を1ページ取得（q は esa の検索クエリ、失敗は EsaError を送出）
+
+        戻り値は esa の応答そのまま（posts・next_page・total_count など。各記事は body_md を含む）。
+        """
+        url = f"{self.base_url}/posts"
+        params = {"q": q, "page": page, "per_page": per_page, "sort": sort, "order": order}
+        self._check_rate_limit()
+        
+        def attempt():
+            self._throttle()
+            self.rate_limiter.acquire("esa")
+            logger.debug(f"esa APIリクエスト: {url} {params}")
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            self._update_rate_limit(response)
             response.raise_for_status()
-            logger.info(f"記事取得成功: #{post_number}")
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"esa API Error (記事番号: {post_number}): {e}")
+            return response
+        
+        with tracer.span("esa.list_posts", page=page, per_page=per_page) as span:
+            response = call_with_retry(attempt, self.breaker, classify_esa_error, self.retry_policy, f"(記事一覧: {page}ページ)")
+            data = response.json()
+            span.set_attributes(posts=len(data.get("posts", [])), total_count=data.get("total_count"),
+                                rate_limit_remaining=self.rate_limit_remaining)
+        logger.info(f"記事一覧取得成功: {page}ページ ({len(data.get('posts', []))}件 / 全{data.get('total_count')}件)")
+        return data
+
+    def _conditional_headers(self, cached: Optional[Dict]) -> Dict[str, str]:
+        """前回取得から変更が無ければ 304 が返り、本文の再転送を省けるようにする"""
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
+
+    def _post_from_response(self, post_number: int, status: int, response, data: Optional[Dict],
+                            cached: Optional[Dict], conditional: bool, span) -> Optional[Dict]:
+        """応答のステータスに応じて記事を返す（404 は None、304 はキャッシュ）"""
+        span.set_attributes(status_code=status, conditional=conditional, rate_limit_remaining=self.rate_limit_remaining)
+        if status == 404:
+            logger.warning(f"記事が見つかりません: #{post_number}")
             return None
-    
+        if status == 304 and cached:
+            self.cache_revalidated += 1
+            logger.info(f"記事取得成功（未変更・キャッシュ利用）: #{post_number}")
+            return cached["data"]
+        self._store_cached(post_number, response, data)
+        logger.info(f"記事取得成功: #{post_number}")
+        return data
+
+    def _get_cached(self, post_number: int) -> Optional[Dict]:
+        with self._cache_lock:
+            entry = self._post_cache.get(post_number)
+            if entry is not None:
+                self._post_cache.move_to_end(post_number)
+            return entry
+
+    def _store_cached(self, post_number: int, response, data: Dict):
+        """再検証に使えるヘッダが返ってきた記事だけキャッシュする"""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if ESA_POST_CACHE_SIZE <= 0 or not (etag or last_modified):
+            return
+        with self._cache_lock:
+            self._post_cache[post_number] = {"etag": etag, "last_modified": last_modified, "data": data}
+            self._post_cache.move_to_end(post_number)
+            while len(self._post_cache) > ESA_POST_CACHE_SIZE:
+                self._post_cache.popitem(last=False)
+
+    def _update_rate_limit(self, response):
+        """X-RateLimit-* ヘッダから残りリクエスト数を記録"""
+        try:
+            limit = response.headers.get("X-RateLimit-Limit")
+            remaining = response.headers.get("X-RateLimit-Remaining")
+            reset = response.headers.get("X-RateLimit-Reset")
+            with self._rate_lock:
+                if limit is not None:
+                    self.rate_limit_limit = int(limit)
+                if remaining is not None:
+                    self.rate_limit_remaining = int(remaining)
+                if reset is not None:
+                    self.rate_limit_reset = float(reset)
+        except (TypeError, ValueError):
+            logger.debug("X-RateLimit ヘッダの解析に失敗")
+
+    def rate_limit_delay(self) -> float:
+        """次のリクエストまでに空けるべき秒数
+
+        残りが ESA_RATE_LIMIT_RESERVE 以下になったら、リセットまでの時間を
+        残り回数で割った間隔で送るようにし、上限に達する前に速度を落とす。
+        """
+        with self._rate_lock:
+            remaining = self.rate_limit_remaining
+            reset = self.rate_limit_reset
+        if remaining is None or reset is None:
+            return 0.0
+        until_reset = reset - time.time()
+        if until_reset <= 0:
+            return 0.0
+        if remaining <= 0:
+            delay = until_reset
+        elif remaining <= ESA_RATE_LIMIT_RESERVE:
+            delay = until_reset / remaining
+        else:
+            return 0.0
+        return delay
+
+    def _check_rate_limit(self):
+        """待つ時間が ESA_RATE_LIMIT_MAX_WAIT を超えるなら、ワーカーを塞がず再試行できる EsaError を送出する
+
+        上流の障害ではないのでブレーカーには数えない（call_with_retry の外で呼ぶ）。
+        retry_after にリセットまでの秒数を入れるので、ジョブキューはその後に再実行する。
+        """
+        delay = self.rate_limit_delay()
+        if delay > ESA_RATE_LIMIT_MAX_WAIT:
+            raise EsaError(
+                f"esa APIのレート制限のため {delay:.0f}秒後まで取得を見送ります (残り: {self.rate_limit_remaining})",
+                retryable=True, retry_after=delay, status=429,
+            )
+
+    def _throttle(self):
+        delay = self._throttle_delay()
+        if delay > 0:
+            time.sleep(delay)
+            self._consume_after_throttle()
+
+    def _throttle_delay(self) -> float:
+        # 長い待ちは _check_rate_limit で断っているので、ここで待つのは再試行中に残りが減った場合も上限まで
+        delay = min(self.rate_limit_delay(), ESA_RATE_LIMIT_MAX_WAIT)
+        if delay > 0:
+            logger.warning(f"esa APIのレート制限が近いため {delay:.1f}秒待機します (残り: {self.rate_limit_remaining})")
+        return delay
+
+    def _consume_after_throttle(self):
+        with self._rate_lock:
+            # 待機した分を消費済みとして扱い、同時に待っていた他スレッドも間隔を空ける
+            if self.rate_limit_remaining is not None and self.rate_limit_remaining > 0:
+                self.rate_limit_remaining -= 1
+
     def extract_post_number_from_url(self, url: str) -> Optional[int]:
         """esaのURLから記事番号を抽出"""
         # https://team.esa.io/posts/123 -> 123
-        import re
-        match = re.search(r'/posts/(\d+)', url)
+        match = _POST_NUMBER_PATTERN.search(url)
         if match:
             return int(match.group(1))
         return None
-    
+
     def get_post_from_url(self, url: str) -> Optional[Dict]:
         """URLから記事を取得"""
         post_number = self.extract_post_number_from_url(url)
         if post_number:
             return self.get_post_by_number(post_number)
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from config.settings import EVENT_DEDUP_TTL, EVENT_DEDUP_MAX_ENTRIES, EVENT_DEDUP_PATH
+
+logger = logging.getLogger(__name__)
+
+
+def event_dedup_keys(event_type: str, event: Dict, body: Optional[Dict] = None) -> List[str]:
+    """イベントを識別するキー（event_id / client_msg_id / channel+ts）を返す
+
+    メンションは message と app_mention の両イベントで同じ ts を持つため、
+    イベント種別ごとに名前空間を分ける。
+    """
+    keys = []
+    event_id = (body or {}).get("event_id")
+    if event_id:
+        keys.append(f"{event_type}:id:{event_id}")
+    client_msg_id = event.get("client_msg_id")
+    if client_msg_id:
+        keys.append(f"{event_type}:msg:{client_msg_id}")
+    channel = event.get("channel")
+    ts = event.get("ts")
+    if channel and ts:
+        keys.append(f"{event_type}:ts:{channel}:{ts}")
+    return keys
+
+
+def _digest(key: str) -> bytes:
+    # 12バイトの固定長ダイジェストでメモリ使用量を抑える
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=12).digest()
+
+
+class EventDeduplicator:
+    """Slackの再送や重複イベントを弾くためのTTL付き既読ストア
+
+    メモリ上は挿入順の OrderedDict（TTLが一定なので先頭ほど古い）で保持し、
+    判定・登録は O(1)。path を指定すると SQLite にも書き込み、再起動後も重複を検出できる。
+    """
+
+    def __init__(
+        self,
+        ttl: int = EVENT_DEDUP_TTL,
+        max_entries: int = EVENT_DEDUP_MAX_ENTRIES,
+        path: str = EVENT_DEDUP_PATH,
+    ):
+        self.ttl = max(1, ttl)
+        self.max_entries = max(1, max_entries)
+        self._seen: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.duplicates = 0
+        self.accepted = 0
+        if path:
+            self._open_disk(path)
+
+    def _open_disk(self, path: str):
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS seen_events (key BLOB PRIMARY KEY, expires_at REAL NOT NULL)")
+            conn.execute("DELETE FROM seen_events WHERE expires_at < ?", (time.time(),))
+            conn.commit()
+            self._conn = conn
+            logger.info(f"イベント重複判定ストア(SQLite)を開きました: {path}")
+        except sqlite3.Error as e:
+            logger.warning(f"イベント重複判定ストア(SQLite)を開けないためメモリのみで動作します: {path}: {e}")
+            self._conn = None
+
+    def is_duplicate(self, keys: Iterable[str]) -> bool:
+        """既に見たイベントなら True。初見ならキーを登録して False を返す"""
+        digests = [_digest(k) for k in keys]
+        if not digests:
+            return False
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            if any(self._seen.get(d, 0) > now for d in digests) or self._seen_on_disk(digests, now):
+                self.duplicates += 1
+                return True
+            expires_at = now + self.ttl
+            for d in digests:
+                self._seen[d] = expires_at
+                self._seen.move_to_end(d)
+            while len(self._seen) > self.max_entries:
+                self._seen.popitem(last=False)
+            self._mark_on_disk(digests, expires_at)
+            self.accepted += 1
+            return False
+
+    def _prune(self, now: float):
+        """期限切れのキーを先頭から削除（償却 O(1)）"""
+        while self._seen:
+            key, expires_at = next(iter(self._seen.items()))
+            if expires_at > now:
+                break
+            self._seen.popitem(last=False)
+
+    def _seen_on_disk(self, digests: List[bytes], now: float) -> bool:
+        if self._conn is None:
+            return False
+        try:
+            placeholders = ",".join("?" for _ in digests)
+            row = self._conn.execute(
+                f"SELECT 1 FROM seen_events WHERE key IN ({placeholders}) AND expires_at > ? LIMIT 1",
+                (*digests, now),
+            ).fetchone()
+            return row is not None
+        except sqlite3.Error as e:
+            logger.warning(f"イベント重複判定ストアの読み込みに失敗: {e}")
+            return False
+
+    def _mark_on_disk(self, digests: List[bytes], expires_at: float):
+        if self._conn is None:
+            return
+        try:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO seen_events (key, expires_at) VALUES (?, ?)",
+                [(d, expires_at) for d in digests],
+            )
+            # 定期的に期限切れ行を掃除する
+            if self.accepted % 100 == 0:
+                self._conn.execute("DELETE FROM seen_events WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"イベント重複判定ストアの書き込みに失敗: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """受理数・重複として破棄した数・保持中のキー数"""
+        return {"accepted": self.accepted, "duplicates": self.duplicates, "entries": len(self._seen)}
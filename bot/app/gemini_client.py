@@ -1,29 +1,23 @@
-import google.generativeai as genai
+import hashlib
+import json
 import logging
-from config.settings import GEMINI_API_KEY, GEMINI_MODEL, SUMMARY_LENGTHS, SUMMARY_STYLES
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.markdown_sections import chunk_markdown
+from app.markdown_preprocess import preprocess_markdown, preprocess_signature, estimate_tokens
+from app.section_diff import ADDED, MODIFIED, REMOVED, SectionChange
+from app.rate_limiter import RateLimiter, rate_limiter as default_rate_limiter
+from app.tracing import in_current_context, set_attributes, tracer
+from app.resilience import CircuitBreaker, RetryPolicy, breakers, call_with_retry, classify_gemini_error
+from config.settings import (
+    GEMINI_API_KEY, GEMINI_MODEL, GEMINI_API_ENDPOINT, SUMMARY_LENGTHS, SUMMARY_STYLES, SUMMARY_PREPROCESS_ENABLED,
+    SUMMARY_MAP_REDUCE_THRESHOLD, SUMMARY_CHUNK_SIZE, SUMMARY_MAP_PARALLELISM,
+)
 
 logger = logging.getLogger(__name__)
 
-
-class GeminiClient:
-    def __init__(self):
-        genai.configure(api_key=GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(GEMINI_MODEL)
-    
-    def summarize(
-        self, 
-        title: str, 
-        body: str, 
-        category: str = "", 
-        length: str = "medium",
-        style: str = "bullet"
-    ) -> str:
-        """ドキュメントを要約"""
-        
-        length_instruction = SUMMARY_LENGTHS.get(length, SUMMARY_LENGTHS["medium"])
-        style_instruction = SUMMARY_STYLES.get(style, SUMMARY_STYLES["bullet"])
-        
-        prompt = f"""
+PROMPT_INSTRUCTIONS = """
 # ペルソナ設定
 あなたは、AI分野の研究室にいる優秀なアシスタントです。
 
@@ -50,24 +44,397 @@ class GeminiClient:
 # 4. 出力形式 (Format)
 * **長さ**: {length_instruction}
 * **形式**: {style_instruction}
+"""
 
+PROMPT_TEMPLATE = PROMPT_INSTRUCTIONS + """
 【タイトル】
 {title}
 
 【カテゴリ】
-{category if category else "なし"}
+{category}
 
 【本文】
 {body}
 
 上記の内容を{style_instruction}で要約してください:
 """
+
+# 複数記事をまとめて要約するプロンプト（指示部分は1回だけ送る）
+BATCH_PROMPT_TEMPLATE = PROMPT_INSTRUCTIONS + """
+# 5. 複数文書の扱い
+以下には {count} 件の文書が含まれています。文書ごとに独立して要約し、他の文書の内容を混ぜないでください。
+出力は次の形式のJSON配列のみとしてください（各文書につき1要素、summary は Markdown 文字列）:
+[{{"id": "文書ID", "summary": "要約"}}]
+
+{documents}
+"""
+
+BATCH_DOCUMENT_TEMPLATE = """=== 文書ID: {doc_id} ===
+【タイトル】
+{title}
+
+【カテゴリ】
+{category}
+
+【本文】
+{body}
+"""
+
+# 長文記事の分割要約: 各チャンクから要点を抽出するプロンプト（map）
+MAP_PROMPT_TEMPLATE = """
+あなたは、AI分野の研究室にいる優秀なアシスタントです。
+以下は長い技術文書「{title}」の一部（{index}/{total}）です。
+後で全体の要約にまとめるため、このパートの要点を箇条書きで抽出してください。
+
+* 提案手法の核心、実験設定、主要な結果（数値データや傾向）、結論、行動項目・今後の課題を省略しないこと
+* 専門用語はそのまま使用すること
+* 前置きや挨拶は出力せず、箇条書きのみを出力すること
+
+【本文（{index}/{total}）】
+{body}
+"""
+
+# 編集された記事の差分要約: 前回の要約と変更されたセクションだけを渡して要約を更新させる
+INCREMENTAL_PROMPT_TEMPLATE = PROMPT_INSTRUCTIONS + """
+# 5. 更新の指示
+以下の文書は前回要約した後に編集されました。前回の要約と、編集で変わったセクションだけを示します。
+前回の要約を土台に、変更内容を反映した最新の要約を作り直してください。
+* 変更のないセクションに由来する内容は前回の要約のまま残してください。
+* [削除] のセクションに由来する内容は要約から取り除いてください。
+* 「更新しました」などの説明は出力せず、更新後の要約だけを出力してください。
+
+【タイトル】
+{title}
+
+【カテゴリ】
+{category}
+
+【前回の要約】
+{previous_summary}
+
+【変更されたセクション】
+{changes}
+
+上記を反映した最新の要約を{style_instruction}で出力してください:
+"""
+
+# 差分要約で変更の種類ごとに付けるラベル
+CHANGE_LABELS = {ADDED: "追加", MODIFIED: "変更", REMOVED: "削除"}
+
+# 分割要約の reduce 段で本文の代わりに渡す前置き
+REDUCE_BODY_HEADER = "（以下は長い文書を分割し、各パートの要点を抽出したものです。これらを統合して文書全体を要約してください）"
+
+# プロンプトや前処理を変更したらキャッシュ済みの要約が使われないよう、そのハッシュをバージョンとする
+PROMPT_VERSION = hashlib.sha256(
+    (PROMPT_TEMPLATE + BATCH_PROMPT_TEMPLATE + BATCH_DOCUMENT_TEMPLATE + MAP_PROMPT_TEMPLATE
+     + INCREMENTAL_PROMPT_TEMPLATE + REDUCE_BODY_HEADER + preprocess_signature()).encode("utf-8")
+).hexdigest()[:12]
+
+
+def build_prompt(title: str, body: str, category: str = "", length: str = "medium", style: str = "bullet") -> str:
+    """要約用プロンプトを組み立てる"""
+    length_instruction = SUMMARY_LENGTHS.get(length, SUMMARY_LENGTHS["medium"])
+    style_instruction = SUMMARY_STYLES.get(style, SUMMARY_STYLES["bullet"])
+    return PROMPT_TEMPLATE.format(
+        title=title,
+        category=category if category else "なし",
+        body=body,
+        length_instruction=length_instruction,
+        style_instruction=style_instruction,
+    )
+
+
+def build_batch_prompt(documents: List[Tuple[str, str, str, str]], length: str = "medium", style: str = "bullet") -> str:
+    """複数記事をまとめて要約するプロンプトを組み立てる（documents は (id, title, category, body) のリスト）"""
+    length_instruction = SUMMARY_LENGTHS.get(length, SUMMARY_LENGTHS["medium"])
+    style_instruction = SUMMARY_STYLES.get(style, SUMMARY_STYLES["bullet"])
+    rendered = "\n".join(
+        BATCH_DOCUMENT_TEMPLATE.format(doc_id=doc_id, title=title, category=category if category else "なし", body=body)
+        for doc_id, title, category, body in documents
+    )
+    return BATCH_PROMPT_TEMPLATE.format(
+        count=len(documents),
+        documents=rendered,
+        length_instruction=length_instruction,
+        style_instruction=style_instruction,
+    )
+
+
+def parse_batch_response(text: str) -> Dict[str, str]:
+    """バッチ要約の応答(JSON配列)を {文書ID: 要約} に変換する"""
+    text = (text or "").strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    items = json.loads(text)
+    if isinstance(items, dict):
+        items = items.get("summaries", [])
+    return {
+        str(item["id"]): item["summary"]
+        for item in items
+        if isinstance(item, dict) and item.get("id") is not None and isinstance(item.get("summary"), str)
+    }
+
+
+def build_map_prompt(title: str, chunk: str, index: int, total: int) -> str:
+    """分割要約（map）用のプロンプトを組み立てる"""
+    return MAP_PROMPT_TEMPLATE.format(title=title, body=chunk, index=index, total=total)
+
+
+def build_incremental_prompt(
+    title: str,
+    previous_summary: str,
+    changes: List[SectionChange],
+    category: str = "",
+    length: str = "medium",
+    style: str = "bullet",
+) -> str:
+    """差分要約用のプロンプトを組み立てる（changes の本文は前処理済みのもの）"""
+    length_instruction = SUMMARY_LENGTHS.get(length, SUMMARY_LENGTHS["medium"])
+    style_instruction = SUMMARY_STYLES.get(style, SUMMARY_STYLES["bullet"])
+    rendered = []
+    for change in changes:
+        heading = change.heading or "（見出しなし）"
+        if change.kind == REMOVED:
+            # 削除されたセクションは何が消えたかが分かれば足りるので、本文は送らない
+            rendered.append(f"[{CHANGE_LABELS[change.kind]}] {heading}")
+        else:
+            rendered.append(f"[{CHANGE_LABELS[change.kind]}] {heading}\n{change.new_text.strip()}")
+    return INCREMENTAL_PROMPT_TEMPLATE.format(
+        title=title,
+        category=category if category else "なし",
+        previous_summary=previous_summary.strip(),
+        changes="\n\n".join(rendered),
+        length_instruction=length_instruction,
+        style_instruction=style_instruction,
+    )
+
+
+def _load_model(model_name: str):
+    import google.generativeai as genai
+    if GEMINI_API_ENDPOINT:
+        # gRPC ではなく REST で指定の接続先（ローカルの疑似サーバなど）に送る
+        genai.configure(api_key=GEMINI_API_KEY, transport="rest", client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+    else:
+        genai.configure(api_key=GEMINI_API_KEY)
+    return genai.GenerativeModel(model_name)
+
+
+class GeminiClient:
+    def __init__(self, rate_limiter: RateLimiter = None, breaker: CircuitBreaker = None, retry_policy: RetryPolicy = None):
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        self.breaker = breaker or breakers["gemini"]
+        self.retry_policy = retry_policy
+        # google.generativeai の読み込みには約1秒かかるため、モデルは初回の利用（または warm_up()）まで作らない
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.model_name = GEMINI_MODEL
+        self.prompt_version = PROMPT_VERSION
+        self.map_reduce_threshold = SUMMARY_MAP_REDUCE_THRESHOLD
+        self.chunk_size = SUMMARY_CHUNK_SIZE
+        self.map_parallelism = SUMMARY_MAP_PARALLELISM
+        self.preprocess_enabled = SUMMARY_PREPROCESS_ENABLED
+        # 前処理で削減した量の累計
+        self.preprocess_saved_chars = 0
+        self.preprocess_saved_tokens = 0
+        # 送受信したトークン数の累計（応答に使用量が無ければ入力は推定値）
+        self._usage_lock = threading.Lock()
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+    
+    @property
+    def model(self):
+        """genai のモデル（初回アクセス時に SDK を読み込んで作る）"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = _load_model(self.model_name)
+        return self._model
+    
+    @model.setter
+    def model(self, model):
+        self._model = model
+    
+    def warm_up(self):
+        """SDK とモデルを読み込んでおく（接続後にバックグラウンドで呼び、最初の要約を待たせない）"""
+        return self.model
+    
+    def summarize(
+        self, 
+        title: str, 
+        body: str, 
+        category: str = "", 
+        length: str = "medium",
+        style: str = "bullet"
+    ) -> str:
+        """ドキュメントを要約（失敗時は GeminiError / CircuitOpenError を送出）"""
         
+        body = self._preprocess(title, body)
+        logger.debug(f"Gemini API呼び出し: {title} (長さ: {length}, スタイル: {style})")
+        map_reduce = self.map_reduce_threshold > 0 and len(body) > self.map_reduce_threshold
+        set_attributes(preprocessed_length=len(body), map_reduce=map_reduce)
+        if map_reduce:
+            summary = self._summarize_map_reduce(title, body, category, length, style)
+        else:
+            summary = self._generate(build_prompt(title, body, category, length, style))
+        logger.info(f"要約生成完了: {title}")
+        return summary
+    
+    def summarize_incremental(
+        self,
+        title: str,
+        previous_summary: str,
+        changes: List[SectionChange],
+        category: str = "",
+        length: str = "medium",
+        style: str = "bullet"
+    ) -> str:
+        """前回の要約と変更されたセクションから要約を更新する（失敗時は GeminiError / CircuitOpenError を送出）"""
+        summary = self._generate(self._incremental_prompt(title, previous_summary, changes, category, length, style))
+        logger.info(f"要約更新完了(差分): {title}")
+        return summary
+    
+    def summarize_batch(self, posts: List[Dict], length: str = "medium", style: str = "bullet") -> List[Optional[str]]:
+        """複数記事を1回のリクエストで要約する（posts は esa の記事データ、失敗時は例外を送出）
+
+        戻り値は posts と同じ順の要約リスト。応答に含まれなかった記事は None。
+        """
+        documents = []
+        for i, post in enumerate(posts):
+            title = post.get('name', 'タイトルなし')
+            body = self._preprocess(title, post.get('body_md', ''))
+            documents.append((f"d{i + 1}", title, post.get('category', ''), body))
+        prompt = build_batch_prompt(documents, length, style)
+        logger.debug(f"Gemini API呼び出し(バッチ): {len(posts)}件 (長さ: {length}, スタイル: {style})")
+        text = self._generate(prompt, generation_config={"response_mime_type": "application/json"})
+        summaries = parse_batch_response(text)
+        logger.info(f"バッチ要約生成完了: {len(summaries)}/{len(posts)}件")
+        return [summaries.get(doc_id) for doc_id, _, _, _ in documents]
+    
+    def summarize_stream(
+        self,
+        title: str,
+        body: str,
+        category: str = "",
+        length: str = "medium",
+        style: str = "bullet"
+    ) -> Iterator[str]:
+        """要約をストリーミングで生成し、届いたテキスト片を順に返す（失敗時は例外を送出）
+
+        長文の場合は map 段を先に済ませ、最後の統合要約だけをストリーミングする。
+        """
+        body = self._preprocess(title, body)
+        if self.map_reduce_threshold > 0 and len(body) > self.map_reduce_threshold:
+            prompt = self._map_reduce_prompt(title, body, category, length, style)
+        else:
+            prompt = build_prompt(title, body, category, length, style)
+        logger.debug(f"Gemini API呼び出し(ストリーミング): {title} (長さ: {length}, スタイル: {style})")
+        # ジェネレータの中では区間を切り替えず、呼び出し元の区間に属性だけを付ける
+        set_attributes(preprocessed_length=len(body), prompt_chars=len(prompt), estimated_prompt_tokens=estimate_tokens(prompt))
+        # 再試行できるのは最初の応答が届くまで（途中まで流した要約はやり直せない）
+        stream = self._call(prompt, lambda: self.model.generate_content(prompt, stream=True), title)
+        # トークン数は最後のチャンクの usage_metadata に累計で入る（途中で止まっても送ったプロンプトは記録する）
+        usage = None
         try:
-            logger.debug(f"Gemini API呼び出し: {title} (長さ: {length}, スタイル: {style})")
-            response = self.model.generate_content(prompt)
-            logger.info(f"要約生成完了: {title}")
-            return response.text
+            for chunk in stream:
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                text = getattr(chunk, "text", "")
+                if text:
+                    yield text
         except Exception as e:
-            logger.error(f"要約生成エラー ({title}): {str(e)}", exc_info=True)
-            return f"要約生成エラー: {str(e)}"
\ No newline at end of file
+            error = classify_gemini_error(e)
+            if error.retryable:
+                self.breaker.record_failure()
+            raise error from e
+        finally:
+            prompt_tokens = getattr(usage, "prompt_token_count", None)
+            output_tokens = getattr(usage, "candidates_token_count", None)
+            set_attributes(prompt_tokens=prompt_tokens, output_tokens=output_tokens)
+            self._record_usage(prompt, prompt_tokens, output_tokens)
+        logger.info(f"要約生成完了(ストリーミング): {title}")
+    
+    def _preprocess(self, title: str, body: str) -> str:
+        """本文から画像・HTML・長いコードなどを削り、削減量を記録する"""
+        if not self.preprocess_enabled:
+            return body
+        processed, stats = preprocess_markdown(body)
+        self.preprocess_saved_chars += stats.saved_chars
+        self.preprocess_saved_tokens += stats.saved_tokens
+        logger.info(
+            f"本文前処理: {title} {stats.original_chars}字 → {stats.processed_chars}字 "
+            f"(削減 {stats.saved_chars}字, 推定 {stats.saved_tokens}トークン)"
+        )
+        return processed
+    
+    def _incremental_prompt(self, title: str, previous_summary: str, changes: List[SectionChange],
+                            category: str, length: str, style: str) -> str:
+        """変更されたセクションの本文を前処理して差分要約のプロンプトを組み立てる"""
+        changes = [change._replace(new_text=self._preprocess(title, change.new_text)) if change.new_text else change
+                   for change in changes]
+        prompt = build_incremental_prompt(title, previous_summary, changes, category, length, style)
+        logger.debug(f"Gemini API呼び出し(差分): {title} (変更セクション: {len(changes)}件)")
+        set_attributes(incremental=True, changed_sections=len(changes))
+        return prompt
+    
+    def _acquire_quota(self, prompt: str):
+        """リクエスト数と入力トークン数の両方のバケットから取得してから送る"""
+        self.rate_limiter.acquire("gemini.requests")
+        self.rate_limiter.acquire("gemini.tokens", estimate_tokens(prompt))
+    
+    def _generate(self, prompt: str, **kwargs) -> str:
+        """プロンプトを送ってテキストを得る（一時的な失敗は再試行）"""
+        def request():
+            response = self.model.generate_content(prompt, **kwargs)
+            return response.text, getattr(response, "usage_metadata", None)
+        
+        with tracer.span("gemini.generate_content", model=self.model_name, prompt_chars=len(prompt),
+                         estimated_prompt_tokens=estimate_tokens(prompt)) as span:
+            text, usage = self._call(prompt, request)
+            if usage is not None:
+                span.set_attributes(
+                    prompt_tokens=getattr(usage, "prompt_token_count", None),
+                    output_tokens=getattr(usage, "candidates_token_count", None),
+                )
+            self._record_usage(prompt, getattr(usage, "prompt_token_count", None), getattr(usage, "candidates_token_count", None))
+            span.set_attribute("response_chars", len(text or ""))
+            return text
+    
+    def _record_usage(self, prompt: str, prompt_tokens: Optional[int], output_tokens: Optional[int]):
+        with self._usage_lock:
+            self.prompt_tokens += prompt_tokens or estimate_tokens(prompt)
+            self.output_tokens += output_tokens or 0
+    
+    def usage(self) -> Dict[str, int]:
+        """送受信したトークン数の累計"""
+        with self._usage_lock:
+            return {"prompt_tokens": self.prompt_tokens, "output_tokens": self.output_tokens}
+    
+    def _call(self, prompt: str, fn, description: str = ""):
+        """ブレーカーと再試行を通して Gemini を呼ぶ（試行ごとに枠を取得する）"""
+        def attempt():
+            self._acquire_quota(prompt)
+            return fn()
+        return call_with_retry(attempt, self.breaker, classify_gemini_error, self.retry_policy, description)
+    
+    def _summarize_map_reduce(self, title: str, body: str, category: str, length: str, style: str) -> str:
+        """長文を見出し単位で分割し、チャンクごとの要点を並列に抽出してから統合要約する"""
+        return self._generate(self._map_reduce_prompt(title, body, category, length, style))
+    
+    def _map_reduce_prompt(self, title: str, body: str, category: str, length: str, style: str) -> str:
+        """map 段（チャンクごとの要点抽出）を実行し、reduce 段のプロンプトを返す"""
+        chunks = chunk_markdown(body, self.chunk_size)
+        total = len(chunks)
+        logger.info(f"長文のため分割要約: {title} (文字数: {len(body)}字, チャンク数: {total})")
+        if total <= 1:
+            return build_prompt(title, body, category, length, style)
+        
+        prompts = [build_map_prompt(title, chunk, i + 1, total) for i, chunk in enumerate(chunks)]
+        with ThreadPoolExecutor(max_workers=max(1, min(self.map_parallelism, total))) as executor:
+            # 各チャンクの呼び出しも要約の区間の子として記録する（文脈はチャンクごとに複製）
+            futures = [executor.submit(in_current_context(self._generate), prompt) for prompt in prompts]
+            partials = [future.result() for future in futures]
+        
+        reduced_body = REDUCE_BODY_HEADER + "\n\n" + "\n\n".join(
+            f"## パート{i + 1}/{total}\n{partial.strip()}" for i, partial in enumerate(partials)
+        )
+        return build_prompt(title, reduced_body, category, length, style)
@@ -0,0 +1,262 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional
+
+from config.settings import (
+    SUMMARY_JOB_QUEUE_PATH,
+    SUMMARY_JOB_VISIBILITY_TIMEOUT,
+    SUMMARY_JOB_MAX_ATTEMPTS,
+    SUMMARY_JOB_RETRY_DELAY,
+    SUMMARY_JOB_RETENTION,
+)
+
+logger = logging.getLogger(__name__)
+
+# ジョブの状態（pending → fetching → summarizing → posting → done / failed）
+PENDING = "pending"
+FETCHING = "fetching"
+SUMMARIZING = "summarizing"
+POSTING = "posting"
+DONE = "done"
+FAILED = "failed"
+STATES = (PENDING, FETCHING, SUMMARIZING, POSTING, DONE, FAILED)
+IN_PROGRESS = (FETCHING, SUMMARIZING, POSTING)
+
+
+class Job(NamedTuple):
+    """取り出したジョブ（delivered は投稿済みのチャンネル）"""
+    id: int
+    kind: str
+    payload: Dict
+    state: str
+    attempts: int
+    delivered: List[str]
+
+
+class JobQueue:
+    """再起動をまたいで残る要約ジョブのキュー（SQLite）
+
+    enqueue() で pending として保存し、claim() で取り出したジョブは可視性タイムアウトの間
+    他のワーカーから見えなくなる。処理の段階は advance() で記録し（期限も延長される）、
+    complete() / fail() で終える。期限までに終わらなかったジョブ（ワーカーの停止など）は再び取り出される。
+    プロセスの再起動時は recover() で処理中だったジョブを pending に戻して再開する。
+    投稿済みのチャンネルは record_delivery() で残すので、再開しても同じチャンネルに二重投稿しない。
+    1つのファイルを使うのは1プロセスだけにすること（path が空ならメモリ上の SQLite で動く）。
+    """
+
+    def __init__(
+        self,
+        path: str = SUMMARY_JOB_QUEUE_PATH,
+        visibility_timeout: float = SUMMARY_JOB_VISIBILITY_TIMEOUT,
+        max_attempts: int = SUMMARY_JOB_MAX_ATTEMPTS,
+        retry_delay: float = SUMMARY_JOB_RETRY_DELAY,
+        retention: float = SUMMARY_JOB_RETENTION,
+    ):
+        self.path = path
+        self.visibility_timeout = max(1.0, visibility_timeout)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = max(0.0, retry_delay)
+        self.retention = retention
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.duplicates = 0
+        self.claimed = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self._conn = self._open(path)
+
+    def _open(self, path: str) -> sqlite3.Connection:
+        if path:
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                conn = self._connect(path)
+                logger.info(f"要約ジョブキュー(SQLite)を開きました: {path}")
+                return conn
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"要約ジョブキュー(SQLite)を開けないためメモリ上で動作します（再起動で失われます）: {path}: {e}")
+        return self._connect(":memory:")
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        # トランザクションは _transaction() で明示的に張る
+        conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " kind TEXT NOT NULL,"
+            " dedup_key TEXT UNIQUE,"
+            " payload TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " available_at REAL NOT NULL,"
+            " delivered TEXT NOT NULL DEFAULT '[]',"
+            " last_error TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state_available ON jobs(state, available_at)")
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """ロックを取って BEGIN IMMEDIATE ～ COMMIT（例外時は ROLLBACK）"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def enqueue(self, kind: str, payload: Dict, dedup_key: Optional[str] = None) -> Optional[int]:
+        """ジョブを pending で保存して ID を返す（同じ dedup_key のジョブが既にあれば None）"""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO jobs (kind, dedup_key, payload, state, available_at, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, dedup_key, json.dumps(payload, ensure_ascii=False), PENDING, now, now, now),
+            )
+            if cursor.rowcount == 0:
+                self.duplicates += 1
+                return None
+            self.enqueued += 1
+            return cursor.lastrowid
+
+    def claim(self) -> Optional[Job]:
+        """実行できるジョブを1件取り出す（pending か、処理中のまま期限が切れたもの。古い順）"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id, kind, payload, state, attempts, delivered FROM jobs"
+                f" WHERE state IN ({_placeholders((PENDING, *IN_PROGRESS))}) AND available_at <= ?"
+                " ORDER BY available_at, id LIMIT 1",
+                (PENDING, *IN_PROGRESS, now),
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, kind, payload, state, attempts, delivered = row
+            if state != PENDING:
+                logger.warning(f"可視性タイムアウトを過ぎたジョブを再実行します: id={job_id} state={state} attempts={attempts}")
+            conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, available_at = ?, updated_at = ? WHERE id = ?",
+                (FETCHING, now + self.visibility_timeout, now, job_id),
+            )
+            self.claimed += 1
+        return Job(job_id, kind, json.loads(payload), FETCHING, attempts + 1, json.loads(delivered))
+
+    def advance(self, job_id: int, state: str):
+        """処理の段階を記録し、可視性タイムアウトを延長する"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = ?, available_at = ?, updated_at = ? WHERE id = ?",
+                (state, now + self.visibility_timeout, now, job_id),
+            )
+
+    def record_delivery(self, job_id: int, channel: str):
+        """投稿済みのチャンネルを記録する（再実行時はこのチャンネルを飛ばす）"""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT delivered FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            delivered = json.loads(row[0])
+            if channel not in delivered:
+                delivered.append(channel)
+                conn.execute("UPDATE jobs SET delivered = ?, updated_at = ? WHERE id = ?",
+                             (json.dumps(delivered), time.time(), job_id))
+
+    def complete(self, job_id: int):
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET state = ?, last_error = NULL, updated_at = ? WHERE id = ?", (DONE, time.time(), job_id))
+            self.completed += 1
+
+    def fail(self, job_id: int, error: str, retry: bool = True, retry_after: Optional[float] = None) -> bool:
+        """失敗を記録する。再試行できれば pending に戻して True（待ち時間は試行回数ごとに倍で、retry_after より短くしない）"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return False
+            attempts = row[0]
+            if not retry or attempts >= self.max_attempts:
+                conn.execute("UPDATE jobs SET state = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                             (FAILED, error, now, job_id))
+                self.failed += 1
+                logger.error(f"ジョブを失敗として終了: id={job_id} attempts={attempts} error={error}")
+                return False
+            delay = max(self.retry_delay * (2 ** (attempts - 1)), retry_after or 0.0)
+            conn.execute(
+                "UPDATE jobs SET state = ?, available_at = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                (PENDING, now + delay, error, now, job_id),
+            )
+            self.retried += 1
+            logger.warning(f"ジョブを {delay:.0f}秒後に再試行: id={job_id} attempts={attempts}/{self.max_attempts} error={error}")
+            return True
+
+    def recover(self) -> int:
+        """前回のプロセスで処理中だったジョブを pending に戻し、すぐ実行できるようにする（起動時に呼ぶ）"""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET state = ?, available_at = ?, updated_at = ? WHERE state IN ({_placeholders(IN_PROGRESS)})",
+                (PENDING, now, now, *IN_PROGRESS),
+            )
+            recovered = cursor.rowcount
+            if self.retention > 0:
+                conn.execute("DELETE FROM jobs WHERE state IN (?, ?) AND updated_at < ?", (DONE, FAILED, now - self.retention))
+        pending = self.ready_count()
+        if recovered or pending:
+            logger.info(f"未完了の要約ジョブを再開します: 処理中だったもの={recovered} 実行待ち={pending}")
+        return recovered
+
+    def ready_count(self) -> int:
+        """今すぐ取り出せるジョブの数"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT COUNT(*) FROM jobs WHERE state IN ({_placeholders((PENDING, *IN_PROGRESS))}) AND available_at <= ?",
+                (PENDING, *IN_PROGRESS, time.time()),
+            ).fetchone()
+        return row[0]
+
+    def counts(self) -> Dict[str, int]:
+        """状態ごとのジョブ数"""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        counts = {state: 0 for state in STATES}
+        counts.update(dict(rows))
+        return counts
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT kind, payload, state, attempts, delivered, last_error FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        kind, payload, state, attempts, delivered, last_error = row
+        return {"kind": kind, "payload": json.loads(payload), "state": state, "attempts": attempts,
+                "delivered": json.loads(delivered), "last_error": last_error}
+
+    def stats(self) -> Dict[str, int]:
+        return {"enqueued": self.enqueued, "duplicates": self.duplicates, "claimed": self.claimed,
+                "completed": self.completed, "failed": self.failed, "retried": self.retried}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _placeholders(values) -> str:
+    return ",".join("?" for _ in values)
+
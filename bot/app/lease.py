@@ -0,0 +1,203 @@
+import abc
+import importlib
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import NamedTuple, Optional
+
+from config.settings import SUMMARY_LEASE_BACKEND, SUMMARY_LEASE_PATH, SUMMARY_LEASE_DONE_TTL
+
+logger = logging.getLogger(__name__)
+
+
+class Lease(NamedTuple):
+    """取得したリース（token はキーごとに単調増加するフェンシングトークン）"""
+    key: str
+    owner: str
+    token: int
+    expires_at: float
+
+
+class LeaseLostError(Exception):
+    """リースの期限が切れ、別のインスタンスに引き継がれた（以降の副作用は行わない）"""
+
+
+class LeaseHeldError(Exception):
+    """他のインスタンスがリースを保持している（done なら処理済み）"""
+
+    def __init__(self, key: str, done: bool):
+        super().__init__(f"{key} は他のインスタンスが{'処理済み' if done else '処理中'}です")
+        self.key = key
+        self.done = done
+
+
+class LeaseBackend(abc.ABC):
+    """複数インスタンスで同じ記事を二重に要約しないためのリースの保存先
+
+    同じキーのリースを持てるのは1インスタンスだけで、期限（ttl）が過ぎれば他のインスタンスが取り直せる。
+    取り直すたびに token が増えるので、期限切れに気付かず動き続けた古い持ち主は
+    is_valid() で自分の token が最新でないことを知り、投稿などの副作用を止める（フェンシング）。
+    complete() したキーは done_ttl の間「処理済み」として残り、後から届いた重複は acquire() できない。
+    どの操作もキー1件の参照・更新で済む（他のインスタンスは一定時間で処理をスキップできる）。
+
+    Redis のようなストアで実装する場合の対応:
+      acquire  … INCR fence:{key} で token を採番し、SET lease:{key} {owner}:{token} NX PX {ttl}
+                 （done:{key} があれば取得しない）
+      renew / release / is_valid … lease:{key} の値が {owner}:{token} のときだけ PEXPIRE / DEL / 真（Lua で比較と更新を一度に行う）
+      complete … 値が一致すれば SET done:{key} {token} EX {done_ttl} して lease:{key} を DEL
+      is_done  … EXISTS done:{key}
+    """
+
+    @abc.abstractmethod
+    def acquire(self, key: str, owner: str, ttl: float) -> Optional[Lease]:
+        """リースを取得する（他のインスタンスが保持中・処理済みなら None）"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def renew(self, lease: Lease, ttl: float) -> Optional[Lease]:
+        """期限を延長する（既に失っていれば None）"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def is_valid(self, lease: Lease) -> bool:
+        """まだこのリースが最新で期限内か"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def release(self, lease: Lease):
+        """処理を終えずに手放す（他のインスタンスがすぐ取得できる）"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def complete(self, lease: Lease, done_ttl: float = SUMMARY_LEASE_DONE_TTL) -> bool:
+        """処理済みにする（リースを失っていれば False）"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def is_done(self, key: str) -> bool:
+        """いずれかのインスタンスが処理済みにしたか"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SqliteLeaseBackend(LeaseBackend):
+    """SQLite ファイルにリースを保存する（同じファイルを共有する複数プロセスで使う）
+
+    SQLite のファイルロックで排他するので、ネットワークファイルシステム上では使わないこと。
+    """
+
+    def __init__(self, path: str = SUMMARY_LEASE_PATH, done_ttl: float = SUMMARY_LEASE_DONE_TTL):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # 他のプロセスが書き込み中なら待つ（トランザクションは数ミリ秒で終わる）
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            " key TEXT PRIMARY KEY,"
+            " owner TEXT NOT NULL,"
+            " token INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " done INTEGER NOT NULL DEFAULT 0)"
+        )
+        # 期限を大きく過ぎた行を掃除する（token は同時に保持し得る間だけ単調増加していればよい）
+        self._conn.execute("DELETE FROM leases WHERE expires_at < ?", (time.time() - max(done_ttl, 3600),))
+        logger.info(f"リース(SQLite)を開きました: {path}")
+
+    def _fetchone(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def _update(self, sql: str, params=()) -> int:
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    def acquire(self, key: str, owner: str, ttl: float) -> Optional[Lease]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT owner, token, expires_at, done FROM leases WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[2] > now and (row[3] or row[0] != owner):
+                    self._conn.execute("ROLLBACK")
+                    return None
+                token = (row[1] if row is not None else 0) + 1
+                expires_at = now + ttl
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO leases (key, owner, token, expires_at, done) VALUES (?, ?, ?, ?, 0)",
+                    (key, owner, token, expires_at),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return Lease(key, owner, token, expires_at)
+
+    def renew(self, lease: Lease, ttl: float) -> Optional[Lease]:
+        now = time.time()
+        expires_at = now + ttl
+        updated = self._update(
+            "UPDATE leases SET expires_at = ? WHERE key = ? AND token = ? AND done = 0 AND expires_at > ?",
+            (expires_at, lease.key, lease.token, now),
+        )
+        return lease._replace(expires_at=expires_at) if updated else None
+
+    def is_valid(self, lease: Lease) -> bool:
+        row = self._fetchone(
+            "SELECT 1 FROM leases WHERE key = ? AND token = ? AND done = 0 AND expires_at > ?",
+            (lease.key, lease.token, time.time()),
+        )
+        return row is not None
+
+    def release(self, lease: Lease):
+        self._update("UPDATE leases SET expires_at = 0 WHERE key = ? AND token = ? AND done = 0", (lease.key, lease.token))
+
+    def complete(self, lease: Lease, done_ttl: float = SUMMARY_LEASE_DONE_TTL) -> bool:
+        updated = self._update(
+            "UPDATE leases SET done = 1, expires_at = ? WHERE key = ? AND token = ?",
+            (time.time() + done_ttl, lease.key, lease.token),
+        )
+        return updated > 0
+
+    def is_done(self, key: str) -> bool:
+        row = self._fetchone("SELECT 1 FROM leases WHERE key = ? AND done = 1 AND expires_at > ?", (key, time.time()))
+        return row is not None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def instance_id() -> str:
+    """このプロセスを識別するリースの持ち主名（ホスト名・PID・起動ごとの乱数）"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def build_lease_backend(name: str = SUMMARY_LEASE_BACKEND) -> Optional[LeaseBackend]:
+    """設定値からリースの保存先を作る（空なら None で、インスタンス間の調整をしない）
+
+    "sqlite" のほか "package.module:ClassName" で LeaseBackend の実装（Redis 版など）を指定できる。
+    """
+    if not name:
+        return None
+    if name == "sqlite":
+        return SqliteLeaseBackend()
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"SUMMARY_LEASE_BACKEND が不正です（sqlite か module:ClassName）: {name}")
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(backend_class, type) and issubclass(backend_class, LeaseBackend)):
+        raise ValueError(f"SUMMARY_LEASE_BACKEND は LeaseBackend を継承したクラスを指定してください: {name}")
+    # 実装していない操作があればここで TypeError になる（最初の記事を処理するときではなく起動時に気付ける）
+    backend = backend_class()
+    logger.info(f"リースの保存先: {name}")
+    return backend
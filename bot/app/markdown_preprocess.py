@@ -0,0 +1,157 @@
+import re
+from typing import List, NamedTuple, Tuple
+
+from config.settings import (
+    SUMMARY_PREPROCESS_ENABLED,
+    SUMMARY_PREPROCESS_CODE_MAX_LINES,
+    SUMMARY_PREPROCESS_TABLE_MAX_ROWS,
+)
+
+# 前処理のルールを変えたら値を上げる（要約キャッシュのキーに含まれる）
+PREPROCESS_VERSION = 2
+
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_IMAGE_RE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+_IMG_TAG_RE = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+_DATA_URI_RE = re.compile(r"data:[\w.+-]+/[\w.+-]+;base64,[A-Za-z0-9+/=]+")
+_BASE64_BLOB_RE = re.compile(r"[A-Za-z0-9+/]{200,}={0,2}")
+_HTML_COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+_BR_TAG_RE = re.compile(r"<br\s*/?>", re.IGNORECASE)
+# 取り除くのは esa の本文で使われる HTML の要素だけ（List<String> のような型引数は残す）
+_HTML_TAGS = (
+    "a|abbr|b|blockquote|br|center|code|col|colgroup|dd|del|details|div|dl|dt|em|font|h[1-6]|hr|i|iframe|img|ins|"
+    "kbd|li|mark|ol|p|pre|q|s|small|span|strike|strong|sub|summary|sup|table|tbody|td|tfoot|th|thead|tr|tt|u|ul|video"
+)
+_HTML_TAG_RE = re.compile(rf"</?(?:{_HTML_TAGS})(?:\s[^<>]*)?/?>", re.IGNORECASE)
+_INLINE_CODE_RE = re.compile(r"(`+)(?!`).*?(?<!`)\1(?!`)")
+_TABLE_ROW_RE = re.compile(r"^\s*\|.*\|\s*$")
+_TABLE_SEPARATOR_RE = re.compile(r"^\s*\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?\s*$")
+_CELL_SPACE_RE = re.compile(r"\s*\|\s*")
+_INLINE_SPACE_RE = re.compile(r"[ \t　]{2,}")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+class PreprocessStats(NamedTuple):
+    """前処理による削減量"""
+    original_chars: int
+    processed_chars: int
+    original_tokens: int
+    processed_tokens: int
+
+    @property
+    def saved_chars(self) -> int:
+        return self.original_chars - self.processed_chars
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.processed_tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """トークン数の概算（ASCIIは約4文字で1トークン、日本語などは1文字1トークン）"""
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def preprocess_signature() -> str:
+    """前処理の設定を表す文字列（キャッシュキー用）"""
+    if not SUMMARY_PREPROCESS_ENABLED:
+        return "off"
+    return f"v{PREPROCESS_VERSION}:code{SUMMARY_PREPROCESS_CODE_MAX_LINES}:rows{SUMMARY_PREPROCESS_TABLE_MAX_ROWS}"
+
+
+def _clean_inline(line: str) -> str:
+    """コードブロック外の1行から画像・base64・HTMLタグを取り除く（`...` のインラインコードはそのまま残す）"""
+    parts, last = [], 0
+    for match in _INLINE_CODE_RE.finditer(line):
+        parts.append(_clean_text(line[last:match.start()]))
+        parts.append(match.group(0))
+        last = match.end()
+    parts.append(_clean_text(line[last:]))
+    return "".join(parts).rstrip()
+
+
+def _clean_text(line: str) -> str:
+    line = _DATA_URI_RE.sub("[base64省略]", line)
+    line = _BASE64_BLOB_RE.sub("[base64省略]", line)
+    line = _IMAGE_RE.sub(lambda m: f"[画像: {m.group(1)}]" if m.group(1).strip() else "", line)
+    line = _IMG_TAG_RE.sub("", line)
+    line = _BR_TAG_RE.sub(" ", line)
+    line = _HTML_TAG_RE.sub("", line)
+    return _INLINE_SPACE_RE.sub(" ", line)
+
+
+def _compact_table(rows: List[str], max_rows: int) -> List[str]:
+    """表の区切り行と余分な空白を除き、行数を max_rows までに絞る"""
+    compacted = []
+    for row in rows:
+        if _TABLE_SEPARATOR_RE.match(row):
+            continue
+        compacted.append(_CELL_SPACE_RE.sub("|", _clean_inline(row).strip()))
+    if max_rows > 0 and len(compacted) > max_rows + 1:
+        omitted = len(compacted) - (max_rows + 1)
+        # 先頭行（ヘッダ）＋ max_rows 行を残す
+        compacted = compacted[:max_rows + 1] + [f"|...（残り{omitted}行省略）|"]
+    return compacted
+
+
+def _cap_code(lines: List[str], max_lines: int) -> List[str]:
+    if max_lines <= 0 or len(lines) <= max_lines:
+        return lines
+    return lines[:max_lines] + [f"...（残り{len(lines) - max_lines}行省略）"]
+
+
+def preprocess_markdown(
+    body: str,
+    code_max_lines: int = SUMMARY_PREPROCESS_CODE_MAX_LINES,
+    table_max_rows: int = SUMMARY_PREPROCESS_TABLE_MAX_ROWS,
+) -> Tuple[str, PreprocessStats]:
+    """プロンプトに入れる前に本文から要約に不要な部分を削る
+
+    画像・base64・HTMLタグ・コメントの除去、コードブロックの先頭 code_max_lines 行への切り詰め、
+    表の圧縮、連続する空白・空行の圧縮を行う。
+    """
+    original = body or ""
+    text = _HTML_COMMENT_RE.sub("", original)
+    out: List[str] = []
+    code: List[str] = []
+    table: List[str] = []
+    in_code = False
+
+    for line in text.splitlines():
+        if _FENCE_RE.match(line):
+            if in_code:
+                out.extend(_cap_code(code, code_max_lines))
+                code = []
+            elif table:
+                out.extend(_compact_table(table, table_max_rows))
+                table = []
+            out.append(line.strip())
+            in_code = not in_code
+            continue
+        if in_code:
+            code.append(line.rstrip())
+            continue
+        if _TABLE_ROW_RE.match(line):
+            table.append(line)
+            continue
+        if table:
+            out.extend(_compact_table(table, table_max_rows))
+            table = []
+        out.append(_clean_inline(line))
+
+    if in_code:
+        out.extend(_cap_code(code, code_max_lines))
+    if table:
+        out.extend(_compact_table(table, table_max_rows))
+
+    processed = _BLANK_LINES_RE.sub("\n\n", "\n".join(out)).strip()
+    stats = PreprocessStats(
+        original_chars=len(original),
+        processed_chars=len(processed),
+        original_tokens=estimate_tokens(original),
+        processed_tokens=estimate_tokens(processed),
+    )
+    return processed, stats
@@ -0,0 +1,82 @@
+import re
+from typing import List, NamedTuple
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)$")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+
+
+class Section(NamedTuple):
+    """見出し1つ分のまとまり（見出し前の前置きは level=0, heading=""）"""
+    level: int
+    heading: str
+    text: str
+
+
+def split_sections(markdown: str) -> List[Section]:
+    """Markdownを見出しの境界で分割する（コードブロック内の # は見出しとみなさない）"""
+    sections: List[Section] = []
+    level, heading = 0, ""
+    lines: List[str] = []
+    in_fence = False
+    for line in (markdown or "").splitlines():
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        elif not in_fence:
+            match = _HEADING_RE.match(line)
+            if match:
+                if lines:
+                    sections.append(Section(level, heading, "\n".join(lines)))
+                level, heading = len(match.group(1)), match.group(2).strip()
+                lines = [line]
+                continue
+        lines.append(line)
+    if lines:
+        sections.append(Section(level, heading, "\n".join(lines)))
+    return sections
+
+
+def _split_oversized(text: str, max_chars: int) -> List[str]:
+    """見出しだけでは収まらないセクションを段落 → 行 → 文字数の順で分割"""
+    pieces: List[str] = []
+    current = ""
+    for para in re.split(r"(\n\s*\n)", text):
+        if len(current) + len(para) <= max_chars:
+            current += para
+            continue
+        if current.strip():
+            pieces.append(current)
+        current = ""
+        while len(para) > max_chars:
+            cut = para.rfind("\n", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(para[:cut])
+            para = para[cut:]
+        current = para
+    if current.strip():
+        pieces.append(current)
+    return pieces
+
+
+def chunk_markdown(markdown: str, max_chars: int) -> List[str]:
+    """見出しの境界を優先して max_chars 以下のチャンクにまとめる"""
+    chunks: List[str] = []
+    current: List[str] = []
+    current_len = 0
+    for section in split_sections(markdown):
+        text = section.text
+        if len(text) > max_chars:
+            if current:
+                chunks.append("\n".join(current))
+                current, current_len = [], 0
+            chunks.extend(_split_oversized(text, max_chars))
+            continue
+        # 改行1文字分も含めて上限を超えるなら区切る
+        if current and current_len + len(text) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            current, current_len = [], 0
+        current.append(text)
+        current_len += len(text) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return [c for c in chunks if c.strip()]
@@ -0,0 +1,282 @@
+import logging
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "esa_summarizer_"
+
+# 処理段階（esa取得・Gemini・整形・投稿）の所要時間のバケット（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+PostHandler = Callable[[bytes, Dict[str, str], str], Tuple[int, Dict[str, str], str]]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """メトリクスの共通部分（ラベルごとの値と、取得時に呼ぶ関数）"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+        self._functions: Dict[LabelKey, Callable[[], float]] = {}
+
+    def set_function(self, fn: Callable[[], float], **labels):
+        """取得のたびに fn() の値を使う（既存の統計カウンタやキューの深さを公開する場合）"""
+        with self._lock:
+            self._functions[_label_key(labels)] = fn
+
+    def value(self, **labels) -> float:
+        key = _label_key(labels)
+        with self._lock:
+            fn = self._functions.get(key)
+            if fn is None:
+                return self._values.get(key, 0.0)
+        return float(fn())
+
+    def samples(self) -> List[Tuple[str, LabelKey, Optional[Tuple[str, str]], float]]:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, fn in functions.items():
+            try:
+                values[key] = float(fn())
+            except Exception as e:
+                logger.debug(f"メトリクス {self.name} の取得に失敗: {e}")
+        return [(self.name, key, None, value) for key, value in sorted(values.items())]
+
+
+class Counter(_Metric):
+    """単調増加するカウンタ"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """増減する現在値"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+
+class Histogram(_Metric):
+    """所要時間などの分布（累積バケット・合計・件数）"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[LabelKey, List[float]] = {}  # バケットごとの件数 + [合計, 件数]
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            return int(series[-1]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        out = []
+        for key, values in sorted(series.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                out.append((f"{self.name}_bucket", key, ("le", _format_value(bound)), cumulative))
+            out.append((f"{self.name}_sum", key, None, values[-2]))
+            out.append((f"{self.name}_count", key, None, values[-1]))
+        return out
+
+
+class MetricsRegistry:
+    """プロセス内のメトリクスを保持し、Prometheus のテキスト形式で出力する"""
+
+    def __init__(self, prefix: str = METRIC_PREFIX):
+        self.prefix = prefix
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, **kwargs):
+        full_name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = cls(full_name, documentation, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"メトリクス {full_name} は {metric.kind} として登録済みです")
+            return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._get_or_create(Counter, name, documentation)
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation)
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, buckets=buckets)
+
+    def render(self) -> str:
+        """Prometheus テキスト形式（text/plain; version=0.0.4）"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key, extra)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# プロセス内で共有するレジストリと、処理段階の所要時間
+registry = MetricsRegistry()
+stage_seconds = registry.histogram("stage_duration_seconds", "処理段階ごとの所要時間（秒）")
+stage_errors = registry.counter("stage_errors_total", "例外で終わった処理段階の数")
+
+
+class MetricsServer:
+    """/metrics（Prometheus）と /healthz（生存）・/readyz（受信可能）を返す HTTP サーバ
+
+    liveness / readiness は (正常か, 理由) を返す関数で判定する。
+    Cloud Run の既定のヘルスチェック向けに / は /healthz と同じ応答を返す。
+    Cloud Run は1つのポートしか公開しないため、add_post_route() で他の受け口
+    （HTTP モードの Slack イベント受信など）も同じサーバに載せられる。
+    """
+
+    def __init__(
+        self,
+        port: int,
+        host: str = "0.0.0.0",
+        metrics_registry: MetricsRegistry = None,
+        liveness: Callable[[], Tuple[bool, str]] = None,
+        readiness: Callable[[], Tuple[bool, str]] = None,
+    ):
+        self.registry = metrics_registry or registry
+        self.liveness = liveness or (lambda: (True, "ok"))
+        self.readiness = readiness or self.liveness
+        self._post_routes: Dict[str, PostHandler] = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server._handle(self)
+
+            def do_POST(self):
+                server._handle_post(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_port
+
+    def start(self) -> "MetricsServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        logger.info(f"メトリクスサーバ起動: port={self.port} (/metrics, /healthz, /readyz)")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def add_post_route(self, path: str, handler: PostHandler):
+        """POST の受け口を追加（handler(本文, ヘッダ, クエリ文字列) -> (ステータス, ヘッダ, 本文)）"""
+        self._post_routes[path] = handler
+
+    def _handle_post(self, request: BaseHTTPRequestHandler):
+        path, _, query = request.path.partition("?")
+        length = int(request.headers.get("Content-Length") or 0)
+        body = request.rfile.read(length) if length else b""
+        handler = self._post_routes.get(path)
+        if handler is None:
+            self._respond(request, 404, {"Content-Type": "text/plain; charset=utf-8"}, "not found\n")
+            return
+        try:
+            status, headers, text = handler(body, dict(request.headers.items()), query)
+        except Exception as e:
+            logger.error(f"POST {path} の処理に失敗: {e}", exc_info=True)
+            status, headers, text = 500, {"Content-Type": "text/plain; charset=utf-8"}, "internal error\n"
+        self._respond(request, status, headers, text)
+
+    def _handle(self, request: BaseHTTPRequestHandler):
+        path = request.path.split("?", 1)[0]
+        if path == "/metrics":
+            status, content_type, body = 200, "text/plain; version=0.0.4; charset=utf-8", self.registry.render()
+        elif path in ("/", "/healthz", "/readyz"):
+            check = self.readiness if path == "/readyz" else self.liveness
+            try:
+                healthy, reason = check()
+            except Exception as e:
+                healthy, reason = False, f"check failed: {e}"
+            status, content_type, body = (200 if healthy else 503), "text/plain; charset=utf-8", reason + "\n"
+        else:
+            status, content_type, body = 404, "text/plain; charset=utf-8", "not found\n"
+        self._respond(request, status, {"Content-Type": content_type}, body)
+
+    def _respond(self, request: BaseHTTPRequestHandler, status: int, headers: Dict[str, str], body: str):
+        data = body.encode("utf-8")
+        request.send_response(status)
+        for name, value in headers.items():
+            if name.lower() != "content-length":
+                request.send_header(name, value)
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
@@ -0,0 +1,227 @@
+import re
+import unicodedata
+from typing import Callable, List, NamedTuple, Optional, Pattern, Tuple, Union
+
+# section ブロックの text に入れる1チャンクの上限（3000字制限に余裕を持たせる）
+SECTION_TEXT_LIMIT = 2800
+
+_FENCE = "```"
+_HEADING_PATTERN = re.compile(r"^#{1,6}\s+(.*)")
+_LIST_ITEM_PATTERN = re.compile(r"^( *)([-*+]|\d+[.)])\s+(.*)")
+_TABLE_ROW_PATTERN = re.compile(r"^\|.*\|$")
+_TABLE_SEPARATOR_PATTERN = re.compile(r"^\|?(\s*:?-{3,}:?\s*\|)*\s*:?-{3,}:?\s*\|?$")
+_NUMBER_PLACEHOLDER_PATTERN = re.compile(r"\\+(?=\d)")
+_NUMBER_PATTERN = re.compile(r"\d+")
+_NON_SPACE_PATTERN = re.compile(r"\S")
+
+# 入れ子の深さごとの箇条書き記号
+_BULLETS = ("•", "◦", "▪")
+_TOP_LEVEL_BULLETS = frozenset(("- ", "* ", "+ "))
+_TOP_LEVEL_INDENTS = [0]
+_TOP_LEVEL_PREFIX = _BULLETS[0] + " "
+_LIST_MARKERS = frozenset("-*+0123456789")
+_INDENT = "    "
+
+
+class RenderedSummary(NamedTuple):
+    """変換結果（全文と、section ブロック用に分割したチャンク）"""
+    text: str
+    chunks: List[str]
+
+
+def normalize_numbering(summary: str) -> str:
+    """\\1, \\2... のようなプレースホルダを 1,2,3... に置換し直す"""
+    if not summary or "\\" not in summary:
+        return summary
+    lines = []
+    counter = 1
+    for line in summary.splitlines():
+        if _NUMBER_PLACEHOLDER_PATTERN.search(line):
+            line = _NUMBER_PLACEHOLDER_PATTERN.sub("", line)
+            line = _NUMBER_PATTERN.sub(str(counter), line, count=1)
+            counter += 1
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _display_width(text: str) -> int:
+    return sum(2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1 for ch in text)
+
+
+def render_table_as_code(rows: List[List[str]]) -> List[str]:
+    """表を列をそろえたコードブロックにする（mrkdwn には表が無いため）"""
+    columns = max(len(row) for row in rows)
+    widths = [max(_display_width(row[i]) if i < len(row) else 0 for row in rows) for i in range(columns)]
+    lines = [_FENCE]
+    for row in rows:
+        cells = [row[i] if i < len(row) else "" for i in range(columns)]
+        padded = [cell + " " * (widths[i] - _display_width(cell)) for i, cell in enumerate(cells)]
+        lines.append(" | ".join(padded).rstrip())
+    lines.append(_FENCE)
+    return lines
+
+
+def chunk_mrkdwn(text: str, chunk_size: int = SECTION_TEXT_LIMIT) -> List[str]:
+    """変換済みのテキストを section 用のチャンクに分割
+
+    上限の手前の改行で区切る（改行が上限の6割より前にしか無ければ上限の位置で切る）。
+    残りの文字列を作り直さず位置だけを進めるので、各文字のコピーは1回で済む。
+    """
+    n = len(text)
+    first = _NON_SPACE_PATTERN.search(text)
+    start = first.start() if first else n
+    chunks = []
+    while start < n:
+        end = start + chunk_size
+        if end >= n:
+            end = n
+        else:
+            newline = text.rfind("\n", start, end)
+            if newline != -1 and newline - start >= chunk_size * 0.6:
+                end = newline
+        chunk = text[start:end].rstrip()
+        if chunk:
+            chunks.append(chunk)
+        following = _NON_SPACE_PATTERN.search(text, end)
+        start = following.start() if following else n
+    return chunks
+
+
+# 既定のインライン規則（名前, パターン, 置換, 目印）
+# 置換はテンプレート文字列か match を受け取る関数。目印の文字列を含まないテキストには規則を試さない
+DEFAULT_INLINE_RULES = (
+    ("bold", r"\*\*(.+?)\*\*", r"*\1*", "**"),
+    ("italic", r"__(.+?)__", r"_\1_", "__"),
+    ("link", r"\[([^\]]+)\]\(([^)\s]+)\)", r"<\2|\1>", "]("),
+)
+
+
+class MrkdwnRenderer:
+    """Markdown を1回の走査で Slack mrkdwn に変換し、同時に section 用のチャンクに分割する
+
+    行単位の規則（見出し・箇条書き・表・コードブロック）は行頭の文字で絞り込んでから
+    事前にコンパイルしたパターンで判定する。インライン規則は規則ごとにコンパイル済みで、
+    目印を含む区間にだけ適用する（1つの正規表現にまとめると選択肢の試行で3倍ほど遅くなるため）。
+    add_inline_rule() でインライン規則を、table_renderer で表の描画方法を差し替えられる。
+    """
+
+    def __init__(self, chunk_size: int = SECTION_TEXT_LIMIT, table_renderer: Callable[[List[List[str]]], List[str]] = None):
+        self.chunk_size = chunk_size
+        self.table_renderer = table_renderer or render_table_as_code
+        self._inline_rules: List[Tuple[str, Pattern, Union[str, Callable], Optional[str]]] = []
+        for name, pattern, replacement, trigger in DEFAULT_INLINE_RULES:
+            self.add_inline_rule(name, pattern, replacement, trigger)
+
+    def add_inline_rule(self, name: str, pattern: str, replacement: Union[str, Callable], trigger: Optional[str] = None):
+        """インライン規則を追加（既存の規則の後に適用される）
+
+        replacement は re.sub と同じくテンプレート文字列か match を受け取る関数。
+        trigger を指定すると、その文字列を含まないテキストではこの規則を試さない。
+        """
+        self._inline_rules.append((name, re.compile(pattern), replacement, trigger))
+
+    def inline(self, text: str) -> str:
+        """インライン規則を適用"""
+        for _, pattern, replacement, trigger in self._inline_rules:
+            if trigger is None or trigger in text:
+                text = pattern.sub(replacement, text)
+        return text
+
+    def render(self, markdown_text: str, chunk_size: Optional[int] = None) -> RenderedSummary:
+        """Markdown を mrkdwn の全文と section 用チャンクに変換
+
+        行の走査は1回だけで、インライン規則はコードブロック・表以外の区間ごとに1回の置換で適用する
+        （インライン規則は改行をまたがないため、行ごとに適用するのと結果は同じ）。
+        """
+        if not markdown_text:
+            return RenderedSummary("", [])
+        segments: List[str] = []
+        out: List[str] = []
+        in_code_block = False
+        table_rows: List[List[str]] = []
+        list_indents: List[int] = []
+        for line in markdown_text.strip().splitlines():
+            stripped = line.strip()
+            # 行頭の1文字で規則を絞り込み、該当しうるパターンだけを試す
+            head = stripped[:1]
+            if table_rows and (in_code_block or head != "|" or not _TABLE_ROW_PATTERN.match(stripped)):
+                segments.append("\n".join(self.table_renderer(table_rows)))
+                table_rows = []
+            if head == "`" and stripped.startswith(_FENCE):
+                if in_code_block:
+                    # コードブロックの中身にはインライン規則を適用しない
+                    out.append(_FENCE)
+                    segments.append("\n".join(out))
+                    out = []
+                else:
+                    if out:
+                        segments.append(self.inline("\n".join(out)))
+                    out = [_FENCE]
+                in_code_block = not in_code_block
+                list_indents.clear()
+                continue
+            if in_code_block:
+                out.append(line)
+                continue
+            if not head:
+                out.append("")
+                continue
+            if head == "|" and _TABLE_ROW_PATTERN.match(stripped):
+                if out:
+                    segments.append(self.inline("\n".join(out)))
+                    out = []
+                if not _TABLE_SEPARATOR_PATTERN.match(stripped):
+                    table_rows.append([cell.strip() for cell in stripped[1:-1].split("|")])
+                continue
+            if head == "#":
+                heading = _HEADING_PATTERN.match(stripped)
+                if heading:
+                    list_indents.clear()
+                    # 見出しは全体を太字にするので、内側の強調記号は外す
+                    out.append(f"*{heading.group(1).strip().replace('**', '')}*")
+                    continue
+            elif head in _LIST_MARKERS:
+                if line[:2] in _TOP_LEVEL_BULLETS:
+                    # インデントの無い箇条書き（最も多いケース）は正規表現を使わない
+                    if list_indents != _TOP_LEVEL_INDENTS:
+                        list_indents[:] = _TOP_LEVEL_INDENTS
+                    out.append(_TOP_LEVEL_PREFIX + stripped[2:].lstrip())
+                    continue
+                item = _LIST_ITEM_PATTERN.match(line.expandtabs(4))
+                if item:
+                    out.append(self._render_list_item(item, list_indents))
+                    continue
+            if list_indents:
+                list_indents.clear()
+            out.append(stripped)
+        if table_rows:
+            segments.append("\n".join(self.table_renderer(table_rows)))
+        if out:
+            segments.append("\n".join(out) if in_code_block else self.inline("\n".join(out)))
+        text = "\n".join(segments)
+        size = chunk_size or self.chunk_size
+        if len(text) <= size:
+            # 1チャンクに収まる場合（大半の要約）は分割処理を省く
+            chunks = [text.strip()] if text.strip() else []
+        else:
+            chunks = chunk_mrkdwn(text, size)
+        return RenderedSummary(text, chunks)
+
+    def _render_list_item(self, item, list_indents: List[int]) -> str:
+        """箇条書き・番号付きリストの項目（インデントから入れ子の深さを決める）"""
+        indent = len(item.group(1))
+        while list_indents and list_indents[-1] > indent:
+            list_indents.pop()
+        if not list_indents or list_indents[-1] < indent:
+            list_indents.append(indent)
+        level = len(list_indents) - 1
+        marker = item.group(2)
+        if marker[0].isdigit():
+            bullet = marker
+        else:
+            bullet = _BULLETS[min(level, len(_BULLETS) - 1)]
+        return f"{_INDENT * level}{bullet} {item.group(3).strip()}"
+
+
+# 既定の設定で共有するレンダラ
+renderer = MrkdwnRenderer()
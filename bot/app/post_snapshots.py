@@ -0,0 +1,155 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+from app.section_diff import SectionDiff, diff_sections
+from app.summary_cache import make_cache_key
+from config.settings import (
+    SUMMARY_SNAPSHOT_PATH, SUMMARY_SNAPSHOT_MAX_ENTRIES, SUMMARY_INCREMENTAL_MIN_CHARS, SUMMARY_INCREMENTAL_MIN_RATIO,
+    SUMMARY_INCREMENTAL_MAX_RATIO, SUMMARY_INCREMENTAL_MAX_CHAIN,
+)
+
+logger = logging.getLogger(__name__)
+
+# 前回の要約からの更新方法
+UNCHANGED = "unchanged"  # 同じ版（前回の要約をそのまま使う）
+TRIVIAL = "trivial"  # 軽微な編集（要約し直さない）
+INCREMENTAL = "incremental"  # 変更されたセクションと前回の要約から更新する
+FULL = "full"  # 全文を要約し直す
+
+
+class PostSnapshot(NamedTuple):
+    """記事の直近の要約と、要約したときの本文"""
+    revision: str
+    body: str
+    summary: str
+    increments: int  # 最後に全文を要約してから差分で更新した回数
+
+
+class UpdatePlan(NamedTuple):
+    """新しい版をどう要約するか（diff は前回の本文と比べられたときだけ）"""
+    mode: str
+    diff: Optional[SectionDiff]
+
+
+class TrivialEditSkipped(Exception):
+    """軽微な編集のため自動要約を投稿しない"""
+
+
+def plan_update(
+    snapshot: Optional[PostSnapshot],
+    revision: str,
+    body: str,
+    min_chars: int = SUMMARY_INCREMENTAL_MIN_CHARS,
+    min_ratio: float = SUMMARY_INCREMENTAL_MIN_RATIO,
+    max_ratio: float = SUMMARY_INCREMENTAL_MAX_RATIO,
+    max_chain: int = SUMMARY_INCREMENTAL_MAX_CHAIN,
+) -> UpdatePlan:
+    """前回の本文と比べて、全文要約・差分要約・要約し直さないのどれにするかを決める
+
+    変更が min_chars 未満かつ本文の min_ratio 未満なら軽微な編集、max_ratio を超えるか
+    差分での更新が max_chain 回続いていれば全文を要約し直す。
+    """
+    if snapshot is None:
+        return UpdatePlan(FULL, None)
+    if snapshot.revision == revision:
+        return UpdatePlan(UNCHANGED, None)
+    diff = diff_sections(snapshot.body, body)
+    if diff.changed_chars < min_chars and diff.ratio < min_ratio:
+        return UpdatePlan(TRIVIAL, diff)
+    if diff.ratio > max_ratio or snapshot.increments >= max_chain:
+        return UpdatePlan(FULL, diff)
+    return UpdatePlan(INCREMENTAL, diff)
+
+
+def make_snapshot_key(post_number, length: str, style: str, model: str, prompt_version: str) -> str:
+    """記事・長さ・形式・モデル・プロンプト版ごとのキー（版は含めず、記事ごとに最新の1件だけを持つ）"""
+    return make_cache_key(post_number, "latest", length, style, model, prompt_version)
+
+
+class PostSnapshotStore:
+    """差分要約の基準にする、記事ごとの直近の本文と要約（SQLite。path が空ならメモリ上）
+
+    要約キャッシュは版ごとに要約を引くためのもので、こちらは次の版が届いたときに
+    何が変わったかを調べるために前回の本文を残しておく。
+    """
+
+    def __init__(self, path: str = SUMMARY_SNAPSHOT_PATH, max_entries: int = SUMMARY_SNAPSHOT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._conn = self._open(path)
+
+    def _open(self, path: str) -> sqlite3.Connection:
+        if path:
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                conn = self._connect(path)
+                logger.info(f"記事スナップショット(SQLite)を開きました: {path}")
+                return conn
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"記事スナップショット(SQLite)を開けないためメモリ上で動作します: {path}: {e}")
+        return self._connect(":memory:")
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            " key TEXT PRIMARY KEY,"
+            " revision TEXT NOT NULL,"
+            " body TEXT NOT NULL,"
+            " summary TEXT NOT NULL,"
+            " increments INTEGER NOT NULL,"
+            " saved_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_snapshots_saved ON snapshots(saved_at)")
+        conn.commit()
+        return conn
+
+    def get(self, key: str) -> Optional[PostSnapshot]:
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT revision, body, summary, increments FROM snapshots WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"記事スナップショットの読み込みに失敗: {e}")
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return PostSnapshot(*row)
+
+    def set(self, key: str, snapshot: PostSnapshot):
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO snapshots (key, revision, body, summary, increments, saved_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, *snapshot, now),
+                )
+                self.stores += 1
+                # 上限を超えたら保存が古いものから削除する
+                if self.stores % 100 == 0:
+                    self._conn.execute(
+                        "DELETE FROM snapshots WHERE key IN (SELECT key FROM snapshots ORDER BY saved_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,),
+                    )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"記事スナップショットの書き込みに失敗: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "stores": self.stores}
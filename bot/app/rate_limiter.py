@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config.settings import (
+    GEMINI_RPM,
+    GEMINI_TPM,
+    ESA_REQUESTS_PER_15MIN,
+    SLACK_POSTS_PER_SECOND,
+    SLACK_UPDATES_PER_MINUTE,
+    SLACK_WEB_REQUESTS_PER_MINUTE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """トークンバケット（rate: 毎秒の補充量, capacity: 貯められる上限）
+
+    acquire() は先に残量を差し引いて（負になり得る）から不足分を待つ予約方式なので、
+    同時に待っている呼び出しは到着順に rate の間隔で払い出される。
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float):
+        self.name = name
+        self.rate = max(rate, 1e-9)
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waits = 0
+        self.waited_seconds = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def wait_time(self, amount: float = 1.0) -> float:
+        """今 amount を取得しようとした場合に待つ秒数"""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (amount - self._tokens) / self.rate)
+
+    def level(self) -> float:
+        """今の残量（補充を反映する。待っている予約があれば負）"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+    def _reserve(self, amount: float) -> float:
+        """amount 分を予約し、払い出されるまでに待つ秒数を返す"""
+        # 上限を超える量は永遠に貯まらないので上限で頭打ちにする
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= amount
+            wait = max(0.0, -self._tokens / self.rate)
+            self.acquired += 1
+            if wait > 0:
+                self.waits += 1
+                self.waited_seconds += wait
+        if wait > 0:
+            logger.debug(f"レート制限待機: {self.name} {wait:.2f}秒")
+        return wait
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """amount 分のトークンを取得する（足りなければ待つ）。待った秒数を返す"""
+        wait = self._reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, amount: float = 1.0) -> float:
+        """acquire() のイベントループ版（待つ間も他のコルーチンを止めない）"""
+        wait = self._reserve(amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def snapshot(self) -> Dict[str, float]:
+        """現在の状態（残量・次の1件の待ち時間・累計待機）"""
+        wait = self.wait_time()
+        with self._lock:
+            return {
+                "tokens": round(self._tokens, 3),
+                "rate_per_sec": self.rate,
+                "capacity": self.capacity,
+                "wait_seconds": round(wait, 3),
+                "acquired": self.acquired,
+                "waits": self.waits,
+                "waited_seconds": round(self.waited_seconds, 3),
+            }
+
+
+class RateLimiter:
+    """上流（Gemini / esa / Slack）ごとのトークンバケットをまとめて管理する
+
+    "slack.post:C123" のようにプレフィックスをテンプレートとして登録しておくと、
+    チャンネルごとのバケットを初回利用時に作る。
+    """
+
+    def __init__(self):
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._templates: Dict[str, Tuple[float, float]] = {}
+        self._watchers: List[Callable[[TokenBucket], None]] = []
+        self._lock = threading.Lock()
+
+    def add_bucket(self, name: str, rate: float, capacity: float) -> TokenBucket:
+        """バケットを登録（rate は毎秒の補充量）"""
+        bucket = TokenBucket(name, rate, capacity)
+        with self._lock:
+            self._buckets[name] = bucket
+            watchers = list(self._watchers)
+        for watch in watchers:
+            watch(bucket)
+        return bucket
+
+    def watch_buckets(self, fn: Callable[[TokenBucket], None]):
+        """登録済みのバケットと、これから作られるバケット（テンプレートから作るものも含む）ごとに fn を呼ぶ"""
+        with self._lock:
+            self._watchers.append(fn)
+            buckets = list(self._buckets.values())
+        for bucket in buckets:
+            fn(bucket)
+
+    def add_template(self, prefix: str, rate: float, capacity: float):
+        """prefix + ":" + 任意のキー のバケットを必要時に作るよう登録"""
+        with self._lock:
+            self._templates[prefix] = (rate, capacity)
+
+    def bucket(self, name: str) -> Optional[TokenBucket]:
+        """名前に対応するバケット（未登録なら None）"""
+        created = False
+        with self._lock:
+            bucket = self._buckets.get(name)
+            if bucket is None and ":" in name:
+                template = self._templates.get(name.split(":", 1)[0])
+                if template is not None:
+                    bucket = TokenBucket(name, *template)
+                    self._buckets[name] = bucket
+                    created = True
+            watchers = list(self._watchers) if created else []
+        for watch in watchers:
+            watch(bucket)
+        return bucket
+
+    def acquire(self, name: str, amount: float = 1.0) -> float:
+        """バケットからトークンを取得（未登録の名前は制限しない）。待った秒数を返す"""
+        bucket = self.bucket(name)
+        if bucket is None:
+            return 0.0
+        return bucket.acquire(amount)
+
+    async def acquire_async(self, name: str, amount: float = 1.0) -> float:
+        """acquire() のイベントループ版"""
+        bucket = self.bucket(name)
+        if bucket is None:
+            return 0.0
+        return await bucket.acquire_async(amount)
+
+    def wait_time(self, name: str, amount: float = 1.0) -> float:
+        """今取得した場合の待ち時間（秒）"""
+        bucket = self.bucket(name)
+        return bucket.wait_time(amount) if bucket is not None else 0.0
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """全バケットの状態"""
+        with self._lock:
+            buckets = list(self._buckets.values())
+        return {bucket.name: bucket.snapshot() for bucket in buckets}
+
+
+def build_rate_limiter() -> RateLimiter:
+    """設定値からバケットを構成したレートリミッタを作る"""
+    limiter = RateLimiter()
+    # Gemini: リクエスト数/分 と トークン数/分 の両方で制限される
+    limiter.add_bucket("gemini.requests", GEMINI_RPM / 60.0, GEMINI_RPM)
+    limiter.add_bucket("gemini.tokens", GEMINI_TPM / 60.0, GEMINI_TPM)
+    # esa: 15分あたりのリクエスト数
+    limiter.add_bucket("esa", ESA_REQUESTS_PER_15MIN / 900.0, ESA_REQUESTS_PER_15MIN)
+    # Slack: chat.postMessage はチャンネルごとに毎秒1件程度、chat.update は Tier 3
+    limiter.add_template("slack.post", SLACK_POSTS_PER_SECOND, max(1.0, SLACK_POSTS_PER_SECOND))
+    limiter.add_bucket("slack.update", SLACK_UPDATES_PER_MINUTE / 60.0, SLACK_UPDATES_PER_MINUTE)
+    limiter.add_bucket("slack.web", SLACK_WEB_REQUESTS_PER_MINUTE / 60.0, SLACK_WEB_REQUESTS_PER_MINUTE)
+    return limiter
+
+
+# プロセス内で共有するレートリミッタ（各クライアントは既定でこれを使う）
+rate_limiter = build_rate_limiter()
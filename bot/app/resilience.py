@@ -0,0 +1,306 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.metrics import registry
+from config.settings import (
+    RETRY_MAX_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+upstream_errors = registry.counter("upstream_errors_total", "上流API呼び出しの失敗数（再試行前の各試行を含む）")
+
+
+class UpstreamError(Exception):
+    """上流API（Gemini / esa / Slack）呼び出しの失敗
+
+    retryable は一時的な失敗（429・5xx・通信エラー）かどうか、
+    retry_after は上流が指定した再試行までの秒数。
+    """
+
+    upstream = "upstream"
+
+    def __init__(self, message: str, retryable: bool = False, retry_after: Optional[float] = None, status: Optional[int] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+        self.status = status
+
+
+class GeminiError(UpstreamError):
+    """Gemini API の失敗"""
+    upstream = "gemini"
+
+
+class EsaError(UpstreamError):
+    """esa API の失敗"""
+    upstream = "esa"
+
+
+class SlackError(UpstreamError):
+    """Slack API の失敗"""
+    upstream = "slack"
+
+
+class CircuitOpenError(UpstreamError):
+    """サーキットブレーカーが開いているため呼び出さなかった"""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} は障害中のため呼び出しを停止しています（{retry_after:.0f}秒後に再開）",
+                         retryable=False, retry_after=retry_after)
+        self.upstream = upstream
+
+
+class CircuitBreaker:
+    """連続失敗が閾値に達したら一定時間呼び出しを止めるサーキットブレーカー
+
+    closed（通常）→ open（即座に失敗）→ reset_timeout 経過後 half_open（1件だけ試行）
+    → 成功で closed、失敗で再び open。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            return self._state
+
+    def _maybe_half_open(self, now: float):
+        if self._state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        """呼び出してよいか確認する（止めている間は CircuitOpenError。half_open の試行を任されたら True）"""
+        with self._lock:
+            now = time.monotonic()
+            self._maybe_half_open(now)
+            if self._state == self.CLOSED:
+                return False
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            remaining = max(0.0, self.reset_timeout - (now - self._opened_at))
+        raise CircuitOpenError(self.name, remaining)
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"サーキットブレーカー復帰: {self.name}")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """成否が分からないまま終わった試行（キャンセルなど）を取り消し、次の呼び出しに試行を任せる"""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened += 1
+                    logger.warning(f"サーキットブレーカー遮断: {self.name} (連続失敗 {self._failures}回, {self.reset_timeout:.0f}秒停止)")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def snapshot(self) -> Dict:
+        return {"state": self.state, "failures": self._failures, "opened": self.opened, "rejected": self.rejected}
+
+
+class RetryPolicy:
+    """指数バックオフ（フルジッタ）で再試行する方針"""
+
+    def __init__(self, max_attempts: int = RETRY_MAX_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY, max_delay: float = RETRY_MAX_DELAY):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """attempt 回目（1始まり）の失敗後に待つ秒数。Retry-After があればそれ以上待つ"""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+        if retry_after is not None:
+            return max(backoff, retry_after)
+        return backoff
+
+
+def call_with_retry(
+    fn: Callable,
+    breaker: CircuitBreaker,
+    classify: Callable[[Exception], UpstreamError],
+    policy: RetryPolicy = None,
+    description: str = "",
+):
+    """ブレーカーを確認しながら fn を呼び、一時的な失敗だけを再試行する
+
+    失敗は classify で型付きの UpstreamError に変換して送出する。
+    Retry-After が max_delay を超える場合は待たずに諦め、ワーカーを占有しない。
+    成否を記録しないまま抜けた場合（KeyboardInterrupt やキャンセル）は half_open の試行を返す。
+    """
+    policy = policy or default_retry_policy
+    attempt = 0
+    while True:
+        attempt += 1
+        trial = breaker.allow()
+        try:
+            result = fn()
+        except Exception as e:
+            time.sleep(_retry_delay(e, attempt, breaker, classify, policy, description))
+            continue
+        except BaseException:
+            if trial:
+                breaker.release_trial()
+            raise
+        breaker.record_success()
+        return result
+
+
+async def call_with_retry_async(
+    fn: Callable[[], Awaitable],
+    breaker: CircuitBreaker,
+    classify: Callable[[Exception], UpstreamError],
+    policy: RetryPolicy = None,
+    description: str = "",
+):
+    """call_with_retry() のイベントループ版（fn はコルーチンを返す関数、待機は asyncio.sleep）"""
+    policy = policy or default_retry_policy
+    attempt = 0
+    while True:
+        attempt += 1
+        trial = breaker.allow()
+        try:
+            result = await fn()
+        except Exception as e:
+            await asyncio.sleep(_retry_delay(e, attempt, breaker, classify, policy, description))
+            continue
+        except BaseException:
+            # CancelledError は BaseException なので、試行を返さないとブレーカーが half_open のまま止まる
+            if trial:
+                breaker.release_trial()
+            raise
+        breaker.record_success()
+        return result
+
+
+def _retry_delay(error: Exception, attempt: int, breaker: CircuitBreaker, classify, policy: RetryPolicy, description: str) -> float:
+    """失敗を記録し、再試行までの秒数を返す（再試行しない場合は分類した例外を送出）"""
+    upstream_error = error if isinstance(error, UpstreamError) else classify(error)
+    upstream_errors.inc(upstream=breaker.name, retryable=str(upstream_error.retryable).lower())
+    if not upstream_error.retryable:
+        # 4xx など呼び出し側の問題は上流の障害として数えない
+        breaker.record_success()
+        raise upstream_error from error
+    breaker.record_failure()
+    if attempt >= policy.max_attempts:
+        logger.error(f"{breaker.name} 呼び出し失敗（{attempt}回試行）{description}: {upstream_error}")
+        raise upstream_error from error
+    if upstream_error.retry_after is not None and upstream_error.retry_after > policy.max_delay:
+        logger.error(f"{breaker.name} の Retry-After が長すぎるため再試行しません ({upstream_error.retry_after:.0f}秒) {description}")
+        raise upstream_error from error
+    delay = policy.delay(attempt, upstream_error.retry_after)
+    logger.warning(f"{breaker.name} 呼び出し失敗、{delay:.1f}秒後に再試行 ({attempt}/{policy.max_attempts}) {description}: {upstream_error}")
+    return delay
+
+
+_RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def _retry_after_header(headers) -> Optional[float]:
+    try:
+        value = headers.get("Retry-After") if headers is not None else None
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _gemini_retry_after(error: Exception) -> Optional[float]:
+    """REST の Retry-After ヘッダか、gRPC のエラー詳細の RetryInfo.retry_delay から待つ秒数を読む"""
+    retry_after = _retry_after_header(getattr(getattr(error, "response", None), "headers", None))
+    if retry_after is not None:
+        return retry_after
+    details = getattr(error, "details", None)  # grpc.RpcError では details() メソッドなので list のときだけ読む
+    for detail in details if isinstance(details, (list, tuple)) else ():
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return getattr(delay, "seconds", 0) + getattr(delay, "nanos", 0) / 1e9
+    return None
+
+
+def classify_gemini_error(error: Exception) -> GeminiError:
+    """Gemini SDK の例外を分類（google.api_core の例外は HTTP ステータスを code に持つ。429 は Retry-After を尊重）"""
+    status = getattr(error, "code", None)
+    if isinstance(status, int):
+        return GeminiError(f"Gemini API エラー ({status}): {error}", retryable=status in _RETRYABLE_STATUS,
+                           retry_after=_gemini_retry_after(error), status=status)
+    if isinstance(error, (ConnectionError, TimeoutError, OSError)):
+        return GeminiError(f"Gemini API 通信エラー: {error}", retryable=True)
+    # 応答のブロック（response.text の ValueError）などは再試行しても変わらない
+    return GeminiError(f"Gemini API エラー: {error}", retryable=False)
+
+
+def classify_esa_error(error: Exception) -> EsaError:
+    """requests の例外を分類（429 は X-RateLimit-Reset / Retry-After を尊重）"""
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is not None:
+        retry_after = _retry_after_header(response.headers)
+        if status == 429 and retry_after is None:
+            try:
+                retry_after = max(0.0, float(response.headers.get("X-RateLimit-Reset")) - time.time())
+            except (TypeError, ValueError):
+                retry_after = None
+        return EsaError(f"esa API エラー ({status}): {error}", retryable=status in _RETRYABLE_STATUS,
+                        retry_after=retry_after, status=status)
+    return EsaError(f"esa API 通信エラー: {error}", retryable=True)
+
+
+def classify_slack_error(error: Exception) -> SlackError:
+    """slack_sdk の例外を分類（ratelimited は Retry-After を尊重）"""
+    response = getattr(error, "response", None)
+    if response is not None:
+        status = getattr(response, "status_code", None)
+        code = response.get("error") if hasattr(response, "get") else None
+        if code == "ratelimited" or status == 429:
+            return SlackError(f"Slack API レート制限: {error}", retryable=True,
+                              retry_after=_retry_after_header(getattr(response, "headers", None)) or 1.0, status=status)
+        retryable = isinstance(status, int) and status >= 500
+        return SlackError(f"Slack API エラー ({code or status}): {error}", retryable=retryable, status=status)
+    return SlackError(f"Slack API 通信エラー: {error}", retryable=isinstance(error, (ConnectionError, TimeoutError, OSError)))
+
+
+default_retry_policy = RetryPolicy()
+
+# 上流ごとのサーキットブレーカー（プロセス内で共有）
+breakers: Dict[str, CircuitBreaker] = {
+    "gemini": CircuitBreaker("gemini"),
+    "esa": CircuitBreaker("esa"),
+    "slack": CircuitBreaker("slack"),
+}
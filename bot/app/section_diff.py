@@ -0,0 +1,81 @@
+import difflib
+from typing import List, NamedTuple
+
+from app.markdown_sections import Section, split_sections
+
+# 変更の種類
+ADDED = "added"
+MODIFIED = "modified"
+REMOVED = "removed"
+
+
+class SectionChange(NamedTuple):
+    """変更された見出し1つ分（追加・削除なら片方の本文は空）"""
+    kind: str
+    heading: str
+    old_text: str
+    new_text: str
+
+
+class SectionDiff(NamedTuple):
+    """2つの版の本文をセクション単位で比べた結果"""
+    changes: List[SectionChange]
+    changed_chars: int  # 変更・追加・削除された行の文字数（空白のみの違いは数えない）
+    total_chars: int  # 新旧で長い方の本文の文字数
+
+    @property
+    def ratio(self) -> float:
+        """本文のうち変更された割合（0〜1）"""
+        return min(1.0, self.changed_chars / self.total_chars) if self.total_chars else 0.0
+
+
+def _lines(text: str) -> List[str]:
+    # 行末の空白と空行の増減は変更とみなさない
+    return [line.rstrip() for line in text.splitlines() if line.strip()]
+
+
+def _section_key(section: Section):
+    return section.level, section.heading
+
+
+def _changed_chars(old_lines: List[str], new_lines: List[str]) -> int:
+    changed = 0
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal":
+            changed += max(sum(len(line) for line in old_lines[i1:i2]), sum(len(line) for line in new_lines[j1:j2]))
+    return changed
+
+
+def diff_sections(old_markdown: str, new_markdown: str) -> SectionDiff:
+    """見出しで区切ったセクションを対応付け、追加・変更・削除されたセクションを返す
+
+    セクションの対応は見出し（レベルと文字列）の並びの差分で取るので、
+    セクションの挿入や並べ替えがあっても他のセクションは変更扱いにならない。
+    """
+    old_sections, new_sections = split_sections(old_markdown), split_sections(new_markdown)
+    changes: List[SectionChange] = []
+    changed_chars = 0
+    matcher = difflib.SequenceMatcher(
+        None, [_section_key(s) for s in old_sections], [_section_key(s) for s in new_sections], autojunk=False
+    )
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            for old, new in zip(old_sections[i1:i2], new_sections[j1:j2]):
+                old_lines, new_lines = _lines(old.text), _lines(new.text)
+                if old_lines == new_lines:
+                    continue
+                changes.append(SectionChange(MODIFIED, new.heading, old.text, new.text))
+                changed_chars += _changed_chars(old_lines, new_lines)
+            continue
+        # 見出しが変わった・増えた・消えたセクションは追加と削除として扱う
+        for old in old_sections[i1:i2]:
+            if _lines(old.text):
+                changes.append(SectionChange(REMOVED, old.heading, old.text, ""))
+                changed_chars += sum(len(line) for line in _lines(old.text))
+        for new in new_sections[j1:j2]:
+            if _lines(new.text):
+                changes.append(SectionChange(ADDED, new.heading, "", new.text))
+                changed_chars += sum(len(line) for line in _lines(new.text))
+    total_chars = max(sum(len(line) for line in _lines(old_markdown or "")), sum(len(line) for line in _lines(new_markdown or "")))
+    return SectionDiff(changes, changed_chars, total_chars)
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """実行中の呼び出し（待機者はこの結果を共有する）"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """同じキーの同時呼び出しを1回の実行にまとめる
+
+    先に来た呼び出し（リーダー）だけが fn を実行し、実行中に同じキーで
+    来た呼び出しはその完了を待って同じ結果（または同じ例外）を受け取る。
+    完了後に来た呼び出しは新たに実行される（結果の保持はキャッシュ側の役割）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        """key ごとに fn を高々1つだけ実行し、その結果を返す"""
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            logger.info(f"実行中の同一リクエストに合流: {key}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    @property
+    def in_flight(self) -> int:
+        """実行中のキー数"""
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        """呼び出し数・実際の実行数・合流数"""
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight,
+        }
+
+
+class AsyncSingleFlight(SingleFlight):
+    """SingleFlight のイベントループ版（fn はコルーチン関数、合流した呼び出しは Future を待つ）
+
+    1つのイベントループからだけ使う前提なのでロックは取らない。
+    """
+
+    async def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        """key ごとに fn を高々1つだけ実行し、その結果を返す"""
+        self.calls += 1
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+            logger.info(f"実行中の同一リクエストに合流: {key}")
+            # 待機者が取り消されてもリーダーの処理は止めない
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        # 合流者がいなかった場合に「取り出されなかった例外」の警告を出さない
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        self.executions += 1
+        try:
+            result = await fn(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._calls.pop(key, None)
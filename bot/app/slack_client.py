@@ -0,0 +1,37 @@
+from slack_sdk import WebClient
+
+from app.rate_limiter import RateLimiter, rate_limiter as default_rate_limiter
+
+
+def slack_bucket_name(api_method: str, channel=None) -> str:
+    """Slack APIメソッドに対応するレート制限バケット名"""
+    if api_method == "chat.postMessage" and channel:
+        return f"slack.post:{channel}"
+    if api_method == "chat.update":
+        return "slack.update"
+    return "slack.web"
+
+
+def _request_channel(json=None, data=None, params=None):
+    for source in (json, data, params):
+        if isinstance(source, dict) and source.get("channel"):
+            return source["channel"]
+    return None
+
+
+class RateLimitedWebClient(WebClient):
+    """すべての Web API 呼び出しをレートリミッタに通す WebClient
+
+    Bolt の App に渡すと、say() やリスナーの client を含む全呼び出しが制限対象になる。
+    """
+
+    def __init__(self, *args, rate_limiter: RateLimiter = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = rate_limiter or default_rate_limiter
+
+    def api_call(self, api_method: str, *, http_verb="POST", files=None, data=None, params=None, json=None, headers=None, auth=None):
+        self.rate_limiter.acquire(slack_bucket_name(api_method, _request_channel(json, data, params)))
+        return super().api_call(
+            api_method, http_verb=http_verb, files=files, data=data, params=params, json=json, headers=headers, auth=auth
+        )
+
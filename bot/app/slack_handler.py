@@ -1,273 +1,282 @@
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
+from slack_bolt.request import BoltRequest
 from app.esa_client import EsaClient
 from app.gemini_client import GeminiClient
-from config.settings import SLACK_BOT_TOKEN, SLACK_APP_TOKEN, ESA_WATCH_CHANNEL_ID, ESA_SUMMARY_CHANNEL_IDS, DEBUG_VERBOSE
+from app.summary_cache import SummaryCache, make_cache_key, post_revision
+from app.post_snapshots import (
+    FULL, INCREMENTAL, TRIVIAL, UNCHANGED, PostSnapshot, PostSnapshotStore, TrivialEditSkipped, UpdatePlan, make_snapshot_key,
+    plan_update,
+)
+from app.single_flight import SingleFlight
+from app.event_dedup import EventDeduplicator, event_dedup_keys
+from app.slack_stream import StreamingMessage
+from app.channel_fanout import ChannelFanout
+from app.url_extractor import scan_event
+from app.mrkdwn_renderer import renderer, chunk_mrkdwn, normalize_numbering, SECTION_TEXT_LIMIT
+from app.summary_batcher import SummaryBatcher
+from app.rate_limiter import rate_limiter
+from app.resilience import UpstreamError, CircuitOpenError, breakers, call_with_retry, classify_slack_error
+from app.slack_client import RateLimitedWebClient
+from app.worker_pool import WorkerPool
+from app.job_queue import Job, JobQueue, POSTING, STATES, SUMMARIZING
+from app.lease import Lease, LeaseHeldError, LeaseLostError, build_lease_backend, instance_id
+from app.metrics import MetricsServer, registry
+from app.tracing import current_trace_id, install_log_correlation, set_attributes, tracer
+from app.startup import AuthCache, CachedAuthorize, startup
+from config.settings import SLACK_BOT_TOKEN, SLACK_APP_TOKEN, SLACK_API_URL, SLACK_MODE, SLACK_SIGNING_SECRET, SLACK_EVENTS_PATH, ESA_WATCH_CHANNEL_ID, ESA_SUMMARY_CHANNEL_IDS, DEBUG_VERBOSE, SUMMARY_SHUTDOWN_TIMEOUT, SUMMARY_CACHE_ENABLED, SUMMARY_STREAMING, SUMMARY_BATCH_WINDOW, SUMMARY_BATCH_MAX_POSTS, SUMMARY_WORKER_COUNT, METRICS_ENABLED, METRICS_PORT, SLACK_STARTUP_CHANNEL_CHECK, SUMMARY_JOB_POLL_INTERVAL, SUMMARY_LEASE_TTL, ESA_TEAM_NAME, SUMMARY_INCREMENTAL_ENABLED
 from app.debug_utils import step, log_kv, truncate
 import logging
 import re
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+# ジョブキューに保存する自動要約ジョブの種別
+AUTO_SUMMARY_JOB = "auto_summary"
 
-class SlackBot:
-    def __init__(self):
-        self.app = App(token=SLACK_BOT_TOKEN)
-        self.esa_client = EsaClient()
-        self.gemini_client = GeminiClient()
+
+class SlackBotBase:
+    """SlackBot と AsyncSlackBot に共通の処理（イベントの判定・オプション解析・整形と、要約・リースの判定）
+
+    Slack・esa・Gemini・キャッシュの読み書きは各サブクラスが行う。リースの保存先だけはここから同期で呼ぶので、
+    AsyncSlackBot はリースの操作をスレッドで実行する。
+    """
+
+    def _is_watched_bot_message(self, event) -> bool:
+        """監視チャンネルに届いた（自分以外の）Bot のメッセージか"""
+        # 削除のサブタイプは無視（bot_messageのみ処理する。message_changedは重複防止のため無視）
+        subtype = event.get('subtype')
+        if subtype and subtype not in ['bot_message']:
+            logger.debug(f"サブタイプ '{subtype}' のため無視")
+            return False
         
-        # BotのユーザーIDを取得
-        try:
-            auth = self.app.client.auth_test()
-            self.bot_user_id = auth.get("user_id")
-            logger.info(f"Bot User ID: {self.bot_user_id}")
-        except Exception as e:
-            logger.error(f"Failed to get bot user ID: {e}")
-            self.bot_user_id = None
+        text = event.get('text', '')
+        bot_id = event.get('bot_id')
+        bot_profile = event.get('bot_profile')
+        
+        # チャンネルIDを取得
+        channel_id = event.get('channel')
+        logger.debug(f"チャンネルID: {channel_id}, 監視対象: {ESA_WATCH_CHANNEL_ID}")
+        
+        # 監視対象チャンネル以外は無視
+        if not ESA_WATCH_CHANNEL_ID or channel_id != ESA_WATCH_CHANNEL_ID:
+            logger.debug(f"監視対象外のチャンネル '{channel_id}' のため無視")
+            return False
+        
+        # esaアプリ（または他のBot）からのメッセージか確認
+        # message_changed の場合はネスト内の bot 情報を使うため、ここで上書きしない
+        logger.info(f"チャンネル '{channel_id}' でメッセージ検出: bot_id={bot_id}, bot_profile={bool(bot_profile)}")
+        
+        if not bot_id and not bot_profile:
+            logger.debug(f"人間からのメッセージのため無視: {text[:50] if text else ''}")
+            return False  # 人間のメッセージは無視
+        
+        logger.info(f"Botメッセージを検出: bot_id={bot_id}, チャンネルID={channel_id}")
+        
+        # 自分のメッセージは無視
+        if self.bot_user_id and event.get('user') == self.bot_user_id:
+            logger.debug("自分のメッセージのため無視")
+            return False
+        return True
 
-        if DEBUG_VERBOSE:
-            @self.app.middleware  # 全イベント生ボディをログ
-            def log_raw(logger_mw, body, next):
-                try:
-                    logger.debug(f"[RAW EVENT] keys={list(body.keys())} body_trunc={truncate(str(body), 500)}")
-                except Exception:
-                    logger.debug("[RAW EVENT] <unprintable>")
-                return next()
-        self.setup_handlers()
-    
-    def setup_handlers(self):
-        """イベントハンドラのセットアップ"""
+    def _mention_text(self, event, scan):
+        """メンションのユーザーIDと、Botへのメンション部分を除いた本文"""
+        text = event.get('text', '') or ''
+        if not text and scan.block_text:
+            text = scan.block_text
+            logger.debug(f"blocksから再構築したテキスト: {text}")
+        user_id = event['user']
         
-        @self.app.event("message")
-        def handle_message(event, say, client):
-            """メッセージイベントを処理（自動要約）"""
-            if DEBUG_VERBOSE:
-                logger.info(f"メッセージイベント受信: {truncate(str(event),800)}")
-            with step("message_event"):
-                log_kv("message.meta", subtype=event.get('subtype'), channel=event.get('channel'))
-            
-            # 削除のサブタイプは無視（bot_messageのみ処理する。message_changedは重複防止のため無視）
-            subtype = event.get('subtype')
-            if subtype and subtype not in ['bot_message']:
-                logger.debug(f"サブタイプ '{subtype}' のため無視")
-                return
-            
-            text = event.get('text', '')
-            bot_id = event.get('bot_id')
-            bot_profile = event.get('bot_profile')
-            
-            # blocksのみの場合のフォールバック（esa通知でtextが空になるケース対応）
-            if not text and 'blocks' in event:
-                rebuilt = self._extract_text_from_blocks(event.get('blocks', []))
-                if rebuilt:
-                    text = rebuilt
-                    logger.debug(f"blocksから再構築したテキスト: {text[:200]}")
-            
-            # チャンネルIDを取得
-            channel_id = event.get('channel')
-            logger.debug(f"チャンネルID: {channel_id}, 監視対象: {ESA_WATCH_CHANNEL_ID}")
-            
-            # 監視対象チャンネル以外は無視
-            if not ESA_WATCH_CHANNEL_ID or channel_id != ESA_WATCH_CHANNEL_ID:
-                logger.debug(f"監視対象外のチャンネル '{channel_id}' のため無視")
-                return
-            
-            # esaアプリ（または他のBot）からのメッセージか確認
-            # message_changed の場合はネスト内の bot 情報を使うため、ここで上書きしない
-            logger.info(f"チャンネル '{channel_id}' でメッセージ検出: bot_id={bot_id}, bot_profile={bool(bot_profile)}")
-            
-            if not bot_id and not bot_profile:
-                logger.debug(f"人間からのメッセージのため無視: {text[:50] if text else ''}")
-                return  # 人間のメッセージは無視
-            
-            logger.info(f"Botメッセージを検出: bot_id={bot_id}, チャンネルID={channel_id}")
-            
-            # 自分のメッセージは無視
-            if self.bot_user_id and event.get('user') == self.bot_user_id:
-                logger.debug("自分のメッセージのため無視")
-                return
-            
-            # esa URLを抽出（text/blocks/attachments すべてを見る）
-            urls = self._collect_esa_urls(text, event.get('blocks'), event.get('attachments'))
-            
-            if not urls:
-                return  # esa URLが含まれていなければ無視
-            
-            # 各URLについて要約を生成（重複を除く）
-            processed_urls = set()
-            for url in urls:
-                # URLのクリーンアップ（末尾の記号を除去）
-                url = re.sub(r'[)>]$', '', url)
-                
-                if url in processed_urls:
-                    continue
-                processed_urls.add(url)
-                
-                # 要約を非同期的に処理（投稿元チャンネルIDを渡す）
-                with step("auto_summary_one"):
-                    self._process_auto_summary(url, client, channel_id)
+        # Botのメンション部分を除去
+        # <@U12345678> https://... -> https://...
+        return user_id, re.sub(r'<@[A-Z0-9]+>', '', text).strip()
+    
+    def _parse_summary_options(self, text: str):
+        """--length / --style を解釈し、(残りの本文, length, style) を返す"""
+        length = "medium"
+        style = "bullet"
         
-        @self.app.event("app_mention")
-        def handle_mention(event, say):
-            """Botへのメンションを処理"""
-            if DEBUG_VERBOSE:
-                logger.info(f"メンションイベント受信: {truncate(str(event),800)}")
-            with step("mention_event"):
-                log_kv("mention.meta", user=event.get('user'), channel=event.get('channel'))
-            # 安全にテキスト取得（blocksのみの場合のフォールバック）
-            text = event.get('text', '') or ''
-            if not text and 'blocks' in event:
-                try:
-                    text = self._extract_text_from_blocks(event.get('blocks', []))
-                    logger.debug(f"blocksから再構築したテキスト: {text}")
-                except Exception as e:
-                    logger.warning(f"blocksからテキスト再構築失敗: {e}")
-            user_id = event['user']
-            
-            # Botのメンション部分を除去
-            # <@U12345678> https://... -> https://...
-            text = re.sub(r'<@[A-Z0-9]+>', '', text).strip()
-            
-            # ヘルプメッセージ
-            if not text or 'help' in text.lower() or 'ヘルプ' in text:
-                help_message = self._get_help_message()
-                say(f"<@{user_id}>\n{help_message}")
-                return
-            
-            # パラメータ解析
-            length = "medium"
-            style = "bullet"
-            
-            # --length short などのオプション解析
-            length_match = re.search(r'--length\s+(short|medium|long)', text)
-            if length_match:
-                length = length_match.group(1)
-                text = re.sub(r'--length\s+(short|medium|long)', '', text).strip()
-            
-            style_match = re.search(r'--style\s+(bullet|paragraph)', text)
-            if style_match:
-                style = style_match.group(1)
-                text = re.sub(r'--style\s+(bullet|paragraph)', '', text).strip()
-            
-            # URL抽出
-            urls = self._collect_esa_urls(text, event.get('blocks'), event.get('attachments'))
-            if not urls:
-                say(f"<@{user_id}> ❌ エラー: esaのURLを指定してください\n\n{self._get_help_message()}")
-                return
-            
-            url = urls[0]
-            
-            # 処理中メッセージ
-            say(f"<@{user_id}> 📝 要約を生成中です... (長さ: {length}, 形式: {style})")
-            
-            # esa記事取得
-            post = self.esa_client.get_post_from_url(url)
-            if not post:
-                say(f"<@{user_id}> ❌ 記事の取得に失敗しました。URLを確認してください。")
-                return
-            
-            # 記事データ取得
-            post_data = post.get('post', post)
-            title = post_data.get('name', 'タイトルなし')
-            body = post_data.get('body_md', '')
-            category = post_data.get('category', '')
-            updated_at = post_data.get('updated_at', '')
-            post_number = post_data.get('number', '')
-            
-            if not body:
-                say(f"<@{user_id}> ❌ 記事の本文が空です。")
-                return
-            
-            # 要約生成
-            try:
-                with step("gemini_summarize"):
-                    summary = self.gemini_client.summarize(title, body, category, length, style)
-                    summary = self._normalize_numbering(summary)
-                
-                # 結果を整形して投稿
-                with step("format_and_send"):
-                    message_payload = self._format_summary_message(
-                        title, category, updated_at, summary, url, length, style, post_number, len(body)
-                    )
-                    response = say(**message_payload)
-                    if DEBUG_VERBOSE:
-                        logger.debug(f"chat.postMessage response={truncate(str(response),400)}")
-                
-            except Exception as e:
-                say(f"<@{user_id}> ❌ 要約生成中にエラーが発生しました: {str(e)}")
+        # --length short などのオプション解析
+        length_match = re.search(r'--length\s+(short|medium|long)', text)
+        if length_match:
+            length = length_match.group(1)
+            text = re.sub(r'--length\s+(short|medium|long)', '', text).strip()
         
-        @self.app.error
-        def handle_errors(error):
-            logger.exception(f"Slack Bolt エラー: {error}")
+        style_match = re.search(r'--style\s+(bullet|paragraph)', text)
+        if style_match:
+            style = style_match.group(1)
+            text = re.sub(r'--style\s+(bullet|paragraph)', '', text).strip()
+        return text, length, style
     
-    def _process_auto_summary(self, url: str, client, source_channel_id: str):
-        """自動要約を処理"""
-        try:
-            logger.info(f"自動要約処理を開始: {url}")
-            # 要約投稿先チャンネルIDリストを決定
-            if ESA_SUMMARY_CHANNEL_IDS:
-                summary_channel_ids = ESA_SUMMARY_CHANNEL_IDS
-                logger.info(f"投稿先チャンネル: {len(summary_channel_ids)}件")
-            else:
-                summary_channel_ids = [source_channel_id]
-                logger.warning(f"ESA_SUMMARY_CHANNEL_IDが設定されていません。フォールバックとして投稿元チャンネルに投稿します")
-            
-            # esa記事取得
-            post = self.esa_client.get_post_from_url(url)
-            if not post:
-                logger.warning(f"記事の取得に失敗: {url}")
-                return
-            
-            # 記事データ取得
-            post_data = post.get('post', post)
-            title = post_data.get('name', 'タイトルなし')
-            body = post_data.get('body_md', '')
-            category = post_data.get('category', '')
-            updated_at = post_data.get('updated_at', '')
-            post_number = post_data.get('number', '')
-            
-            if not body:
-                logger.warning(f"記事の本文が空: {url}")
-                return
-            
-            logger.info(f"要約を生成中: {title} (文字数: {len(body)}字)")
-            # 要約生成（デフォルト: medium + bullet）
-            length = "medium"
-            style = "bullet"
-            
-            with step("gemini_auto_summarize"):
-                summary = self.gemini_client.summarize(title, body, category, length, style)
-                summary = self._normalize_numbering(summary)
-            
-            # 結果を整形して投稿
-            message_payload = self._format_summary_message(
-                title, category, updated_at, summary, url, length, style, post_number, len(body)
+    def _register_common_metrics(self):
+        """イベント・ジョブ・エラーのカウンタと、各部品の状態を読むゲージを登録"""
+        self.events_received = registry.counter("slack_events_total", "受信した Slack イベント数")
+        self.summary_jobs = registry.counter("summary_jobs_total", "ワーカープールへの要約ジョブの投入数")
+        self.summary_errors = registry.counter("summary_errors_total", "要約処理の失敗数（失敗した上流別）")
+        self.http_requests = registry.counter("slack_http_requests_total", "http モードで受けた Events API リクエスト数（応答ステータス別）")
+        breaker_state = registry.gauge("circuit_breaker_state", "サーキットブレーカーの状態（0: closed, 1: half_open, 2: open）")
+        for name, breaker in self.breakers.items():
+            breaker_state.set_function(lambda b=breaker: {"closed": 0, "half_open": 1, "open": 2}.get(b.state, 0), upstream=name)
+        registry.counter("duplicate_events_total", "重複として破棄したイベント数").set_function(
+            lambda: self.event_dedup.stats()["duplicates"]
+        )
+        registry.counter("single_flight_coalesced_total", "実行中の同じ要約に合流したリクエスト数").set_function(
+            lambda: self.single_flight.stats()["coalesced"]
+        )
+        if self.summary_cache is not None:
+            cache = registry.counter("summary_cache_requests_total", "要約キャッシュの参照数")
+            for result, field in (("memory_hit", "memory_hits"), ("disk_hit", "disk_hits"), ("miss", "misses")):
+                cache.set_function(lambda f=field: self.summary_cache.stats()[f], result=result)
+        self.incremental_updates = registry.counter(
+            "summary_incremental_total", "前回の要約がある記事の更新方法（unchanged / trivial / incremental / full）"
+        )
+        # レートリミッタのバケットごとの残量と待ち時間（チャンネルごとのバケットは作られたときに加える）
+        bucket_tokens = registry.gauge("rate_limit_tokens", "レートリミッタの各バケットの残量（待っている予約があれば負）")
+        bucket_wait = registry.gauge("rate_limit_wait_seconds", "レートリミッタの各バケットから今1件取得した場合の待ち時間（秒）")
+
+        def watch_bucket(bucket):
+            bucket_tokens.set_function(bucket.level, bucket=bucket.name)
+            bucket_wait.set_function(bucket.wait_time, bucket=bucket.name)
+
+        self.rate_limiter.watch_buckets(watch_bucket)
+
+    def _summary_cache_key(self, post_data, length: str, style: str):
+        """要約キャッシュのキー（キャッシュ無効・記事番号不明なら None）"""
+        post_number = post_data.get('number')
+        if self.summary_cache is None or not post_number:
+            return None
+        return make_cache_key(
+            post_number, post_revision(post_data), length, style,
+            self.gemini_client.model_name, self.gemini_client.prompt_version
+        )
+    
+    def _snapshot_key(self, post_data, length: str, style: str):
+        """記事スナップショットのキー（差分要約が無効・記事番号不明なら None）"""
+        post_number = post_data.get('number')
+        if self.post_snapshots is None or not post_number:
+            return None
+        return make_snapshot_key(post_number, length, style, self.gemini_client.model_name, self.gemini_client.prompt_version)
+    
+    def _lease_key(self, post_data) -> str:
+        """記事番号と版をキーにしたリースのキー（全インスタンスで同じ値になる）"""
+        return f"esa:{ESA_TEAM_NAME}:{post_data.get('number')}:{post_revision(post_data)}"
+    
+    def _plan_update(self, post_data, snapshot: Optional[PostSnapshot]) -> UpdatePlan:
+        """前回要約したときの本文と比べて更新方法を決める"""
+        plan = plan_update(snapshot, post_revision(post_data), post_data.get('body_md', ''))
+        if plan.diff is not None:
+            logger.info(
+                f"前回の要約からの変更: #{post_data.get('number')} {plan.mode} "
+                f"(変更セクション: {len(plan.diff.changes)}件, 変更 {plan.diff.changed_chars}字/{plan.diff.total_chars}字)"
             )
-            
-            # 各チャンネルに投稿
-            for channel_id in summary_channel_ids:
-                try:
-                    with step(f"post_{channel_id}"):
-                        resp = client.chat_postMessage(
-                            channel=channel_id,
-                            **message_payload
-                        )
-                        if DEBUG_VERBOSE:
-                            logger.debug(f"post_result channel={channel_id} ok={getattr(resp,'get',lambda x:True)('ok') if hasattr(resp,'get') else 'n/a'} resp={truncate(str(resp),300)}")
-                    logger.info(f"✅ チャンネル {channel_id} へ投稿完了")
-                except Exception as e:
-                    logger.error(f"チャンネル {channel_id} への投稿失敗: {e}")
-            
-            logger.info(f"✅ 自動要約完了: {title} - {url}")
-            
-        except Exception as e:
-            logger.error(f"自動要約エラー ({url}): {str(e)}", exc_info=True)
+            set_attributes(update_mode=plan.mode, changed_chars=plan.diff.changed_chars)
+        return plan
     
-    def _format_summary_message(self, title, category, updated_at, summary, url, length, style, post_number, body_length):
-        """要約結果をSlack Block Kit形式で整形"""
+    def _next_snapshot(self, post_data, snapshot: Optional[PostSnapshot], plan: UpdatePlan, summary: str) -> PostSnapshot:
+        """次の版との比較に使うスナップショット（差分で更新した回数を数え、全文要約で 0 に戻す）"""
+        increments = snapshot.increments + 1 if plan.mode == INCREMENTAL else 0
+        return PostSnapshot(post_revision(post_data), post_data.get('body_md', ''), summary, increments)
+    
+    def _summary_keys(self, post_data, length: str, style: str):
+        """要約の前にトレースの属性を残し、(要約キャッシュのキー, スナップショットのキー) を返す"""
+        set_attributes(post_number=post_data.get('number'), body_length=len(post_data.get('body_md', '')),
+                       length=length, style=style)
+        return self._summary_cache_key(post_data, length, style), self._snapshot_key(post_data, length, style)
+    
+    def _use_cached_summary(self, post_data, length: str, style: str, cache_key, cached: Optional[str]) -> bool:
+        """要約キャッシュを引いた結果を記録し、その要約を返してよければ True"""
+        if not cache_key:
+            return False
+        set_attributes(cache_hit=cached is not None)
+        if cached is None:
+            return False
+        logger.info(f"要約キャッシュヒット: #{post_data.get('number')} {post_data.get('name', 'タイトルなし')} (長さ: {length}, 形式: {style})")
+        return True
+    
+    def _decide_update(self, post_data, snapshot: Optional[PostSnapshot], skip_trivial: bool = False,
+                       streaming: bool = False) -> UpdatePlan:
+        """前回のスナップショットから要約の作り方を決める
+
+        軽微な編集（TRIVIAL）は前回の要約をそのまま返す（この版のキャッシュには入れない）か、skip_trivial=True なら
+        TrivialEditSkipped を送出する。ストリーミングでは差分の要約をせず全文を要約する。
+        """
+        plan = self._plan_update(post_data, snapshot)
+        if plan.mode == INCREMENTAL and streaming:
+            plan = plan._replace(mode=FULL)
+        if snapshot is not None:
+            self.incremental_updates.inc(result=plan.mode)
+        if plan.mode == TRIVIAL:
+            if skip_trivial:
+                raise TrivialEditSkipped(
+                    f"#{post_data.get('number')} の変更は {plan.diff.changed_chars}字のみのため要約し直しません"
+                )
+            logger.info(f"軽微な編集のため前回の要約を使います: #{post_data.get('number')} {post_data.get('name', 'タイトルなし')}")
+        return plan
+    
+    def _finish_summary(self, post_data, snapshot: Optional[PostSnapshot], plan: UpdatePlan, summary: str):
+        """得た要約を整え、(要約, 保存するスナップショット) を返す（前回と同じ版ならスナップショットは None）"""
         summary = self._normalize_numbering(summary)
-        summary_mrkdwn = self._convert_markdown_to_mrkdwn(summary)
-        summary_sections = self._build_summary_sections(summary_mrkdwn)
+        if not summary or plan.mode == UNCHANGED:
+            return summary, None
+        return summary, self._next_snapshot(post_data, snapshot, plan, summary)
+    
+    def _acquire_post_lease(self, post_data) -> Optional[Lease]:
+        """記事番号と版をキーにリースを取る（リースを使わない設定なら None。取れなければ LeaseHeldError）"""
+        if self.leases is None:
+            return None
+        key = self._lease_key(post_data)
+        lease = self.leases.acquire(key, self.instance_id, SUMMARY_LEASE_TTL)
+        if lease is None:
+            raise LeaseHeldError(key, done=self.leases.is_done(key))
+        set_attributes(lease_key=key, lease_token=lease.token)
+        return lease
+    
+    def _renew_lease(self, lease: Optional[Lease]) -> Optional[Lease]:
+        if lease is None:
+            return None
+        renewed = self.leases.renew(lease, SUMMARY_LEASE_TTL)
+        if renewed is None:
+            raise LeaseLostError(f"リースの期限が切れました: {lease.key} token={lease.token}")
+        return renewed
+    
+    def _check_lease(self, lease: Optional[Lease]):
+        """投稿の直前に、まだ最新のリースか確かめる（他のインスタンスに引き継がれていれば LeaseLostError）"""
+        if lease is not None and not self.leases.is_valid(lease):
+            raise LeaseLostError(f"リースが他のインスタンスに引き継がれたため投稿しません: {lease.key} token={lease.token}")
+    
+    def _complete_lease(self, lease: Optional[Lease]):
+        if lease is not None and not self.leases.complete(lease):
+            logger.warning(f"処理済みにする前にリースを失いました: {lease.key} token={lease.token}")
+    
+    def _release_lease(self, lease: Optional[Lease]):
+        if lease is not None:
+            self.leases.release(lease)
+    
+    def _upstream_error_message(self, error: UpstreamError) -> str:
+        """上流の失敗をユーザー向けの文言にする"""
+        name = {"gemini": "Gemini", "esa": "esa", "slack": "Slack"}.get(error.upstream, error.upstream)
+        if isinstance(error, CircuitOpenError):
+            return f"❌ {name} で障害が続いているため一時的に要約を停止しています。しばらくしてから再度お試しください。"
+        if error.retryable:
+            return f"❌ {name} が一時的に利用できません。しばらくしてから再度お試しください。"
+        return f"❌ {name} の呼び出しに失敗しました: {error}"
+    
+    def _format_post_summary(self, post_data, summary, url, length, style):
+        """記事データと要約から投稿用ペイロードを作る"""
+        return self._format_summary_message(
+            post_data.get('name', 'タイトルなし'), post_data.get('category', ''), post_data.get('updated_at', ''),
+            summary, url, length, style, post_data.get('number', ''), len(post_data.get('body_md', ''))
+        )
+    
+    def _format_summary_message(self, title, category, updated_at, summary, url, length, style, post_number, body_length):
+        """要約結果をSlack Block Kit形式で整形（番号の正規化は要約生成時に済んでいる）"""
+        rendered = renderer.render(summary)
+        summary_mrkdwn = rendered.text
+        summary_sections = self._sections_from_chunks(rendered.chunks)
         fallback_lines = [
             f"{title}",
             f"カテゴリ: {category or 'なし'} / 更新: {updated_at or '不明'}",
@@ -309,151 +318,25 @@ class SlackBot:
         }
 
     def _convert_markdown_to_mrkdwn(self, markdown_text: str) -> str:
-        """簡易的にMarkdownをSlack mrkdwnに変換"""
-        if not markdown_text:
-            return ""
-        lines = markdown_text.strip().splitlines()
-        converted = []
-        in_code_block = False
-        for line in lines:
-            stripped = line.strip()
-            if stripped.startswith("```"):
-                in_code_block = not in_code_block
-                converted.append("```")
-                continue
-            if in_code_block:
-                converted.append(line)
-                continue
-            if not stripped:
-                converted.append("")
-                continue
-            heading_match = re.match(r"^(#{1,6})\s+(.*)", stripped)
-            if heading_match:
-                content = heading_match.group(2).strip()
-                converted.append(f"*{content}*")
-                continue
-            if stripped.startswith(('- ', '* ', '+ ')):
-                converted.append(f"• {stripped[2:].strip()}")
-                continue
-            converted.append(stripped)
-        mrkdwn = "\n".join(converted)
-        mrkdwn = re.sub(r"\*\*(.*?)\*\*", r"*\1*", mrkdwn)
-        mrkdwn = re.sub(r"__(.*?)__", r"_\1_", mrkdwn)
-        return mrkdwn
+        """MarkdownをSlack mrkdwnに変換"""
+        return renderer.render(markdown_text).text
 
     def _build_summary_sections(self, summary_text: str):
         """Slackのsectionブロックに収まるよう要約を分割"""
-        if not summary_text:
+        return self._sections_from_chunks(chunk_mrkdwn(summary_text) if summary_text else [])
+
+    def _sections_from_chunks(self, chunks):
+        if not chunks:
             return [{"type": "section", "text": {"type": "mrkdwn", "text": "要約が空です。"}}]
-        sections = []
-        for chunk in self._chunk_text(summary_text):
-            sections.append({
-                "type": "section",
-                "text": {"type": "mrkdwn", "text": chunk}
-            })
-        return sections
-
-    def _chunk_text(self, text: str, chunk_size: int = 2800):
+        return [{"type": "section", "text": {"type": "mrkdwn", "text": chunk}} for chunk in chunks]
+
+    def _chunk_text(self, text: str, chunk_size: int = SECTION_TEXT_LIMIT):
         """セクションの文字数制限に沿ってテキストを分割"""
-        chunks = []
-        remaining = text.strip()
-        while remaining:
-            if len(remaining) <= chunk_size:
-                chunks.append(remaining)
-                break
-            split_index = remaining.rfind('\n', 0, chunk_size)
-            if split_index == -1 or split_index < chunk_size * 0.6:
-                split_index = chunk_size
-            chunks.append(remaining[:split_index].rstrip())
-            remaining = remaining[split_index:].lstrip()
-        return chunks
+        return chunk_mrkdwn(text, chunk_size)
 
     def _normalize_numbering(self, summary: str) -> str:
         """\\1, \\2... のようなプレースホルダを 1,2,3... に置換し直す"""
-        if not summary or "\\" not in summary:
-            return summary
-        lines = []
-        counter = 1
-        for line in summary.splitlines():
-            had_placeholder = bool(re.search(r"\\+\d+", line))
-            if had_placeholder:
-                line = re.sub(r"\\+(?=\d)", "", line)
-                line = re.sub(r"\d+", lambda _m: str(counter), line, count=1)
-                counter += 1
-            lines.append(line)
-        return "\n".join(lines)
-
-    def _extract_text_from_blocks(self, blocks):
-        """blocksからテキストを復元する簡易ヘルパー"""
-        block_texts = []
-        for block in blocks or []:
-            if block.get('type') == 'rich_text':
-                for el in block.get('elements', []):
-                    if el.get('type') == 'rich_text_section':
-                        for sub in el.get('elements', []):
-                            if sub.get('type') == 'text':
-                                block_texts.append(sub.get('text',''))
-                            elif sub.get('type') == 'link' and sub.get('url'):
-                                block_texts.append(sub.get('url',''))
-            elif block.get('type') == 'section' and 'text' in block:
-                block_texts.append(block['text'].get('text',''))
-        return ' '.join(block_texts).strip()
-
-    def _collect_esa_urls(self, text: str, blocks=None, attachments=None):
-        """text/blocks/attachments から esa の投稿URLを集める"""
-        urls = set()
-        # text から
-        for raw in re.findall(r'https?://[^\s>]+', text or ""):
-            clean = self._clean_slack_url(raw)
-            if self._is_esa_post_url(clean):
-                urls.add(self._normalize_esa_url(clean))
-        # blocks から (リンク要素も拾う)
-        for block in blocks or []:
-            if block.get('type') == 'rich_text':
-                for el in block.get('elements', []):
-                    if el.get('type') == 'rich_text_section':
-                        for sub in el.get('elements', []):
-                            if sub.get('type') == 'link' and sub.get('url'):
-                                clean = self._clean_slack_url(sub.get('url',''))
-                                if self._is_esa_post_url(clean):
-                                    urls.add(self._normalize_esa_url(clean))
-                            elif sub.get('type') == 'text':
-                                for raw in re.findall(r'https?://[^\s>]+', sub.get('text','')):
-                                    clean = self._clean_slack_url(raw)
-                                    if self._is_esa_post_url(clean):
-                                        urls.add(self._normalize_esa_url(clean))
-            elif block.get('type') == 'section' and 'text' in block:
-                for raw in re.findall(r'https?://[^\s>]+', block['text'].get('text','')):
-                    clean = self._clean_slack_url(raw)
-                    if self._is_esa_post_url(clean):
-                        urls.add(self._normalize_esa_url(clean))
-        # attachments から
-        for att in attachments or []:
-            for key in ["original_url", "title_link", "from_url", "fallback", "text"]:
-                val = att.get(key)
-                if isinstance(val, str):
-                    for raw in re.findall(r'https?://[^\s>]+', val):
-                        clean = self._clean_slack_url(raw)
-                        if self._is_esa_post_url(clean):
-                            urls.add(self._normalize_esa_url(clean))
-        return list(urls)
-
-    def _clean_slack_url(self, url: str) -> str:
-        """<https://...|title> 形式の余分な記号を除去"""
-        url = url.split('|', 1)[0]
-        return url.strip('<>').rstrip(')')
-
-    def _is_esa_post_url(self, url: str) -> bool:
-        """esaの投稿URLか簡易判定"""
-        return bool(re.search(r'https?://[^/\s]+\.esa\.io/posts/\d+', url))
-
-    def _normalize_esa_url(self, url: str) -> str:
-        """esaのURLを正規化（/revisions/... などを除去）"""
-        # posts/123 までを抽出
-        match = re.search(r'(https?://[^/\s]+\.esa\.io/posts/\d+)', url)
-        if match:
-            return match.group(1)
-        return url
+        return normalize_numbering(summary)
 
     def _get_help_message(self):
         """ヘルプメッセージ"""
@@ -483,30 +366,724 @@ class SlackBot:
 @esa-summarizer https://your-team.esa.io/posts/456 --length long --style bullet
 ```
 """
+
+
+class SlackBot(SlackBotBase):
+    def __init__(self):
+        # ログの各行にイベントの trace_id を付け、並行処理中でもイベント単位で追えるようにする
+        install_log_correlation()
+        # Slack / esa / Gemini の呼び出しはすべて共有のレートリミッタを通す
+        self.rate_limiter = rate_limiter
+        # http モードでは signing secret でリクエスト署名を検証する（Socket Mode では使われない）
+        # トークンの検証（auth.test）は Bolt の初期化・イベントごとには行わず、start() で1回だけ（保存済みなら呼ばずに）行う
+        self.authorization = CachedAuthorize(self._authenticate)
+        self.app = App(
+            client=RateLimitedWebClient(token=SLACK_BOT_TOKEN, base_url=SLACK_API_URL, rate_limiter=self.rate_limiter),
+            signing_secret=SLACK_SIGNING_SECRET or None,
+            authorize=self.authorization,
+        )
+        self.esa_client = EsaClient(rate_limiter=self.rate_limiter)
+        self.gemini_client = GeminiClient(rate_limiter=self.rate_limiter)
+        # 上流ごとのサーキットブレーカー（障害中は待たずに失敗させ、ワーカーを塞がない）
+        self.breakers = breakers
+        # 同じ記事・同じ版・同じオプションの要約は再生成しない
+        self.summary_cache = SummaryCache() if SUMMARY_CACHE_ENABLED else None
+        # 編集された記事は前回の本文との差分から要約を更新する（軽微な編集なら要約し直さない）
+        self.post_snapshots = PostSnapshotStore() if SUMMARY_INCREMENTAL_ENABLED else None
+        # 通知が集中したときは複数記事を1回のリクエストでまとめて要約する（自動要約のみ）
+        # 待ち合わせ中の記事はワーカーを1つずつ塞ぐので、まとめる件数はワーカー数までにする
+        self.summary_batcher = SummaryBatcher(
+            self.gemini_client.summarize_batch, max_posts=min(SUMMARY_BATCH_MAX_POSTS, SUMMARY_WORKER_COUNT)
+        ) if SUMMARY_BATCH_WINDOW > 0 else None
+        # 同じ記事の同時リクエスト（複数通知・通知とメンション）は1回の取得・要約にまとめる
+        self.single_flight = SingleFlight()
+        # Slackの再送（X-Slack-Retry-Num）などで届いた同一イベントを弾く
+        self.event_dedup = EventDeduplicator()
+        # 要約処理はワーカープールで実行し、イベントハンドラはすぐに返す
+        self.worker_pool = WorkerPool()
+        # 自動要約はジョブキュー（SQLite）に保存してからワーカーが取り出す（前回の未完了ジョブはここで再開待ちに戻す）
+        self.job_queue = JobQueue()
+        self.job_queue.recover()
+        # 複数インスタンスで動かすときは、記事の版ごとのリースを取れたインスタンスだけが要約・投稿する
+        self.leases = build_lease_backend()
+        self.instance_id = instance_id()
+        self._job_lock = threading.Lock()
+        self._job_runners = 0
+        self._job_poll_stop = threading.Event()
+        # 複数の投稿先チャンネルへは並列に投稿する
+        self.fanout = ChannelFanout()
+        self.socket_handler = None
+        self.metrics_server = None
+        self.mode = SLACK_MODE
+        # 停止処理に入ったら http モードの新規イベントは 503 で返し、Slack に他のインスタンスへ再送させる
+        self._draining = False
+        self._register_metrics()
+        # BotのユーザーIDは start() で auth.test（または保存済みの結果）から取得する
+        self.auth_cache = AuthCache()
+        self.bot_user_id = None
+
+        @self.app.middleware  # リスナーの client / say もレート制限付きクライアントを使う
+        def use_rate_limited_client(context, next):
+            context["client"] = self.app.client
+            context.pop("say", None)
+            return next()
+
+        if DEBUG_VERBOSE:
+            @self.app.middleware  # 全イベント生ボディをログ
+            def log_raw(logger_mw, body, next):
+                try:
+                    logger.debug(f"[RAW EVENT] keys={list(body.keys())} body_trunc={truncate(str(body), 500)}")
+                except Exception:
+                    logger.debug("[RAW EVENT] <unprintable>")
+                return next()
+        self.setup_handlers()
     
-    def start(self):
-        """Botを起動"""
-        # トークン/ユーザー確認
-        if self.bot_user_id:
-             logger.info(f"🤖 Bot User ID: {self.bot_user_id}")
+    def setup_handlers(self):
+        """イベントハンドラのセットアップ"""
+        
+        @self.app.event("message")
+        def handle_message(event, say, client, body=None):
+            """メッセージイベントを処理（自動要約）"""
+            # イベントごとにトレースを始める（ワーカーでの取得・要約・投稿はこのトレースの子区間になる）
+            with tracer.start_trace("slack.message", channel=event.get('channel'), event_ts=event.get('ts'),
+                                    event_id=(body or {}).get('event_id')):
+                self._handle_message(event, client, body)
+        
+        @self.app.event("app_mention")
+        def handle_mention(event, say, body=None):
+            """Botへのメンションを処理"""
+            with tracer.start_trace("slack.app_mention", channel=event.get('channel'), event_ts=event.get('ts'),
+                                    event_id=(body or {}).get('event_id'), user=event.get('user')):
+                self._handle_mention(event, say, body)
+        
+        @self.app.error
+        def handle_errors(error):
+            logger.exception(f"Slack Bolt エラー: {error}")
+    
+    def _handle_message(self, event, client, body=None):
+        """メッセージイベントの本体（監視チャンネルの esa 通知なら記事ごとにジョブを投入）"""
+        if DEBUG_VERBOSE:
+            logger.info(f"メッセージイベント受信: {truncate(str(event),800)}")
+        self.events_received.inc(type="message")
+        with step("message_event"):
+            log_kv("message.meta", subtype=event.get('subtype'), channel=event.get('channel'))
+        
+        if not self._is_watched_bot_message(event):
+            return
+        text = event.get('text', '')
+        channel_id = event.get('channel')
+        
+        # 再送・重複イベントは esa/Gemini の処理前に破棄
+        if self.event_dedup.is_duplicate(event_dedup_keys("message", event, body)):
+            logger.info(f"重複イベントのため無視: channel={channel_id} ts={event.get('ts')}")
+            return
+        
+        # esa記事を抽出（text/blocks/attachments を1回ずつ走査し、記事単位で重複を除く）
+        scan = scan_event(event)
+        if not text and scan.block_text:
+            # blocksのみの場合（esa通知でtextが空になるケース）
+            logger.debug(f"blocksから再構築したテキスト: {scan.block_text[:200]}")
+        
+        if not scan.posts:
+            return  # esa URLが含まれていなければ無視
+        set_attributes(post_numbers=",".join(str(post.number) for post in scan.posts))
+        
+        # 各記事について要約ジョブを保存し、ワーカーに取り出させる（再起動しても保存済みのジョブは失われない）
+        for post in scan.posts:
+            if self._enqueue_auto_summary(post, channel_id, event) is not None:
+                self.summary_jobs.inc(source="auto", result="queued")
+            else:
+                self.summary_jobs.inc(source="auto", result="duplicate")
+                logger.info(f"同じイベントの要約ジョブが既にあるため無視: {post.url}")
+        self._kick_jobs()
+    
+    def _handle_mention(self, event, say, body=None):
+        """メンションの本体（オプションを解釈してジョブを投入）"""
+        if DEBUG_VERBOSE:
+            logger.info(f"メンションイベント受信: {truncate(str(event),800)}")
+        self.events_received.inc(type="app_mention")
+        with step("mention_event"):
+            log_kv("mention.meta", user=event.get('user'), channel=event.get('channel'))
+        # 再送・重複イベントは破棄（同じメンションに二重に返信しない）
+        if self.event_dedup.is_duplicate(event_dedup_keys("app_mention", event, body)):
+            logger.info(f"重複メンションのため無視: channel={event.get('channel')} ts={event.get('ts')}")
+            return
+        # text/blocks/attachments を1回だけ走査（blocksのみの場合は blocks のテキストを使う）
+        scan = scan_event(event)
+        user_id, text = self._mention_text(event, scan)
+        
+        # ヘルプメッセージ
+        if not text or 'help' in text.lower() or 'ヘルプ' in text:
+            help_message = self._get_help_message()
+            say(f"<@{user_id}>\n{help_message}")
+            return
+        
+        text, length, style = self._parse_summary_options(text)
+        
+        # URL抽出（最初に書かれた記事を要約する）
+        if not scan.posts:
+            say(f"<@{user_id}> ❌ エラー: esaのURLを指定してください\n\n{self._get_help_message()}")
+            return
+        
+        url = scan.posts[0].url
+        
+        # 処理中メッセージ（ストリーミング時はこのメッセージを要約で書き換える）
+        placeholder = say(f"<@{user_id}> 📝 要約を生成中です... (長さ: {length}, 形式: {style})")
+        
+        # 取得・要約・投稿はワーカープールで実行
+        if self.worker_pool.submit(self._process_mention_summary, url, user_id, length, style, say, placeholder):
+            self.summary_jobs.inc(source="mention", result="queued")
         else:
-             logger.error(f"auth_test に失敗している可能性があります。")
-        # チャンネル存在/参加状況確認
+            self.summary_jobs.inc(source="mention", result="rejected")
+            say(f"<@{user_id}> ⚠️ 現在要約リクエストが混み合っています。しばらくしてから再度お試しください。")
+    
+    def _fetch_and_summarize(self, url: str, length: str, style: str, batch: bool = False, on_fetched=None,
+                             skip_trivial: bool = False):
+        """記事を取得して要約する（同じ記事・オプションの同時リクエストは1回にまとめる）
+
+        戻り値は (post_data, summary)。取得失敗時は post_data が None、本文が空なら summary が None。
+        batch=True ならバッチ要約の待ち合わせに参加する。on_fetched は取得後・要約前に呼ぶ（実行した呼び出しのみ）。
+        skip_trivial=True なら軽微な編集で TrivialEditSkipped を送出する（自動要約用。メンションとは合流させない）。
+        """
+        post_number = self.esa_client.extract_post_number_from_url(url)
+        key = (post_number or url, length, style, skip_trivial)
+        return self.single_flight.do(key, self._fetch_and_summarize_once, url, length, style, batch, on_fetched, skip_trivial)
+    
+    def _fetch_and_summarize_once(self, url: str, length: str, style: str, batch: bool = False, on_fetched=None,
+                                  skip_trivial: bool = False):
+        """記事取得と要約生成の本体"""
+        # esa記事取得
+        with step("esa_fetch"):
+            post = self.esa_client.get_post_from_url(url)
+        if not post:
+            return None, None
+        
+        post_data = post.get('post', post)
+        body = post_data.get('body_md', '')
+        if not body:
+            return post_data, None
+        
+        if on_fetched is not None:
+            on_fetched()
+        logger.info(f"要約を生成中: {post_data.get('name', 'タイトルなし')} (文字数: {len(body)}字)")
+        with step("gemini_summarize"):
+            summary = self._summarize_post(post_data, length, style, batch=batch, skip_trivial=skip_trivial)
+        return post_data, summary
+    
+    def _fetch_post(self, url: str):
+        """記事を取得して (post_data, 本文が空でないか) を返す（取得失敗時は (None, False)）"""
+        with step("esa_fetch"):
+            post = self.esa_client.get_post_from_url(url)
+        if not post:
+            return None, False
+        post_data = post.get('post', post)
+        return post_data, bool(post_data.get('body_md', ''))
+    
+    def _process_mention_summary(self, url: str, user_id: str, length: str, style: str, say, placeholder=None):
+        """メンションによる手動要約を処理"""
+        if SUMMARY_STREAMING and placeholder is not None:
+            self._process_mention_summary_streaming(url, user_id, length, style, placeholder)
+            return
         try:
-            target_ids = [cid for cid in [ESA_WATCH_CHANNEL_ID, *ESA_SUMMARY_CHANNEL_IDS] if cid]
-            for cid in target_ids:
-                try:
-                    info = self.app.client.conversations_info(channel=cid)
-                    ch = info.get('channel', {})
-                    logger.info(f"🔍 channel={cid} name={ch.get('name')} is_member={ch.get('is_member')} private={ch.get('is_private')}")
-                    if not ch.get('is_member'):
-                        logger.warning(f"Botはチャンネル {cid} に未参加です。/invite で追加してください。")
-                except Exception as ce:
-                    logger.warning(f"conversations.info 取得失敗 channel={cid}: {ce}")
+            post_data, summary = self._fetch_and_summarize(url, length, style)
+            if post_data is None:
+                say(f"<@{user_id}> ❌ 記事の取得に失敗しました。URLを確認してください。")
+                return
+            if summary is None:
+                say(f"<@{user_id}> ❌ 記事の本文が空です。")
+                return
+            
+            # 記事データ取得
+            title = post_data.get('name', 'タイトルなし')
+            body = post_data.get('body_md', '')
+            category = post_data.get('category', '')
+            updated_at = post_data.get('updated_at', '')
+            post_number = post_data.get('number', '')
+            
+            # 結果を整形して投稿
+            with step("format_and_send"):
+                message_payload = self._format_summary_message(
+                    title, category, updated_at, summary, url, length, style, post_number, len(body)
+                )
+                response = self._slack_call(say, **message_payload)
+                if DEBUG_VERBOSE:
+                    logger.debug(f"chat.postMessage response={truncate(str(response),400)}")
+            
+        except UpstreamError as e:
+            self.summary_errors.inc(source="mention", upstream=e.upstream)
+            logger.error(f"手動要約エラー ({url}): {e}")
+            say(f"<@{user_id}> {self._upstream_error_message(e)}")
         except Exception as e:
-            logger.warning(f"チャンネル検査中にエラー: {e}")
-        handler = SocketModeHandler(self.app, SLACK_APP_TOKEN)
-        logger.info("⚡️ Bolt app is running!")
+            self.summary_errors.inc(source="mention", upstream="internal")
+            say(f"<@{user_id}> ❌ 要約生成中にエラーが発生しました: {str(e)}")
+    
+    def _process_mention_summary_streaming(self, url: str, user_id: str, length: str, style: str, placeholder):
+        """処理中メッセージを生成途中の要約で書き換えながら手動要約を処理"""
+        message = StreamingMessage(self.app.client, placeholder["channel"], placeholder["ts"])
+        try:
+            post_data, has_body = self._fetch_post(url)
+            if post_data is None:
+                message.finish(text=f"<@{user_id}> ❌ 記事の取得に失敗しました。URLを確認してください。")
+                return
+            if not has_body:
+                message.finish(text=f"<@{user_id}> ❌ 記事の本文が空です。")
+                return
+            with step("gemini_summarize"):
+                summary = self._summarize_post(post_data, length, style, stream_to=[message])
+            with step("format_and_send"):
+                message.finish(**self._format_post_summary(post_data, summary, url, length, style))
+        except UpstreamError as e:
+            self.summary_errors.inc(source="mention", upstream=e.upstream)
+            logger.error(f"ストリーミング要約エラー ({url}): {e}")
+            message.finish(text=f"<@{user_id}> {self._upstream_error_message(e)}")
+        except Exception as e:
+            self.summary_errors.inc(source="mention", upstream="internal")
+            logger.error(f"ストリーミング要約エラー ({url}): {e}", exc_info=True)
+            message.finish(text=f"<@{user_id}> ❌ 要約生成中にエラーが発生しました: {str(e)}")
+    
+    def _process_auto_summary_streaming(self, url: str, client, summary_channel_ids, length: str, style: str,
+                                        job: Optional[Job] = None):
+        """各投稿先にメッセージを1回だけ投稿し、生成途中の要約で書き換えていく
+
+        job を渡すと非ストリーミングと同じく処理の段階と、最終結果に書き換えたチャンネルを記録し、結果に応じてジョブを終える。
+        リースを使う設定なら、プレースホルダの投稿と最終結果への書き換えの直前にまだ最新のリースか確かめる。
+        要約中にリースを失ったら投稿済みのプレースホルダを消して LeaseLostError を送出する。
+        """
+        post_data, has_body = self._fetch_post(url)
+        if post_data is None:
+            logger.warning(f"記事の取得に失敗: {url}")
+            self._fail_job(job, "記事の取得に失敗", retry=False)
+            return
+        if not has_body:
+            logger.warning(f"記事の本文が空: {url}")
+            self._complete_job(job)
+            return
+        if self._is_trivial_edit(post_data, length, style):
+            logger.info(f"軽微な編集のため自動要約をスキップ: {url}")
+            self.summary_jobs.inc(source="auto", result="skipped_trivial_edit")
+            self._complete_job(job)
+            return
+        lease = self._acquire_post_lease(post_data)
+        self._advance_job(job, SUMMARIZING)
+        title = post_data.get('name', 'タイトルなし')
+        placeholder_text = f"📝 *要約: {title}* を生成中です..."
+        report = self.fanout.deliver(
+            lambda channel_id: self._post_placeholder(client, channel_id, placeholder_text, lease), summary_channel_ids
+        )
+        failed_channels = [delivery.channel for delivery in report.failed]
+        messages = [delivery.result for delivery in report.succeeded]
+        if not messages:
+            self._release_lease(lease)
+            self._fail_job(job, f"投稿に失敗したチャンネル: {', '.join(failed_channels)}")
+            return
+        try:
+            with step("gemini_auto_summarize"):
+                summary = self._summarize_post(post_data, length, style, stream_to=messages)
+        except Exception as e:
+            self.summary_errors.inc(source="auto", upstream=getattr(e, "upstream", "internal"))
+            logger.error(f"ストリーミング要約エラー ({url}): {e}", exc_info=True)
+            by_channel = {message.channel: message for message in messages}
+            self.fanout.deliver(
+                lambda channel_id: by_channel[channel_id].finish(text=f"❌ 要約生成中にエラーが発生しました: {title}"),
+                by_channel,
+            )
+            self._release_lease(lease)
+            retry = not isinstance(e, UpstreamError) or e.retryable or isinstance(e, CircuitOpenError)
+            self._fail_job(job, str(e), retry=retry)
+            return
+        by_channel = {message.channel: message for message in messages}
+        try:
+            # 要約に時間がかかってもリースを失っていないことを確かめてから書き換える
+            lease = self._renew_lease(lease)
+        except LeaseLostError:
+            self.fanout.deliver(lambda channel_id: by_channel[channel_id].delete(), by_channel)
+            raise
+        message_payload = self._format_post_summary(post_data, summary, url, length, style)
+        self._advance_job(job, POSTING)
+        report = self.fanout.deliver(
+            lambda channel_id: self._finish_stream(by_channel[channel_id], message_payload, lease, job), by_channel
+        )
+        failed_channels += [delivery.channel for delivery in report.failed]
+        logger.info(f"✅ 自動要約完了: {title} - {url} 投稿結果: {report.summary()}")
+        if failed_channels:
+            # 失敗したチャンネルだけ後で投稿し直す（リースは期限まで持ち続け、再試行で取り直す）
+            self._fail_job(job, f"投稿に失敗したチャンネル: {', '.join(failed_channels)}")
+        else:
+            self._complete_lease(lease)
+            self._complete_job(job)
+    
+    def _process_auto_summary(self, url: str, client, source_channel_id: str, job: Optional[Job] = None):
+        """自動要約を処理
+
+        job を渡すと処理の段階と投稿済みのチャンネルをジョブキューに記録し、結果に応じてジョブを終える
+        （再試行できる失敗ならジョブキューが後で再実行する）。
+        リースを使う設定なら、記事の版ごとのリースを取れたインスタンスだけが要約・投稿する。
+        """
+        lease = None
+        try:
+            logger.info(f"自動要約処理を開始: {url}")
+            set_attributes(url=url)
+            # 要約投稿先チャンネルIDリストを決定
+            if ESA_SUMMARY_CHANNEL_IDS:
+                summary_channel_ids = ESA_SUMMARY_CHANNEL_IDS
+                logger.info(f"投稿先チャンネル: {len(summary_channel_ids)}件")
+            else:
+                summary_channel_ids = [source_channel_id]
+                logger.warning(f"ESA_SUMMARY_CHANNEL_IDが設定されていません。フォールバックとして投稿元チャンネルに投稿します")
+            if job is not None and job.delivered:
+                # 再開したジョブは投稿済みのチャンネルを飛ばす
+                summary_channel_ids = [cid for cid in summary_channel_ids if cid not in job.delivered]
+                logger.info(f"ジョブ再開: 投稿済み {len(job.delivered)}件を除く {len(summary_channel_ids)}件に投稿します")
+            
+            # 要約生成（デフォルト: medium + bullet）
+            length = "medium"
+            style = "bullet"
+            if SUMMARY_STREAMING:
+                self._process_auto_summary_streaming(url, client, summary_channel_ids, length, style, job)
+                return
+            if self.leases is not None:
+                post_data, summary, lease = self._fetch_and_summarize_leased(url, length, style, job)
+            else:
+                post_data, summary = self._fetch_and_summarize(
+                    url, length, style, batch=True, on_fetched=lambda: self._advance_job(job, SUMMARIZING), skip_trivial=True
+                )
+            if post_data is None:
+                logger.warning(f"記事の取得に失敗: {url}")
+                self._fail_job(job, "記事の取得に失敗", retry=False)
+                return
+            if summary is None:
+                logger.warning(f"記事の本文が空: {url}")
+                self._complete_job(job)
+                return
+            # 要約に時間がかかってもリースを失っていないことを確かめてから投稿する
+            lease = self._renew_lease(lease)
+            
+            # 記事データ取得
+            title = post_data.get('name', 'タイトルなし')
+            body = post_data.get('body_md', '')
+            category = post_data.get('category', '')
+            updated_at = post_data.get('updated_at', '')
+            post_number = post_data.get('number', '')
+            
+            # 結果を整形して投稿（ペイロードは1回だけ作り、全チャンネルで同じものを使う）
+            with step("format"):
+                message_payload = self._format_summary_message(
+                    title, category, updated_at, summary, url, length, style, post_number, len(body)
+                )
+            
+            # 各チャンネルに並列に投稿
+            self._advance_job(job, POSTING)
+            with step("post_fanout"):
+                report = self.fanout.deliver(
+                    lambda channel_id: self._post_to_channel(client, channel_id, message_payload, job, lease), summary_channel_ids
+                )
+            
+            logger.info(f"✅ 自動要約完了: {title} - {url} 投稿結果: {report.summary()}")
+            if report.failed:
+                # 失敗したチャンネルだけ後で投稿し直す（リースは期限まで持ち続け、再試行で取り直す）
+                self._fail_job(job, f"投稿に失敗したチャンネル: {', '.join(d.channel for d in report.failed)}")
+            else:
+                self._complete_lease(lease)
+                self._complete_job(job)
+            
+        except TrivialEditSkipped as e:
+            logger.info(f"自動要約をスキップ ({url}): {e}")
+            self.summary_jobs.inc(source="auto", result="skipped_trivial_edit")
+            self._complete_job(job)
+        except LeaseHeldError as e:
+            # 他のインスタンスが処理済みならこのジョブは終わり、処理中なら後で確かめ直す
+            logger.info(f"自動要約をスキップ ({url}): {e}")
+            self.summary_jobs.inc(source="auto", result="skipped_by_lease")
+            if e.done:
+                self._complete_job(job)
+            else:
+                self._fail_job(job, str(e))
+        except LeaseLostError as e:
+            logger.warning(f"自動要約を中断 ({url}): {e}")
+            self._fail_job(job, str(e))
+        except UpstreamError as e:
+            self.summary_errors.inc(source="auto", upstream=e.upstream)
+            logger.error(f"自動要約エラー ({url}): {e}")
+            retry = e.retryable or isinstance(e, CircuitOpenError)
+            if not retry:
+                self._release_lease(lease)
+            self._fail_job(job, str(e), retry=retry, retry_after=e.retry_after)
+        except Exception as e:
+            self.summary_errors.inc(source="auto", upstream="internal")
+            logger.error(f"自動要約エラー ({url}): {str(e)}", exc_info=True)
+            self._fail_job(job, str(e))
+    
+    def _fetch_and_summarize_leased(self, url: str, length: str, style: str, job: Optional[Job]):
+        """記事を取得し、その版のリースを取れたときだけ要約する（戻り値は (post_data, summary, lease)）
+
+        取得と要約の間でリースを取るため、同じ記事の同時リクエストをまとめる single flight は通さない
+        （他のインスタンスが保持していれば LeaseHeldError を送出する）。
+        """
+        post_data, has_body = self._fetch_post(url)
+        if post_data is None or not has_body:
+            return post_data, None, None
+        lease = self._acquire_post_lease(post_data)
+        self._advance_job(job, SUMMARIZING)
+        try:
+            with step("gemini_summarize"):
+                summary = self._summarize_post(post_data, length, style, batch=True, skip_trivial=True)
+        except TrivialEditSkipped:
+            # 他のインスタンスも同じ版を要約し直さないよう、処理済みにする
+            self._complete_lease(lease)
+            raise
+        except UpstreamError as e:
+            if not (e.retryable or isinstance(e, CircuitOpenError)):
+                self._release_lease(lease)
+            raise
+        return post_data, summary, lease
+    
+    def _enqueue_auto_summary(self, post, channel_id: str, event) -> Optional[int]:
+        """自動要約のジョブをジョブキューに保存する（同じイベント・同じ記事のジョブは1つだけ）"""
+        payload = {"url": post.url, "channel": channel_id, "trace_id": current_trace_id()}
+        return self.job_queue.enqueue(AUTO_SUMMARY_JOB, payload, dedup_key=f"{channel_id}:{event.get('ts')}:{post.number}")
+    
+    def _kick_jobs(self):
+        """実行を待つジョブの数だけ（最大でワーカー数まで）ワーカープールにジョブの取り出しを投入する"""
+        if self._draining:
+            return
+        with self._job_lock:
+            wanted = min(self.job_queue.ready_count(), self.worker_pool.workers) - self._job_runners
+            for _ in range(wanted):
+                if not self.worker_pool.submit(self._run_next_job):
+                    break
+                self._job_runners += 1
+    
+    def _run_next_job(self):
+        """ジョブを1件取り出して実行する（1件ごとに返すので、メンションの要約もワーカーに割り込める）"""
+        job = None
+        try:
+            if not self._draining:
+                job = self.job_queue.claim()
+            if job is not None:
+                self._run_job(job)
+        finally:
+            with self._job_lock:
+                self._job_runners -= 1
+        if job is not None:
+            self._kick_jobs()
+    
+    def _run_job(self, job: Job):
+        if job.kind != AUTO_SUMMARY_JOB:
+            self.job_queue.fail(job.id, f"未知のジョブ種別: {job.kind}", retry=False)
+            return
+        payload = job.payload
+        # 受信時のトレースとは別のトレースになるので、元の trace_id を属性に残す
+        with tracer.start_trace("job.auto_summary", job_id=job.id, attempt=job.attempts, event_trace_id=payload.get("trace_id")):
+            self._process_auto_summary(payload["url"], self.app.client, payload["channel"], job=job)
+    
+    def _poll_jobs(self):
+        """再試行の待ち時間が過ぎたジョブや期限切れのジョブを定期的に拾う"""
+        while not self._job_poll_stop.wait(SUMMARY_JOB_POLL_INTERVAL):
+            try:
+                self._kick_jobs()
+            except Exception as e:
+                logger.warning(f"ジョブキューの確認に失敗: {e}")
+    
+    def _advance_job(self, job: Optional[Job], state: str):
+        if job is not None:
+            self.job_queue.advance(job.id, state)
+    
+    def _complete_job(self, job: Optional[Job]):
+        if job is not None:
+            self.job_queue.complete(job.id)
+    
+    def _fail_job(self, job: Optional[Job], error: str, retry: bool = True, retry_after: Optional[float] = None):
+        if job is None:
+            return
+        if self._draining and retry:
+            # 停止処理で中断された失敗は試行回数に数えず、処理中のまま残して次の起動ですぐ再開する
+            logger.info(f"停止処理中のためジョブを次の起動に持ち越します: id={job.id} error={error}")
+            return
+        self.job_queue.fail(job.id, error, retry=retry, retry_after=retry_after)
+    
+    def _is_trivial_edit(self, post_data, length: str, style: str) -> bool:
+        """前回要約した版からの変更が軽微か（要約キャッシュにある版や、差分要約が無効なら False）"""
+        snapshot_key = self._snapshot_key(post_data, length, style)
+        if not snapshot_key:
+            return False
+        cache_key = self._summary_cache_key(post_data, length, style)
+        if cache_key and self.summary_cache.get(cache_key) is not None:
+            return False
+        if self._plan_update(post_data, self.post_snapshots.get(snapshot_key)).mode != TRIVIAL:
+            return False
+        self.incremental_updates.inc(result=TRIVIAL)
+        return True
+    
+    def _summarize_post(self, post_data, length: str, style: str, stream_to=None, batch: bool = False,
+                        skip_trivial: bool = False) -> str:
+        """要約キャッシュを確認し、無ければGeminiで要約を生成して保存
+
+        stream_to に StreamingMessage のリストを渡すと、生成途中の要約でそれらを更新する。
+        batch=True でバッチ化が有効なら、同時期に届いた記事とまとめて要約する。
+        前回要約した版があれば本文の差分を調べ、軽微な編集なら前回の要約を返し（skip_trivial=True なら
+        TrivialEditSkipped を送出し）、それ以外は変更されたセクションと前回の要約から更新する（ストリーミング時を除く）。
+        """
+        title = post_data.get('name', 'タイトルなし')
+        body = post_data.get('body_md', '')
+        category = post_data.get('category', '')
+        cache_key, snapshot_key = self._summary_keys(post_data, length, style)
+        cached = self.summary_cache.get(cache_key) if cache_key else None
+        if self._use_cached_summary(post_data, length, style, cache_key, cached):
+            return cached
+        snapshot = self.post_snapshots.get(snapshot_key) if snapshot_key else None
+        plan = self._decide_update(post_data, snapshot, skip_trivial, streaming=bool(stream_to))
+        if plan.mode == TRIVIAL:
+            return snapshot.summary
+        if plan.mode == UNCHANGED:
+            summary = snapshot.summary
+        elif plan.mode == INCREMENTAL:
+            summary = self.gemini_client.summarize_incremental(
+                title, snapshot.summary, plan.diff.changes, category, length, style
+            )
+        else:
+            summary = None
+            if batch and not stream_to and self.summary_batcher is not None:
+                # バッチに入らなかった（1件のみ・失敗・応答に無い）場合は None が返り、個別に要約する
+                summary = self.summary_batcher.submit(post_data, length, style).result()
+            if summary is None and stream_to:
+                summary = self._stream_summary(title, body, category, length, style, stream_to)
+            elif summary is None:
+                summary = self.gemini_client.summarize(title, body, category, length, style)
+        summary, next_snapshot = self._finish_summary(post_data, snapshot, plan, summary)
+        if cache_key and summary:
+            self.summary_cache.set(cache_key, summary)
+        if snapshot_key and next_snapshot is not None:
+            self.post_snapshots.set(snapshot_key, next_snapshot)
+        return summary
+    
+    def _post_to_channel(self, client, channel_id: str, message_payload, job: Optional[Job] = None,
+                         lease: Optional[Lease] = None):
+        """1チャンネルへ投稿（一時的な失敗は再試行。job を渡すと投稿済みとして記録する）
+
+        lease を渡すと投稿の直前にまだ最新のリースか確かめ、他のインスタンスに引き継がれていれば投稿しない。
+        """
+        self._check_lease(lease)
+        resp = self._slack_call(client.chat_postMessage, channel=channel_id, **message_payload)
+        if job is not None:
+            self.job_queue.record_delivery(job.id, channel_id)
+        if DEBUG_VERBOSE:
+            logger.debug(f"post_result channel={channel_id} ok={getattr(resp,'get',lambda x:True)('ok') if hasattr(resp,'get') else 'n/a'} resp={truncate(str(resp),300)}")
+        logger.info(f"✅ チャンネル {channel_id} へ投稿完了")
+        return resp
+    
+    def _post_placeholder(self, client, channel_id: str, text: str, lease: Optional[Lease] = None) -> StreamingMessage:
+        """ストリーミングで書き換えていくメッセージを投稿する（lease を渡すと投稿の直前に確かめる）"""
+        self._check_lease(lease)
+        return self._slack_call(StreamingMessage.post, client=client, channel=channel_id, text=text)
+    
+    def _finish_stream(self, message, message_payload, lease: Optional[Lease] = None, job: Optional[Job] = None):
+        """ストリーミング中のメッセージを最終結果に書き換える（失敗は例外にして結果に残す。job を渡すと投稿済みとして記録する）"""
+        self._check_lease(lease)
+        if not message.finish(**message_payload):
+            raise RuntimeError(f"chat.update に失敗しました: channel={message.channel}")
+        if job is not None:
+            self.job_queue.record_delivery(job.id, message.channel)
+        logger.info(f"✅ チャンネル {message.channel} へ投稿完了（更新 {message.updates}回）")
+    
+    def _slack_call(self, fn, **kwargs):
+        """Slack API をブレーカーと再試行（ratelimited は Retry-After を尊重）を通して呼ぶ"""
+        with tracer.span(f"slack.{getattr(fn, '__name__', 'call')}", channel=kwargs.get("channel")):
+            return call_with_retry(lambda: fn(**kwargs), self.breakers["slack"], classify_slack_error)
+    
+    def _stream_summary(self, title, body, category, length, style, messages) -> str:
+        """ストリーミング応答を受け取りながら、間引いた間隔でメッセージを途中経過に書き換える"""
+        parts = []
+        for chunk in self.gemini_client.summarize_stream(title, body, category, length, style):
+            parts.append(chunk)
+            due = [m for m in messages if m.due()]
+            if not due:
+                continue
+            preview = self._convert_markdown_to_mrkdwn("".join(parts))
+            for message in due:
+                message.update(f"📝 *要約: {title}*（生成中...）\n{preview}")
+        return "".join(parts)
+    
+    def _register_metrics(self):
+        """共通のメトリクスに加え、ワーカープールと Socket Mode の状態を読むゲージを登録"""
+        self._register_common_metrics()
+        queue_depth = registry.gauge("worker_queue_depth", "待機中の要約ジョブ数")
+        queue_depth.set_function(lambda: self.worker_pool.queue_depth)
+        registry.gauge("worker_active_jobs", "実行中の要約ジョブ数").set_function(lambda: self.worker_pool.active)
+        registry.gauge("socket_mode_connected", "Socket Mode で接続中なら 1").set_function(
+            lambda: 1 if self._socket_connected() else 0
+        )
+        job_states = registry.gauge("summary_job_queue_jobs", "ジョブキューの状態ごとの要約ジョブ数")
+        for state in STATES:
+            job_states.set_function(lambda state=state: self.job_queue.counts()[state], state=state)
+        jobs = registry.counter("worker_jobs_total", "ワーカープールで処理したジョブ数")
+        jobs.set_function(lambda: self.worker_pool.completed, result="completed")
+        jobs.set_function(lambda: self.worker_pool.failed, result="failed")
+        jobs.set_function(lambda: self.worker_pool.rejected, result="rejected")
+
+    def _socket_connected(self) -> bool:
+        handler = self.socket_handler
+        if handler is None:
+            return False
+        try:
+            return bool(handler.client.is_connected())
+        except Exception:
+            return False
+
+    def liveness(self):
+        """プロセスが処理を続けられるか（ワーカーが全て動いているか）"""
+        if not self.worker_pool.is_alive():
+            return False, "workers stopped"
+        return True, "ok"
+
+    def readiness(self):
+        """イベントを受け取って処理できるか（Socket Mode の接続とワーカー）"""
+        alive, reason = self.liveness()
+        if not alive:
+            return False, reason
+        if self._draining:
+            return False, "shutting down"
+        if self.mode != "http" and not self._socket_connected():
+            return False, "socket mode disconnected"
+        return True, "ok"
+
+    def handle_http_event(self, body: bytes, headers, query: str = ""):
+        """Events API の HTTP リクエストを処理する（署名検証と ack は Bolt が行う）
+
+        リスナーは検証してワーカープールに投入するだけなので、3秒以内に ack が返る。
+        """
+        if self._draining:
+            self.http_requests.inc(status="503")
+            return 503, {"Content-Type": "text/plain; charset=utf-8"}, "shutting down\n"
+        request = BoltRequest(body=body.decode("utf-8"), query=query, headers=headers)
+        response = self.app.dispatch(request)
+        self.http_requests.inc(status=str(response.status))
+        response_headers = {name: values[0] for name, values in response.headers.items() if values}
+        return response.status, response_headers, response.body or ""
+
+    def start(self):
+        """Botを起動（SLACK_MODE=http なら Socket Mode の代わりに Events API を HTTP で受ける）"""
+        startup.mark("init")
+        http_mode = self.mode == "http"
+        if http_mode and not SLACK_SIGNING_SECRET:
+            raise SystemExit("SLACK_MODE=http には SLACK_SIGNING_SECRET の設定が必要です")
+        if (METRICS_ENABLED or http_mode) and self.metrics_server is None:
+            # Socket Mode の接続前から応答し、Cloud Run の起動チェックを通す（/readyz は接続後に 200）
+            try:
+                self.metrics_server = MetricsServer(METRICS_PORT, liveness=self.liveness, readiness=self.readiness)
+            except OSError as e:
+                if http_mode:
+                    raise
+                logger.error(f"メトリクスサーバを起動できません (port={METRICS_PORT}): {e}")
+            else:
+                if http_mode:
+                    # Cloud Run が公開するのは1ポートだけなので、イベントもヘルスチェックと同じポートで受ける
+                    self.metrics_server.add_post_route(SLACK_EVENTS_PATH, self.handle_http_event)
+                self.metrics_server.start()
+        startup.mark("metrics_server")
+        # auth.test（保存済みなら呼ばない）は起動ログの出力・ハンドラの準備と並行して進め、接続の前に待つ
+        auth_thread = threading.Thread(target=self._authenticate, name="slack-auth", daemon=True)
+        auth_thread.start()
+        logger.info(f"⚡️ Bolt app is running! (mode={self.mode})")
         logger.info(f"📡 監視チャンネルID: {ESA_WATCH_CHANNEL_ID or '未設定'}")
         if ESA_SUMMARY_CHANNEL_IDS:
             logger.info(f"📝 要約投稿先ID: {', '.join(ESA_SUMMARY_CHANNEL_IDS)} ({len(ESA_SUMMARY_CHANNEL_IDS)}件)")
@@ -514,4 +1091,113 @@ class SlackBot:
             logger.info("📝 要約投稿先ID: 未設定（元チャンネルにフォールバック）")
         logger.info("💡 Botにメンションして要約を開始してください")
         logger.info("   例: @esa-summarizer https://your-team.esa.io/posts/123")
-        handler.start()
+        # Cloud Run は停止前に SIGTERM を送るので、受信時にキューを処理し切ってから終了する
+        signal.signal(signal.SIGTERM, self._handle_sigterm)
+        try:
+            if http_mode:
+                logger.info(f"🌐 Events API を受信中: POST :{self.metrics_server.port}{SLACK_EVENTS_PATH}")
+                # リクエストはサーバのスレッドで処理されるので、メインスレッドは停止要求を待つだけ
+                auth_thread.join()
+                self._on_ready()
+                threading.Event().wait()
+            else:
+                handler = SocketModeHandler(self.app, SLACK_APP_TOKEN)
+                self.socket_handler = handler
+                # 接続直後に届くイベントでも Bot のユーザーIDを使えるよう、認証を終えてから接続する
+                auth_thread.join()
+                handler.connect()
+                startup.mark("connect")
+                self._on_ready()
+                threading.Event().wait()
+        except KeyboardInterrupt:
+            logger.info("停止要求を受信しました")
+        finally:
+            self.shutdown()
+    
+    def _authenticate(self):
+        """Bot のユーザーIDを取得し、Bolt の認可にも同じ結果を渡す"""
+        with startup.phase("auth"):
+            try:
+                auth, cached = self.auth_cache.auth_test(self.app.client)
+            except Exception as e:
+                logger.error(f"Failed to get bot user ID: {e}")
+                logger.error(f"auth_test に失敗している可能性があります。")
+                return
+            self.bot_user_id = auth.get("user_id")
+            self.authorization.set(self.app.client.token, auth)
+            logger.info(f"🤖 Bot User ID: {self.bot_user_id}" + (" (保存済みの auth.test 結果)" if cached else ""))
+
+    def _on_ready(self):
+        """起動時間の内訳を記録し、起動に不要な確認はバックグラウンドで行う"""
+        startup.ready()
+        threading.Thread(target=self._background_startup, name="startup-probes", daemon=True).start()
+        # 前回のプロセスから引き継いだジョブを再開し、以降は再試行待ちのジョブを定期的に拾う
+        self._kick_jobs()
+        threading.Thread(target=self._poll_jobs, name="job-poller", daemon=True).start()
+
+    def _background_startup(self):
+        if SLACK_STARTUP_CHANNEL_CHECK:
+            with startup.phase("channel_check"):
+                self._check_channels()
+        # 最初の要約で SDK の import とモデル生成を待たないよう、先に読み込んでおく
+        with startup.phase("gemini_warm_up"):
+            try:
+                self.gemini_client.warm_up()
+            except Exception as e:
+                logger.warning(f"Gemini モデルの事前読み込みに失敗: {e}")
+
+    def _check_channel(self, cid: str):
+        try:
+            info = self.app.client.conversations_info(channel=cid)
+            ch = info.get('channel', {})
+            logger.info(f"🔍 channel={cid} name={ch.get('name')} is_member={ch.get('is_member')} private={ch.get('is_private')}")
+            if not ch.get('is_member'):
+                logger.warning(f"Botはチャンネル {cid} に未参加です。/invite で追加してください。")
+        except Exception as ce:
+            logger.warning(f"conversations.info 取得失敗 channel={cid}: {ce}")
+
+    def _check_channels(self):
+        """監視・投稿先チャンネルの存在/参加状況を並行して確認"""
+        target_ids = [cid for cid in [ESA_WATCH_CHANNEL_ID, *ESA_SUMMARY_CHANNEL_IDS] if cid]
+        if not target_ids:
+            return
+        try:
+            with ThreadPoolExecutor(max_workers=min(8, len(target_ids)), thread_name_prefix="channel-check") as pool:
+                list(pool.map(self._check_channel, target_ids))
+        except Exception as e:
+            logger.warning(f"チャンネル検査中にエラー: {e}")
+
+    def _handle_sigterm(self, signum, frame):
+        """SIGTERM を受けたらメインスレッドの待機を抜ける"""
+        logger.info("SIGTERM を受信しました")
+        raise SystemExit(0)
+    
+    def shutdown(self, timeout: float = SUMMARY_SHUTDOWN_TIMEOUT):
+        """新規イベントの受信を止め、処理中の要約を完了させてから停止"""
+        self._draining = True
+        if self.socket_handler:
+            try:
+                self.socket_handler.close()
+            except Exception as e:
+                logger.warning(f"Socket Mode 切断中にエラー: {e}")
+            self.socket_handler = None
+        # 取り出し待ちのジョブは次の起動で再開する（実行中のものは終わるまで待つ）
+        self._job_poll_stop.set()
+        self.worker_pool.shutdown(timeout=timeout)
+        self.fanout.shutdown()
+        logger.info(f"要約ジョブキュー統計: {self.job_queue.stats()} 状態別: {self.job_queue.counts()}")
+        if self.summary_batcher is not None:
+            self.summary_batcher.close()
+            logger.info(f"バッチ要約統計: {self.summary_batcher.stats()}")
+        if self.summary_cache is not None:
+            logger.info(f"要約キャッシュ統計: {self.summary_cache.stats()}")
+        if self.post_snapshots is not None:
+            logger.info(f"記事スナップショット統計: {self.post_snapshots.stats()}")
+        logger.info(f"レート制限統計: {self.rate_limiter.snapshot()}")
+        logger.info(f"同時リクエスト合流統計: {self.single_flight.stats()}")
+        logger.info(f"イベント重複判定統計: {self.event_dedup.stats()}")
+        logger.info(f"サーキットブレーカー統計: { {name: b.snapshot() for name, b in self.breakers.items()} }")
+        tracer.shutdown()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
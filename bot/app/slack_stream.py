@@ -0,0 +1,91 @@
+import logging
+import time
+from typing import Optional
+
+from slack_sdk.errors import SlackApiError
+
+from config.settings import SLACK_STREAM_UPDATE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# section ブロック / text の文字数制限に収めるための上限
+_PREVIEW_LIMIT = 3000
+
+
+class StreamingMessage:
+    """投稿済みのメッセージを chat.update で間引きながら書き換える
+
+    chat.update は Tier 3（おおむね毎分50回）なので、interval 秒に1回までしか更新しない。
+    ratelimited が返ったら Retry-After の間は更新を止める。最終結果は finish() で必ず反映する。
+    """
+
+    def __init__(self, client, channel: str, ts: str, interval: float = SLACK_STREAM_UPDATE_INTERVAL):
+        self.client = client
+        self.channel = channel
+        self.ts = ts
+        self.interval = interval
+        self.updates = 0
+        self._next_update_at = 0.0
+
+    @classmethod
+    def post(cls, client, channel: str, text: str, interval: float = SLACK_STREAM_UPDATE_INTERVAL) -> "StreamingMessage":
+        """プレースホルダを投稿し、そのメッセージを更新対象にする"""
+        resp = client.chat_postMessage(channel=channel, text=text, unfurl_links=False, unfurl_media=False)
+        return cls(client, resp["channel"], resp["ts"], interval)
+
+    def due(self) -> bool:
+        """今更新してよいか（前回更新から interval 秒経過しているか）"""
+        return time.monotonic() >= self._next_update_at
+
+    def update(self, text: str) -> bool:
+        """途中経過を反映する（間隔内なら何もしない）"""
+        if not self.due():
+            return False
+        if len(text) > _PREVIEW_LIMIT:
+            text = text[:_PREVIEW_LIMIT - 1] + "…"
+        return self._update(text=text)
+
+    def finish(self, **payload) -> bool:
+        """最終結果（blocks など）を反映する。レート制限中なら待ってから再試行する"""
+        for _ in range(3):
+            wait = self._next_update_at - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            if self._update(**payload):
+                return True
+        return False
+
+    def delete(self) -> bool:
+        """メッセージを削除する（他のインスタンスに要約を譲ったときなど）"""
+        try:
+            self.client.chat_delete(channel=self.channel, ts=self.ts)
+            return True
+        except SlackApiError as e:
+            logger.warning(f"chat.delete 失敗 channel={self.channel} ts={self.ts}: {e}")
+            return False
+
+    def _update(self, **payload) -> bool:
+        try:
+            self.client.chat_update(channel=self.channel, ts=self.ts, **payload)
+            self.updates += 1
+            self._next_update_at = time.monotonic() + self.interval
+            return True
+        except SlackApiError as e:
+            retry_after = self._retry_after(e)
+            if retry_after is not None:
+                logger.warning(f"chat.update がレート制限に達したため {retry_after:.0f}秒停止: channel={self.channel}")
+                self._next_update_at = time.monotonic() + retry_after
+            else:
+                logger.warning(f"chat.update 失敗 channel={self.channel} ts={self.ts}: {e}")
+                self._next_update_at = time.monotonic() + self.interval
+            return False
+
+    @staticmethod
+    def _retry_after(error: SlackApiError) -> Optional[float]:
+        response = getattr(error, "response", None)
+        if response is None or response.get("error") != "ratelimited":
+            return None
+        try:
+            return float(response.headers.get("Retry-After", 1))
+        except (TypeError, ValueError, AttributeError):
+            return 1.0
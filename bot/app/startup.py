@@ -0,0 +1,179 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from slack_bolt.authorization import AuthorizeResult
+from slack_bolt.authorization.authorize import Authorize
+from slack_sdk.web import SlackResponse
+
+from app.metrics import registry
+from config.settings import SLACK_AUTH_CACHE_PATH, SLACK_AUTH_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+startup_seconds = registry.gauge("startup_phase_seconds", "起動の各段階の所要時間（秒）")
+
+
+class StartupTimer:
+    """起動の各段階（import・初期化・認証・接続など）の所要時間を記録する
+
+    mark(name) は直前の区切りからの経過を name の段階として記録する。
+    バックグラウンドで並行して進める段階は phase() で個別に測る。
+    """
+
+    def __init__(self, started_at: Optional[float] = None):
+        self.started_at = started_at if started_at is not None else time.monotonic()
+        self._last = self.started_at
+        self._lock = threading.Lock()
+        self.phases: List[Tuple[str, float]] = []
+        self.ready_at: Optional[float] = None
+
+    def reset(self, started_at: float):
+        """計測の起点をプロセス起動直後（main の先頭）に合わせる"""
+        with self._lock:
+            self.started_at = self._last = started_at
+
+    def mark(self, name: str) -> float:
+        now = time.monotonic()
+        with self._lock:
+            elapsed = now - self._last
+            self._last = now
+            self.phases.append((name, elapsed))
+        startup_seconds.set(elapsed, phase=name)
+        return elapsed
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self.phases.append((name, elapsed))
+            startup_seconds.set(elapsed, phase=name)
+
+    def ready(self):
+        """イベントを受け取れる状態になった時刻を記録し、段階ごとの内訳をログに出す"""
+        self.ready_at = time.monotonic()
+        total = self.ready_at - self.started_at
+        startup_seconds.set(total, phase="total")
+        logger.info(f"🚀 起動完了 {total * 1000:.0f}ms ({self.summary()})")
+
+    def summary(self) -> str:
+        with self._lock:
+            phases = list(self.phases)
+        return " / ".join(f"{name} {elapsed * 1000:.0f}ms" for name, elapsed in phases)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            data = {name: round(elapsed, 4) for name, elapsed in self.phases}
+        if self.ready_at is not None:
+            data["total"] = round(self.ready_at - self.started_at, 4)
+        return data
+
+
+class AuthCache:
+    """auth.test の結果をトークンごとにファイルへ保存し、再起動時の呼び出しを省く
+
+    キーはトークンのハッシュなので、トークンを入れ替えれば保存済みの結果は使われない。
+    """
+
+    def __init__(self, path: str = SLACK_AUTH_CACHE_PATH, ttl: float = SLACK_AUTH_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256((token or "").encode("utf-8")).hexdigest()[:16]
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self, client) -> Optional[SlackResponse]:
+        """有効期限内の結果があれば auth.test の応答として返す（無ければ None）"""
+        if not self.path or self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._read().get(self._key(client.token))
+        if not entry or time.time() - entry.get("saved_at", 0) > self.ttl:
+            return None
+        return _auth_response(client, entry["data"], entry.get("scopes"))
+
+    def store(self, client, response):
+        """auth.test の応答を保存する（書き込みに失敗しても起動は続ける）"""
+        if not self.path or self.ttl <= 0:
+            return
+        entry = {"saved_at": time.time(), "data": dict(response.data), "scopes": response.headers.get("x-oauth-scopes")}
+        with self._lock:
+            entries = self._read()
+            entries[self._key(client.token)] = entry
+            try:
+                if os.path.dirname(self.path):
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"auth.test の結果を保存できません ({self.path}): {e}")
+
+    def auth_test(self, client) -> Tuple[SlackResponse, bool]:
+        """保存済みの結果か、無ければ auth.test を呼んだ結果を返す（2つ目は保存済みを使ったか）"""
+        cached = self.load(client)
+        if cached is not None:
+            return cached, True
+        response = client.auth_test()
+        self.store(client, response)
+        return response, False
+
+
+def _auth_response(client, data: Dict, scopes: Optional[str]) -> SlackResponse:
+    headers = {"x-oauth-scopes": scopes} if scopes else {}
+    return SlackResponse(client=client, http_verb="POST", api_url=f"{client.base_url}auth.test", req_args={},
+                         data=data, headers=headers, status_code=200)
+
+
+def authorize_result(token: str, auth_response) -> AuthorizeResult:
+    """auth.test の応答から Bolt の認可結果を作る（Bolt の単一ワークスペース認可と同じ内容）"""
+    return AuthorizeResult.from_auth_test_response(
+        bot_token=token, bot_scopes=auth_response.headers.get("x-oauth-scopes"), auth_test_response=auth_response,
+    )
+
+
+class CachedAuthorize(Authorize):
+    """起動時の auth.test の結果を全イベントで使う Bolt の認可（App の authorize に渡す）
+
+    Bolt の単一ワークスペース認可は最初のイベントで auth.test を呼ぶので、代わりに起動時に取得した結果
+    （保存済みなら AuthCache の結果）を set() で受け取っておく。起動時に取得できなかったときは
+    最初のイベントで fetch()（set() を呼ぶ認証処理）を1回だけ実行する。
+    """
+
+    def __init__(self, fetch: Callable[[], None]):
+        self.fetch = fetch
+        self.result: Optional[AuthorizeResult] = None
+        self._lock = threading.Lock()
+
+    def set(self, token: str, auth_response):
+        self.result = authorize_result(token, auth_response)
+
+    def __call__(self, *, context, enterprise_id, team_id, user_id, **kwargs) -> Optional[AuthorizeResult]:
+        if self.result is None:
+            with self._lock:
+                if self.result is None:
+                    self.fetch()
+        return self.result
+
+
+# プロセス内で共有する起動時間の記録（main の先頭で起点を合わせる）
+startup = StartupTimer()
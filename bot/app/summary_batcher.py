@@ -0,0 +1,129 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config.settings import SUMMARY_BATCH_WINDOW, SUMMARY_BATCH_MAX_POSTS, SUMMARY_BATCH_MAX_CHARS
+
+logger = logging.getLogger(__name__)
+
+
+class BatchItem:
+    """バッチに入れる1記事分"""
+
+    def __init__(self, post_data: Dict):
+        self.post_data = post_data
+        self.size = len(post_data.get('body_md', ''))
+        self.future: Future = Future()
+
+
+class _Group:
+    """同じ長さ・形式でまとめる記事の集まり"""
+
+    def __init__(self, length: str, style: str, deadline: float):
+        self.length = length
+        self.style = style
+        self.deadline = deadline
+        self.items: List[BatchItem] = []
+        self.chars = 0
+
+
+class SummaryBatcher:
+    """短時間に届いた複数記事の要約を1回の Gemini リクエストにまとめる
+
+    submit() は Future を返し、window 秒経過するか件数・文字数の上限に達した時点で
+    まとめて summarize_batch を呼ぶ。Future の結果は要約文字列、バッチで得られなかった
+    記事は None（呼び出し元で個別に要約する）。
+    """
+
+    def __init__(
+        self,
+        summarize_batch: Callable[[List[Dict], str, str], List[Optional[str]]],
+        window: float = SUMMARY_BATCH_WINDOW,
+        max_posts: int = SUMMARY_BATCH_MAX_POSTS,
+        max_chars: int = SUMMARY_BATCH_MAX_CHARS,
+    ):
+        self.summarize_batch = summarize_batch
+        self.window = window
+        self.max_posts = max(1, max_posts)
+        self.max_chars = max(1, max_chars)
+        self._cond = threading.Condition()
+        self._open: Dict[Tuple[str, str], _Group] = {}
+        self._ready: List[_Group] = []
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="summary-batch")
+        self.batches = 0
+        self.batched_posts = 0
+        self._thread = threading.Thread(target=self._run, name="summary-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, post_data: Dict, length: str, style: str) -> Future:
+        """記事をバッチに追加し、要約結果の Future を返す"""
+        item = BatchItem(post_data)
+        with self._cond:
+            if self._closed:
+                item.future.set_result(None)
+                return item.future
+            key = (length, style)
+            group = self._open.get(key)
+            # 追加すると文字数の上限を超える場合は先に今のグループを送る
+            if group and group.items and group.chars + item.size > self.max_chars:
+                self._ready.append(self._open.pop(key))
+                group = None
+            if group is None:
+                group = _Group(length, style, time.monotonic() + self.window)
+                self._open[key] = group
+            group.items.append(item)
+            group.chars += item.size
+            if len(group.items) >= self.max_posts or group.chars >= self.max_chars:
+                self._ready.append(self._open.pop(key))
+            self._cond.notify()
+        return item.future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    for key, group in list(self._open.items()):
+                        if group.deadline <= now or self._closed:
+                            self._ready.append(self._open.pop(key))
+                    if self._ready:
+                        ready, self._ready = self._ready, []
+                        break
+                    if self._closed:
+                        return
+                    timeout = min((g.deadline for g in self._open.values()), default=None)
+                    self._cond.wait(None if timeout is None else max(0.0, timeout - now))
+            for group in ready:
+                self._executor.submit(self._flush, group)
+
+    def _flush(self, group: _Group):
+        items = group.items
+        if len(items) == 1:
+            # 1件だけなら通常の要約で処理させる
+            items[0].future.set_result(None)
+            return
+        self.batches += 1
+        self.batched_posts += len(items)
+        logger.info(f"バッチ要約: {len(items)}件 / {group.chars}字 (長さ: {group.length}, 形式: {group.style})")
+        try:
+            results = self.summarize_batch([item.post_data for item in items], group.length, group.style)
+        except Exception as e:
+            logger.warning(f"バッチ要約に失敗したため個別に要約します: {e}")
+            results = []
+        for i, item in enumerate(items):
+            item.future.set_result(results[i] if i < len(results) else None)
+
+    def close(self):
+        """未送信のバッチを送り出して停止"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, int]:
+        """送信したバッチ数とバッチで要約した記事数"""
+        return {"batches": self.batches, "batched_posts": self.batched_posts}
@@ -0,0 +1,174 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from config.settings import (
+    SUMMARY_CACHE_PATH,
+    SUMMARY_CACHE_TTL,
+    SUMMARY_CACHE_MEMORY_SIZE,
+    SUMMARY_CACHE_MAX_ENTRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(post_number, revision, length: str, style: str, model: str, prompt_version: str) -> str:
+    """要約キャッシュのキーを生成（記事番号・版・長さ・形式・モデル・プロンプト版）"""
+    raw = "|".join(str(part) for part in [post_number, revision, length, style, model, prompt_version])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def post_revision(post_data: Dict) -> str:
+    """記事の版を表す値を返す（revision_number が無ければ updated_at）"""
+    revision = post_data.get("revision_number")
+    if revision:
+        return f"r{revision}"
+    return post_data.get("updated_at", "") or ""
+
+
+class SummaryCache:
+    """要約結果の2層キャッシュ（メモリLRU → SQLite）"""
+
+    def __init__(
+        self,
+        path: str = SUMMARY_CACHE_PATH,
+        ttl: int = SUMMARY_CACHE_TTL,
+        memory_size: int = SUMMARY_CACHE_MEMORY_SIZE,
+        max_entries: int = SUMMARY_CACHE_MAX_ENTRIES,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.memory_size = max(0, memory_size)
+        self.max_entries = max(1, max_entries)
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        if path:
+            self._open_disk(path)
+
+    @property
+    def persistent(self) -> bool:
+        """ディスク層（SQLite）に保存しているか（False ならプロセスが終わると消える）"""
+        return self._conn is not None
+
+    def _open_disk(self, path: str):
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                " key TEXT PRIMARY KEY,"
+                " summary TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_accessed ON summaries(accessed_at)")
+            conn.commit()
+            self._conn = conn
+            logger.info(f"要約キャッシュ(SQLite)を開きました: {path}")
+        except sqlite3.Error as e:
+            logger.warning(f"要約キャッシュ(SQLite)を開けないためメモリのみで動作します: {path}: {e}")
+            self._conn = None
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl > 0 and now - created_at > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        """キャッシュ済みの要約を返す（無ければ None）"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, summary = entry
+                if not self._is_expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return summary
+                del self._memory[key]
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT summary, created_at FROM summaries WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        summary, created_at = row
+                        if not self._is_expired(created_at, now):
+                            self._conn.execute("UPDATE summaries SET accessed_at = ? WHERE key = ?", (now, key))
+                            self._conn.commit()
+                            self._remember(key, created_at, summary)
+                            self.disk_hits += 1
+                            return summary
+                        self._conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                        self._conn.commit()
+                        self.evictions += 1
+                except sqlite3.Error as e:
+                    logger.warning(f"要約キャッシュの読み込みに失敗: {e}")
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, summary: str):
+        """要約をキャッシュに保存"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, summary)
+            self.stores += 1
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO summaries (key, summary, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, summary, now, now),
+                )
+                self._evict_disk(now)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"要約キャッシュの書き込みに失敗: {e}")
+
+    def _remember(self, key: str, created_at: float, summary: str):
+        if self.memory_size == 0:
+            return
+        self._memory[key] = (created_at, summary)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _evict_disk(self, now: float):
+        """期限切れと上限超過分（最終アクセスが古い順）を削除"""
+        if self.ttl > 0:
+            cur = self._conn.execute("DELETE FROM summaries WHERE created_at < ?", (now - self.ttl,))
+            self.evictions += max(0, cur.rowcount)
+        count = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            cur = self._conn.execute(
+                "DELETE FROM summaries WHERE key IN (SELECT key FROM summaries ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += max(0, cur.rowcount)
+
+    def stats(self) -> Dict[str, int]:
+        """ヒット/ミスなどの統計"""
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+        }
@@ -0,0 +1,283 @@
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import requests
+
+from config.settings import (
+    LOG_FORMAT, LOG_DATE_FORMAT, TRACING_ENABLED, TRACE_EXPORT_PATH, TRACE_OTLP_ENDPOINT,
+    TRACE_SAMPLE_RATE, TRACE_EXPORT_INTERVAL, TRACE_SERVICE_NAME,
+)
+
+logger = logging.getLogger(__name__)
+
+# ログの各行に trace_id を入れる書式（トレースの外では "-"）
+TRACED_LOG_FORMAT = LOG_FORMAT.replace("%(name)s", "[%(trace_id)s] %(name)s", 1)
+
+_STATUS_UNSET, _STATUS_OK, _STATUS_ERROR = 0, 1, 2
+_SPAN_KIND_INTERNAL = 1
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """1つの処理区間（開始・終了時刻と属性）
+
+    trace_id は Slack イベント単位、parent_id で入れ子の関係を表す。
+    sampled でないトレースの区間は ID だけを持ち、書き出さない。
+    """
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attributes", "start_ns", "end_ns",
+                 "status", "status_message", "sampled")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool, attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = _STATUS_UNSET
+        self.status_message = ""
+        self.sampled = sampled
+
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_error(self, error: BaseException):
+        self.status = _STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_otlp(self) -> Dict:
+        """OTLP/JSON の Span 表現"""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": _SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def otlp_payload(spans: List[Span], service_name: str = TRACE_SERVICE_NAME) -> Dict:
+    """区間のリストを OTLP/JSON の ExportTraceServiceRequest にする"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", service_name)]},
+            "scopeSpans": [{"scope": {"name": "esa-summarizer.tracing"}, "spans": [s.to_otlp() for s in spans]}],
+        }]
+    }
+
+
+class TraceExporter:
+    """終了した区間をまとめて書き出す（ファイルへは1行1リクエストの JSON Lines、コレクタへは OTLP/HTTP）
+
+    書き出しはバックグラウンドスレッドで interval 秒ごとに行い、要約処理を待たせない。
+    """
+
+    def __init__(self, path: str = "", endpoint: str = "", interval: float = TRACE_EXPORT_INTERVAL,
+                 max_batch: int = 512, max_queue: int = 10000):
+        self.path = path
+        self.endpoint = endpoint.rstrip("/") + "/v1/traces" if endpoint and not endpoint.endswith("/v1/traces") else endpoint
+        self.interval = interval
+        self.max_batch = max(1, max_batch)
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        """溜まっている区間をすべて書き出す"""
+        with self._lock:
+            while True:
+                batch = []
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return
+                self._write(batch)
+
+    def _write(self, batch: List[Span]):
+        payload = otlp_payload(batch)
+        try:
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+            if self.endpoint:
+                response = requests.post(self.endpoint, json=payload, timeout=5)
+                response.raise_for_status()
+            self.exported += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.warning(f"トレースの書き出しに失敗 ({len(batch)}件): {e}")
+
+    def shutdown(self):
+        self._stop_event.set()
+        self._thread.join(timeout=self.interval + 1)
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {"exported": self.exported, "dropped": self.dropped, "failed": self.failed, "queued": self._queue.qsize()}
+
+
+class Tracer:
+    """contextvars で現在の区間を受け渡す軽量トレーサ
+
+    exporter が無い（トレース無効）場合も trace_id の採番とログへの付与は行う。
+    スレッドをまたぐときは contextvars.copy_context() した文脈で実行すると親子関係が保たれる。
+    """
+
+    def __init__(self, exporter: Optional[TraceExporter] = None, sample_rate: float = 1.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    @contextmanager
+    def start_trace(self, name: str, **attributes) -> Iterator[Span]:
+        """新しいトレースを始める（Slack イベント1件ごと）"""
+        sampled = self.exporter is not None and random.random() < self.sample_rate
+        span = Span(name, os.urandom(16).hex(), None, sampled, attributes)
+        with self._activate(span):
+            yield span
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """現在の区間の子区間を作る（トレースの外なら新しいトレースになる）"""
+        parent = _current_span.get()
+        if parent is None:
+            with self.start_trace(name, **attributes) as span:
+                yield span
+            return
+        span = Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes)
+        with self._activate(span):
+            yield span
+
+    @contextmanager
+    def _activate(self, span: Span):
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            if span.status == _STATUS_UNSET:
+                span.status = _STATUS_OK
+            if span.sampled and self.exporter is not None:
+                self.exporter.export(span)
+
+    def shutdown(self):
+        if self.exporter is not None:
+            self.exporter.shutdown()
+            logger.info(f"トレース書き出し統計: {self.exporter.stats()}")
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> str:
+    span = _current_span.get()
+    return span.trace_id if span else "-"
+
+
+def set_attributes(**attributes):
+    """現在の区間に属性を付ける（トレースの外では何もしない）"""
+    span = _current_span.get()
+    if span is not None:
+        span.set_attributes(**attributes)
+
+
+def in_current_context(fn: Callable) -> Callable:
+    """呼び出し元の文脈（現在の区間）で fn を実行する関数を返す（別スレッドに渡す用）"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+class TraceIdLogFilter(logging.Filter):
+    """ログレコードに trace_id を付ける"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = current_trace_id()
+        return True
+
+
+def install_log_correlation():
+    """ルートロガーのハンドラに trace_id を付け、書式に含める（重複して入れない）"""
+    for handler in logging.getLogger().handlers:
+        if any(isinstance(f, TraceIdLogFilter) for f in handler.filters):
+            continue
+        handler.addFilter(TraceIdLogFilter())
+        handler.setFormatter(logging.Formatter(TRACED_LOG_FORMAT, LOG_DATE_FORMAT))
+
+
+def build_tracer() -> Tracer:
+    """設定値からトレーサを作る（無効なら書き出さない）"""
+    exporter = None
+    if TRACING_ENABLED and (TRACE_EXPORT_PATH or TRACE_OTLP_ENDPOINT):
+        exporter = TraceExporter(path=TRACE_EXPORT_PATH, endpoint=TRACE_OTLP_ENDPOINT)
+        logger.info(f"トレースを書き出します: path={TRACE_EXPORT_PATH or '-'} endpoint={TRACE_OTLP_ENDPOINT or '-'} "
+                    f"sample_rate={TRACE_SAMPLE_RATE}")
+    return Tracer(exporter, TRACE_SAMPLE_RATE)
+
+
+# プロセス内で共有するトレーサ
+tracer = build_tracer()
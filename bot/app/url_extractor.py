@@ -0,0 +1,88 @@
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+# esa の投稿URL（/posts/123/revisions/... などの後続部分は含めない）
+# Slack の <https://...|title> 表記の区切り文字（< > |）はチーム名に含めない
+ESA_POST_URL_PATTERN = re.compile(r'https?://([^/\s<>|]+)\.esa\.io/posts/(\d+)')
+
+# 正規表現を走らせる前の安価な絞り込み
+_ESA_POST_MARKER = ".esa.io/posts/"
+
+# URLを探す attachments のフィールド
+_ATTACHMENT_KEYS = ("original_url", "title_link", "from_url", "fallback", "text")
+
+
+class EsaPostRef(NamedTuple):
+    """メッセージ中で見つかった esa 記事"""
+    team: str
+    number: int
+    url: str  # https://team.esa.io/posts/123 まで（正規化済み）
+
+
+class EventScan(NamedTuple):
+    """イベント1件を走査した結果"""
+    block_text: str  # blocks から復元したテキスト（text が空の通知用）
+    posts: List[EsaPostRef]  # 見つかった順・重複なし
+
+
+class _PostCollector:
+    """見つかった記事を (チーム, 記事番号) で重複除去しながら順に集める"""
+
+    def __init__(self):
+        self.posts: List[EsaPostRef] = []
+        self._seen = set()
+
+    def scan(self, value: Optional[str]):
+        if not value or _ESA_POST_MARKER not in value:
+            return
+        for match in ESA_POST_URL_PATTERN.finditer(value):
+            team = match.group(1)
+            number = int(match.group(2))
+            key = (team.lower(), number)
+            if key not in self._seen:
+                self._seen.add(key)
+                self.posts.append(EsaPostRef(team, number, match.group(0)))
+
+
+def extract_esa_posts(text: str) -> List[EsaPostRef]:
+    """文字列から esa の記事を抽出する"""
+    collector = _PostCollector()
+    collector.scan(text)
+    return collector.posts
+
+
+def scan_event(event: Dict) -> EventScan:
+    """text / blocks / attachments を1回ずつ走査し、esa の記事と blocks のテキストを得る"""
+    collector = _PostCollector()
+    collector.scan(event.get('text'))
+    block_texts: List[str] = []
+    _scan_blocks(event.get('blocks'), collector, block_texts)
+    for attachment in event.get('attachments') or ():
+        for key in _ATTACHMENT_KEYS:
+            value = attachment.get(key)
+            if isinstance(value, str):
+                collector.scan(value)
+    return EventScan(' '.join(block_texts).strip(), collector.posts)
+
+
+def _scan_blocks(blocks: Optional[Iterable[Dict]], collector: _PostCollector, texts: List[str]):
+    for block in blocks or ():
+        block_type = block.get('type')
+        if block_type == 'rich_text':
+            for element in block.get('elements', ()):
+                if element.get('type') != 'rich_text_section':
+                    continue
+                for sub in element.get('elements', ()):
+                    sub_type = sub.get('type')
+                    if sub_type == 'text':
+                        value = sub.get('text', '')
+                        texts.append(value)
+                        collector.scan(value)
+                    elif sub_type == 'link' and sub.get('url'):
+                        value = sub['url']
+                        texts.append(value)
+                        collector.scan(value)
+        elif block_type == 'section' and 'text' in block:
+            value = block['text'].get('text', '')
+            texts.append(value)
+            collector.scan(value)
@@ -0,0 +1,137 @@
+import contextvars
+import logging
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+from app.tracing import tracer
+from config.settings import SUMMARY_WORKER_COUNT, SUMMARY_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# ワーカー停止用の番兵
+_STOP = object()
+
+
+class WorkerPool:
+    """要約ジョブをバックグラウンドで処理する有界ワーカープール
+
+    Slackのイベントハンドラは検証だけ行って submit() で即座に返し、
+    esa取得・Gemini呼び出し・投稿はワーカースレッド側で行う。
+    キューが満杯のときは submit() が False を返すので、呼び出し元で破棄を通知する。
+    ジョブは投入時の文脈（contextvars）で実行するので、イベントのトレースが引き継がれる。
+    """
+
+    def __init__(
+        self,
+        workers: int = SUMMARY_WORKER_COUNT,
+        queue_size: int = SUMMARY_QUEUE_SIZE,
+        name: str = "summary-worker",
+    ):
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.name = name
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._lock = threading.Lock()
+        self._accepting = True
+        self._active = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._threads: List[threading.Thread] = []
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"ワーカープール起動: workers={self.workers} queue_size={self.queue_size}")
+
+    def submit(self, fn: Callable, *args, **kwargs) -> bool:
+        """ジョブを投入する（キュー満杯・停止処理中は投入せず False を返す）"""
+        with self._lock:
+            if not self._accepting:
+                self.rejected += 1
+                logger.warning(f"ワーカープール停止処理中のためジョブを受け付けません: {getattr(fn, '__name__', fn)}")
+                return False
+            try:
+                self._queue.put_nowait((contextvars.copy_context(), time.monotonic(), fn, args, kwargs))
+            except queue.Full:
+                self.rejected += 1
+                logger.warning(
+                    f"ジョブキューが満杯のため破棄: {getattr(fn, '__name__', fn)} "
+                    f"(queue_size={self.queue_size}, rejected={self.rejected})"
+                )
+                return False
+            self.submitted += 1
+            return True
+
+    @property
+    def queue_depth(self) -> int:
+        """待機中のジョブ数"""
+        return self._queue.qsize()
+
+    @property
+    def active(self) -> int:
+        """実行中のジョブ数"""
+        return self._active
+
+    def is_alive(self) -> bool:
+        """全ワーカースレッドが稼働しているか"""
+        return self._accepting and all(t.is_alive() for t in self._threads)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                context, queued_at, fn, args, kwargs = item
+                with self._lock:
+                    self._active += 1
+                try:
+                    context.run(self._run_job, fn, args, kwargs, queued_at)
+                    self.completed += 1
+                except Exception as e:
+                    self.failed += 1
+                    logger.error(f"ワーカーでの処理に失敗: {getattr(fn, '__name__', fn)}: {e}", exc_info=True)
+                finally:
+                    with self._lock:
+                        self._active -= 1
+            finally:
+                self._queue.task_done()
+
+    def _run_job(self, fn: Callable, args, kwargs, queued_at: float):
+        name = getattr(fn, "__name__", str(fn))
+        queue_wait_ms = round((time.monotonic() - queued_at) * 1000, 1)
+        with tracer.span(f"worker.{name}", queue_wait_ms=queue_wait_ms):
+            fn(*args, **kwargs)
+
+    def shutdown(self, timeout: Optional[float] = None) -> bool:
+        """新規受付を止め、キューに残ったジョブを処理し切ってから停止する
+
+        timeout 内に処理が終わらなかった場合は False を返す（ワーカーはデーモンスレッド）。
+        """
+        with self._lock:
+            if not self._accepting:
+                return all(not t.is_alive() for t in self._threads)
+            self._accepting = False
+        pending = self._queue.qsize()
+        logger.info(f"ワーカープール停止中: 残りジョブ={pending} 実行中={self._active}")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for _ in self._threads:
+            # 番兵はキューの末尾に入るため、残りのジョブを処理した後に各ワーカーが停止する
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                self._queue.put(_STOP, timeout=remaining)
+            except queue.Full:
+                break
+        for thread in self._threads:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            thread.join(remaining)
+        drained = all(not t.is_alive() for t in self._threads)
+        if drained:
+            logger.info(f"ワーカープール停止完了: completed={self.completed} failed={self.failed}")
+        else:
+            logger.warning(f"ワーカープール停止がタイムアウト: 残りジョブ={self._queue.qsize()} 実行中={self._active}")
+        return drained
@@ -0,0 +1,106 @@
+"""既存の esa 記事を一括で要約するスクリプト
+
+実行例:
+  uv run python bot/backfill.py --category 研究/論文 --since 2024-04-01 --archive-only
+  uv run python bot/backfill.py --tag 輪読 --channel C0123456789
+
+esa の記事一覧 API を記事番号の昇順に100件ずつ読み、要約を要約キャッシュ（Bot と共有）に保存します。
+--archive-only を付けなければ ESA_SUMMARY_CHANNEL_IDS（または --channel）にも投稿します。
+進み具合は BACKFILL_CHECKPOINT_PATH に保存され、中断（Ctrl-C など）した実行は同じ条件で再実行すると続きから再開します。
+"""
+import argparse
+import datetime
+import logging
+import signal
+import sys
+
+from app.backfill import Backfill, BackfillCheckpoint, build_search_query
+from app.post_snapshots import PostSnapshotStore
+from app.resilience import UpstreamError
+from app.summary_cache import SummaryCache
+from config.settings import (
+    ESA_SUMMARY_CHANNEL_IDS, SUMMARY_CACHE_PATH, SUMMARY_LENGTHS, SUMMARY_STYLES, SUMMARY_INCREMENTAL_ENABLED,
+    BACKFILL_CHECKPOINT_PATH, BACKFILL_CONCURRENCY, BACKFILL_PROGRESS_INTERVAL,
+)
+
+logger = logging.getLogger("backfill")
+
+
+def _date(value: str) -> str:
+    try:
+        return datetime.date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日付は YYYY-MM-DD で指定してください: {value}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="既存の esa 記事を一括で要約し、要約キャッシュに保存する（任意で Slack に投稿）")
+    parser.add_argument("--category", default="", help="このカテゴリ（配下を含む）の記事だけを対象にする")
+    parser.add_argument("--tag", action="append", default=[], help="このタグの記事だけを対象にする（複数指定でいずれも付いた記事）")
+    parser.add_argument("--since", type=_date, help="この日より後に作成・更新された記事（YYYY-MM-DD）")
+    parser.add_argument("--until", type=_date, help="この日より前に作成・更新された記事（YYYY-MM-DD）")
+    parser.add_argument("--date-field", choices=["updated", "created"], default="updated", help="--since / --until で比べる日付")
+    parser.add_argument("--query", default="", help="esa の検索クエリを追加で指定する（例: 'wip:false'）")
+    parser.add_argument("--length", choices=list(SUMMARY_LENGTHS), default="medium")
+    parser.add_argument("--style", choices=list(SUMMARY_STYLES), default="bullet")
+    parser.add_argument("--per-page", type=int, default=100, help="一覧の1ページの件数（最大100）")
+    parser.add_argument("--concurrency", type=int, default=BACKFILL_CONCURRENCY, help="同時に要約する記事数")
+    parser.add_argument("--limit", type=int, default=0, help="この件数を処理したら止める（0で無制限）")
+    parser.add_argument("--channel", action="append", default=[], help="投稿先チャンネルID（省略時は ESA_SUMMARY_CHANNEL_IDS）")
+    parser.add_argument("--archive-only", action="store_true", help="Slack には投稿せず、要約キャッシュへの保存だけを行う")
+    parser.add_argument("--cache-path", default=SUMMARY_CACHE_PATH, help="要約を保存する要約キャッシュ（省略時は SUMMARY_CACHE_PATH）")
+    parser.add_argument("--checkpoint", default=BACKFILL_CHECKPOINT_PATH, help="チェックポイントのファイル（空文字で保存しない）")
+    parser.add_argument("--restart", action="store_true", help="チェックポイントを無視して最初からやり直す")
+    parser.add_argument("--progress-interval", type=float, default=BACKFILL_PROGRESS_INTERVAL, help="進捗をログに出す間隔（秒）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    channel_ids = [] if args.archive_only else (args.channel or ESA_SUMMARY_CHANNEL_IDS)
+    if not args.archive_only and not channel_ids:
+        logger.error("投稿先チャンネルがありません。--channel か ESA_SUMMARY_CHANNEL_IDS を指定するか、--archive-only を付けてください")
+        return 2
+    # キャッシュがメモリだけだと要約は終了とともに消えるのに、記事はチェックポイントで処理済みになってしまう
+    if not args.cache_path:
+        logger.error("要約キャッシュのファイルがありません。--cache-path か SUMMARY_CACHE_PATH を指定してください")
+        return 2
+    summary_cache = SummaryCache(path=args.cache_path)
+    if not summary_cache.persistent:
+        logger.error(f"要約キャッシュ {args.cache_path} を開けませんでした")
+        return 2
+    query = build_search_query(args.category, args.tag, args.since or "", args.until or "", args.date_field, args.query)
+    options = {"length": args.length, "style": args.style}
+    try:
+        checkpoint = BackfillCheckpoint.load(args.checkpoint, query, options, restart=args.restart)
+    except ValueError as e:
+        logger.error(str(e))
+        return 2
+
+    backfill = Backfill(
+        query, checkpoint, channel_ids=channel_ids, length=args.length, style=args.style,
+        concurrency=args.concurrency, per_page=args.per_page, limit=args.limit, progress_interval=args.progress_interval,
+        summary_cache=summary_cache, post_snapshots=PostSnapshotStore() if SUMMARY_INCREMENTAL_ENABLED else None,
+    )
+    # SIGTERM でも Ctrl-C と同じく処理中の記事を終えてから保存する
+    signal.signal(signal.SIGTERM, lambda signum, frame: backfill.stop())
+    logger.info(
+        f"一括要約を開始: query={query!r} (長さ: {args.length}, 形式: {args.style}, 同時実行: {args.concurrency}, "
+        f"投稿先: {', '.join(channel_ids) if channel_ids else 'なし（キャッシュのみ）'})"
+    )
+    try:
+        totals = backfill.run()
+    except UpstreamError as e:
+        logger.error(f"記事一覧の取得に失敗したため中断しました（同じ条件で再実行すると続きから再開します）: {e}")
+        return 1
+    if backfill.interrupted:
+        logger.warning("中断しました。同じ条件で再実行すると続きから再開します")
+        return 1
+    if totals["failed"]:
+        logger.warning(f"失敗した記事が {totals['failed']}件あります。同じ条件で再実行すると要約し直します")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
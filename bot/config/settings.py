@@ -10,6 +10,29 @@ def _clean_env_value(value: str) -> str:
         return ""
     return value.split('#', 1)[0].strip()
 
+def _env_int(name: str, default: int) -> int:
+    """整数の環境変数を読み込む（未設定・不正値はデフォルト）"""
+    raw = _clean_env_value(os.getenv(name))
+    try:
+        return int(raw) if raw else default
+    except ValueError:
+        return default
+
+def _env_float(name: str, default: float) -> float:
+    """小数の環境変数を読み込む（未設定・不正値はデフォルト）"""
+    raw = _clean_env_value(os.getenv(name))
+    try:
+        return float(raw) if raw else default
+    except ValueError:
+        return default
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    """真偽値の環境変数を読み込む"""
+    raw = _clean_env_value(os.getenv(name))
+    if not raw:
+        return default
+    return raw.lower() in ["1", "true", "yes"]
+
 # ログ設定
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
@@ -25,6 +48,15 @@ logging.basicConfig(
 # Slack設定
 SLACK_BOT_TOKEN = _clean_env_value(os.getenv("SLACK_BOT_TOKEN"))
 SLACK_APP_TOKEN = _clean_env_value(os.getenv("SLACK_APP_TOKEN"))
+# 受信方式: socket（Socket Mode、1プロセス1接続）/ http（Events API を HTTP で受け、複数インスタンスに分散できる）
+SLACK_MODE = (_clean_env_value(os.getenv("SLACK_MODE")) or "socket").lower()
+SLACK_SIGNING_SECRET = _clean_env_value(os.getenv("SLACK_SIGNING_SECRET"))  # http モードでリクエスト署名の検証に使う
+SLACK_EVENTS_PATH = _clean_env_value(os.getenv("SLACK_EVENTS_PATH")) or "/slack/events"  # http モードの Request URL のパス
+SLACK_HTTP_ACK_TIMEOUT = _env_float("SLACK_HTTP_ACK_TIMEOUT", 2.5)  # asyncio 版で ack を待つ上限(秒)。Slack の3秒制限より短くし、超えたら 503 を返す
+SLACK_API_URL = _clean_env_value(os.getenv("SLACK_API_URL")) or "https://slack.com/api/"  # 負荷試験などで差し替える Web API の接続先
+SLACK_AUTH_CACHE_PATH = _clean_env_value(os.getenv("SLACK_AUTH_CACHE_PATH"))  # auth.test の結果の保存先（空なら毎回呼ぶ）
+SLACK_AUTH_CACHE_TTL = _env_int("SLACK_AUTH_CACHE_TTL", 24 * 3600)  # 保存した auth.test の結果を使う期間(秒)
+SLACK_STARTUP_CHANNEL_CHECK = _env_bool("SLACK_STARTUP_CHANNEL_CHECK", True)  # 接続後にバックグラウンドでチャンネルの参加状況を確認する
 
 # 自動要約設定
 ESA_WATCH_CHANNEL_ID = _clean_env_value(os.getenv("ESA_WATCH_CHANNEL_ID"))  # esa更新通知を監視するチャンネルID
@@ -37,11 +69,28 @@ ESA_SUMMARY_CHANNEL_IDS = [
 # esa設定
 ESA_ACCESS_TOKEN = os.getenv("ESA_ACCESS_TOKEN")
 ESA_TEAM_NAME = os.getenv("ESA_TEAM_NAME")
-ESA_API_BASE = "https://api.esa.io/v1"
+ESA_API_BASE = _clean_env_value(os.getenv("ESA_API_BASE")) or "https://api.esa.io/v1"  # 負荷試験などで差し替える API の接続先
+ESA_CONNECT_TIMEOUT = _env_float("ESA_CONNECT_TIMEOUT", 5.0)  # 接続タイムアウト(秒)
+ESA_READ_TIMEOUT = _env_float("ESA_READ_TIMEOUT", 20.0)  # 読み込みタイムアウト(秒)
+ESA_POOL_SIZE = _env_int("ESA_POOL_SIZE", 10)  # keep-alive で使い回す接続数
+ESA_POST_CACHE_SIZE = _env_int("ESA_POST_CACHE_SIZE", 200)  # ETag で再検証する記事キャッシュの件数
+ESA_RATE_LIMIT_RESERVE = _env_int("ESA_RATE_LIMIT_RESERVE", 10)  # 残りリクエスト数がこれ以下になったら間隔を空ける
+ESA_RATE_LIMIT_MAX_WAIT = _env_float("ESA_RATE_LIMIT_MAX_WAIT", 10.0)  # ワーカーで待つ上限(秒)。超える場合は待たずに再試行できる失敗にする
 
 # Gemini設定
 GEMINI_API_KEY = _clean_env_value(os.getenv("GEMINI_API_KEY"))
 GEMINI_MODEL = "gemini-2.5-flash-lite-preview-09-2025"
+GEMINI_API_ENDPOINT = _clean_env_value(os.getenv("GEMINI_API_ENDPOINT"))  # 指定すると REST でこの接続先を使う（負荷試験用）
+
+# プロンプト前の本文前処理（画像・HTML・base64・長いコード/表を削ってトークンを節約）
+SUMMARY_PREPROCESS_ENABLED = _env_bool("SUMMARY_PREPROCESS_ENABLED", True)
+SUMMARY_PREPROCESS_CODE_MAX_LINES = _env_int("SUMMARY_PREPROCESS_CODE_MAX_LINES", 20)  # コードブロックは先頭N行のみ残す（0で無制限）
+SUMMARY_PREPROCESS_TABLE_MAX_ROWS = _env_int("SUMMARY_PREPROCESS_TABLE_MAX_ROWS", 30)  # 表はヘッダ＋N行のみ残す（0で無制限）
+
+# 長文記事の分割要約（map-reduce）設定
+SUMMARY_MAP_REDUCE_THRESHOLD = _env_int("SUMMARY_MAP_REDUCE_THRESHOLD", 50000)  # この文字数を超える本文は分割して要約（0で無効）
+SUMMARY_CHUNK_SIZE = _env_int("SUMMARY_CHUNK_SIZE", 8000)  # 1チャンクの最大文字数
+SUMMARY_MAP_PARALLELISM = _env_int("SUMMARY_MAP_PARALLELISM", 4)  # チャンク要約の同時実行数
 
 # 要約設定
 SUMMARY_LENGTHS = {
@@ -55,5 +104,93 @@ SUMMARY_STYLES = {
     "paragraph": "段落形式"
 }
 
+# ワーカープール設定（イベントハンドラは即時に返し、要約はバックグラウンドで処理）
+SUMMARY_WORKER_COUNT = _env_int("SUMMARY_WORKER_COUNT", 4)  # 同時に処理する要約ジョブ数
+SUMMARY_QUEUE_SIZE = _env_int("SUMMARY_QUEUE_SIZE", 100)  # 待機できるジョブ数の上限（超過分は破棄）
+SUMMARY_SHUTDOWN_TIMEOUT = _env_float("SUMMARY_SHUTDOWN_TIMEOUT", 8.0)  # 終了時にキューを処理し切るまでの待ち時間(秒)
+
+# 自動要約のジョブキュー（SQLite に保存し、再起動・デプロイ時も処理中の要約を再開する）
+SUMMARY_JOB_QUEUE_PATH = _clean_env_value(os.getenv("SUMMARY_JOB_QUEUE_PATH"))  # 空ならメモリ上（再起動で失われる）
+SUMMARY_JOB_VISIBILITY_TIMEOUT = _env_float("SUMMARY_JOB_VISIBILITY_TIMEOUT", 300.0)  # 取り出したジョブが終わらないとき再実行するまでの秒数
+SUMMARY_JOB_MAX_ATTEMPTS = _env_int("SUMMARY_JOB_MAX_ATTEMPTS", 5)  # 1ジョブの最大試行回数（超えたら failed）
+SUMMARY_JOB_RETRY_DELAY = _env_float("SUMMARY_JOB_RETRY_DELAY", 30.0)  # 失敗したジョブを再試行するまでの初期待ち秒数（試行ごとに倍）
+SUMMARY_JOB_RETENTION = _env_int("SUMMARY_JOB_RETENTION", 7 * 24 * 3600)  # 終了したジョブを残す期間(秒)
+SUMMARY_JOB_POLL_INTERVAL = _env_float("SUMMARY_JOB_POLL_INTERVAL", 5.0)  # 再試行待ちや期限切れのジョブを探す間隔(秒)
+
+# 複数インスタンスで動かすときのリース（同じ記事の同じ版を要約・投稿するのは1インスタンスだけにする）
+SUMMARY_LEASE_BACKEND = _clean_env_value(os.getenv("SUMMARY_LEASE_BACKEND", ""))  # sqlite / module:ClassName（空なら調整しない）
+SUMMARY_LEASE_PATH = _clean_env_value(os.getenv("SUMMARY_LEASE_PATH")) or "data/summary_leases.sqlite3"  # sqlite のファイル（全インスタンスで共有する）
+SUMMARY_LEASE_TTL = _env_float("SUMMARY_LEASE_TTL", 300.0)  # リースの有効秒数（処理の段階ごとに延長する）
+SUMMARY_LEASE_DONE_TTL = _env_int("SUMMARY_LEASE_DONE_TTL", 24 * 3600)  # 処理済みの記事・版を他のインスタンスがスキップする期間(秒)
+
+# 既存記事の一括要約（bot/backfill.py）
+BACKFILL_CHECKPOINT_PATH = _clean_env_value(os.getenv("BACKFILL_CHECKPOINT_PATH")) or "data/backfill_checkpoint.json"  # 中断した実行を再開するためのチェックポイント
+BACKFILL_CONCURRENCY = _env_int("BACKFILL_CONCURRENCY", 4)  # 同時に要約する記事数（送信速度はレートリミッタが決める）
+BACKFILL_PROGRESS_INTERVAL = _env_float("BACKFILL_PROGRESS_INTERVAL", 30.0)  # 進捗（処理速度・残り時間・トークン数）をログに出す間隔(秒)
+
+# asyncio 版の実行（ワーカースレッドの代わりに1つのイベントループで要約を並行処理）
+SLACK_ASYNC = _env_bool("SLACK_ASYNC", False)
+SUMMARY_ASYNC_MAX_IN_FLIGHT = _env_int("SUMMARY_ASYNC_MAX_IN_FLIGHT", 200)  # 同時に処理する要約の上限（超過分は破棄）
+
+# 上流APIごとのレート制限（トークンバケット）
+GEMINI_RPM = _env_int("GEMINI_RPM", 60)  # Gemini のリクエスト数/分
+GEMINI_TPM = _env_int("GEMINI_TPM", 1000000)  # Gemini の入力トークン数/分
+ESA_REQUESTS_PER_15MIN = _env_int("ESA_REQUESTS_PER_15MIN", 75)  # esa API のリクエスト数/15分
+SLACK_POSTS_PER_SECOND = _env_float("SLACK_POSTS_PER_SECOND", 1.0)  # チャンネルごとの chat.postMessage 数/秒
+SLACK_UPDATES_PER_MINUTE = _env_int("SLACK_UPDATES_PER_MINUTE", 50)  # chat.update 数/分（Tier 3）
+SLACK_WEB_REQUESTS_PER_MINUTE = _env_int("SLACK_WEB_REQUESTS_PER_MINUTE", 100)  # その他の Web API 呼び出し数/分
+
+# 上流APIの再試行とサーキットブレーカー
+RETRY_MAX_ATTEMPTS = _env_int("RETRY_MAX_ATTEMPTS", 3)  # 一時的な失敗（429・5xx・通信エラー）の最大試行回数
+RETRY_BASE_DELAY = _env_float("RETRY_BASE_DELAY", 1.0)  # 指数バックオフの初期待ち時間(秒)
+RETRY_MAX_DELAY = _env_float("RETRY_MAX_DELAY", 30.0)  # 1回の待ち時間の上限(秒)。Retry-After がこれを超えたら諦める
+CIRCUIT_FAILURE_THRESHOLD = _env_int("CIRCUIT_FAILURE_THRESHOLD", 5)  # 遮断するまでの連続失敗回数
+CIRCUIT_RESET_TIMEOUT = _env_float("CIRCUIT_RESET_TIMEOUT", 60.0)  # 遮断後に試行を再開するまでの秒数
+
+# 複数チャンネルへの投稿（同じ要約を並列に投稿する）
+SLACK_FANOUT_PARALLELISM = _env_int("SLACK_FANOUT_PARALLELISM", 8)  # 同時に投稿するチャンネル数の上限
+
+# ストリーミング要約設定（生成途中の要約を chat.update で逐次反映）
+SUMMARY_STREAMING = _env_bool("SUMMARY_STREAMING", False)
+SLACK_STREAM_UPDATE_INTERVAL = _env_float("SLACK_STREAM_UPDATE_INTERVAL", 1.5)  # 同じメッセージを更新する最短間隔(秒)
+
+# 自動要約のバッチ化設定（短時間に届いた複数記事を1回のリクエストで要約）
+SUMMARY_BATCH_WINDOW = _env_float("SUMMARY_BATCH_WINDOW", 0.0)  # 記事を待ち合わせる秒数（0で無効）
+SUMMARY_BATCH_MAX_POSTS = _env_int("SUMMARY_BATCH_MAX_POSTS", 4)  # 1回にまとめる最大記事数（SUMMARY_WORKER_COUNT を超える分は切り詰める）
+SUMMARY_BATCH_MAX_CHARS = _env_int("SUMMARY_BATCH_MAX_CHARS", 40000)  # 1回にまとめる本文の合計文字数の上限
+
+# 要約キャッシュ設定（メモリLRU + SQLite）
+SUMMARY_CACHE_ENABLED = _env_bool("SUMMARY_CACHE_ENABLED", True)
+SUMMARY_CACHE_PATH = _clean_env_value(os.getenv("SUMMARY_CACHE_PATH"))  # 空ならディスク層を使わない
+SUMMARY_CACHE_TTL = _env_int("SUMMARY_CACHE_TTL", 30 * 24 * 3600)  # キャッシュの有効期間(秒)
+SUMMARY_CACHE_MEMORY_SIZE = _env_int("SUMMARY_CACHE_MEMORY_SIZE", 256)  # メモリ層に保持する件数
+SUMMARY_CACHE_MAX_ENTRIES = _env_int("SUMMARY_CACHE_MAX_ENTRIES", 10000)  # ディスク層に保持する件数
+
+# 編集された記事の差分要約（前回の本文と要約を残し、変更されたセクションだけを Gemini に送る）
+SUMMARY_INCREMENTAL_ENABLED = _env_bool("SUMMARY_INCREMENTAL_ENABLED", True)
+SUMMARY_SNAPSHOT_PATH = _clean_env_value(os.getenv("SUMMARY_SNAPSHOT_PATH"))  # 空ならメモリ上（再起動で失われる）
+SUMMARY_SNAPSHOT_MAX_ENTRIES = _env_int("SUMMARY_SNAPSHOT_MAX_ENTRIES", 5000)  # 保持する記事数
+SUMMARY_INCREMENTAL_MIN_CHARS = _env_int("SUMMARY_INCREMENTAL_MIN_CHARS", 80)  # 変更がこの文字数未満で、かつ
+SUMMARY_INCREMENTAL_MIN_RATIO = _env_float("SUMMARY_INCREMENTAL_MIN_RATIO", 0.05)  # 本文のこの割合未満なら軽微な編集として要約し直さない
+SUMMARY_INCREMENTAL_MAX_RATIO = _env_float("SUMMARY_INCREMENTAL_MAX_RATIO", 0.5)  # 変更がこの割合を超えたら全文を要約し直す
+SUMMARY_INCREMENTAL_MAX_CHAIN = _env_int("SUMMARY_INCREMENTAL_MAX_CHAIN", 5)  # 差分での更新がこの回数続いたら全文を要約し直す（ずれの蓄積を防ぐ）
+
+# イベント重複判定設定（Slackの再送・重複配信を弾く）
+EVENT_DEDUP_TTL = _env_int("EVENT_DEDUP_TTL", 3600)  # 同じイベントとみなす期間(秒)
+EVENT_DEDUP_MAX_ENTRIES = _env_int("EVENT_DEDUP_MAX_ENTRIES", 20000)  # メモリに保持するキー数の上限
+EVENT_DEDUP_PATH = _clean_env_value(os.getenv("EVENT_DEDUP_PATH", ""))  # 指定すると SQLite に保存し再起動後も有効
+
+# メトリクス・ヘルスチェック用 HTTP サーバ（/metrics, /healthz, /readyz）
+METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
+METRICS_PORT = _env_int("METRICS_PORT", _env_int("PORT", 8080))  # Cloud Run では PORT に合わせる
+
+# トレース（Slack イベントごとの trace_id と処理区間を OTLP/JSON で書き出す）
+TRACING_ENABLED = _env_bool("TRACING_ENABLED", False)
+TRACE_EXPORT_PATH = _clean_env_value(os.getenv("TRACE_EXPORT_PATH", "data/traces.jsonl"))  # JSON Lines で追記するファイル（空なら書かない）
+TRACE_OTLP_ENDPOINT = _clean_env_value(os.getenv("TRACE_OTLP_ENDPOINT", ""))  # OTLP/HTTP コレクタ（例: http://localhost:4318）
+TRACE_SAMPLE_RATE = _env_float("TRACE_SAMPLE_RATE", 1.0)  # 書き出すトレースの割合
+TRACE_EXPORT_INTERVAL = _env_float("TRACE_EXPORT_INTERVAL", 5.0)  # まとめて書き出す間隔(秒)
+TRACE_SERVICE_NAME = _clean_env_value(os.getenv("TRACE_SERVICE_NAME", "esa-summarizer"))
+
 # デバッグ詳細フラグ
 DEBUG_VERBOSE = os.getenv("DEBUG_VERBOSE", "false").lower() in ["1", "true", "yes"]
\ No newline at end of file
@@ -1,5 +1,19 @@
+import time
+
+_started_at = time.monotonic()
+
+from app.startup import startup
 from app.slack_handler import SlackBot
+from config.settings import SLACK_ASYNC
 
 if __name__ == "__main__":
-    bot = SlackBot()
-    bot.start()
\ No newline at end of file
+    # 起動時間はプロセスの開始（この import の前）から測る
+    startup.reset(_started_at)
+    if SLACK_ASYNC:
+        from app.async_slack_handler import AsyncSlackBot
+        startup.mark("import")
+        bot = AsyncSlackBot()
+    else:
+        startup.mark("import")
+        bot = SlackBot()
+    bot.start()
@@ -0,0 +1,95 @@
+import asyncio
+
+from aiohttp import web
+
+from bot.app.async_esa_client import AsyncEsaClient
+from bot.app.async_gemini_client import AsyncGeminiClient
+from bot.app.resilience import CircuitBreaker, RetryPolicy
+from bot.app.single_flight import AsyncSingleFlight
+
+
+async def _serve(routes):
+    app = web.Application()
+    app.add_routes(routes)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def test_async_esa_client_retries_and_revalidates():
+    seen = []
+
+    async def post(request):
+        seen.append(request.headers.get("If-None-Match"))
+        if len(seen) == 1:
+            return web.Response(status=503)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        return web.json_response({"number": 7, "body_md": "本文"}, headers={"ETag": '"v1"'})
+
+    async def missing_post(request):
+        return web.Response(status=404)
+
+    async def scenario():
+        runner, base = await _serve([web.get("/teams/t/posts/7", post), web.get("/teams/t/posts/8", missing_post)])
+        client = AsyncEsaClient(breaker=CircuitBreaker("esa"), retry_policy=RetryPolicy(max_attempts=3, base_delay=0))
+        client.base_url = f"{base}/teams/t"
+        try:
+            first = await client.get_post_by_number_async(7)
+            second = await client.get_post_by_number_async(7)
+            missing = await client.get_post_from_url_async("https://t.esa.io/posts/8")
+        finally:
+            await client.close()
+            await runner.cleanup()
+        return first, second, missing, client
+
+    first, second, missing, client = asyncio.run(scenario())
+    assert first == second == {"number": 7, "body_md": "本文"}
+    assert missing is None
+    assert seen == [None, None, '"v1"']
+    assert client.cache_revalidated == 1
+
+
+def test_async_gemini_client_calls_rest_api():
+    requests = []
+
+    async def generate(request):
+        requests.append((request.match_info["model"], request.headers.get("x-goog-api-key"), await request.json()))
+        return web.json_response({
+            "candidates": [{"content": {"parts": [{"text": "- 要点"}], "role": "model"}, "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": 12, "candidatesTokenCount": 3},
+        })
+
+    async def scenario():
+        runner, base = await _serve([web.post("/v1beta/models/{model}", generate)])
+        client = AsyncGeminiClient(breaker=CircuitBreaker("gemini"), api_endpoint=base)
+        try:
+            return await client.summarize_async("タイトル", "本文", "研究", "short", "bullet")
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    assert asyncio.run(scenario()) == "- 要点"
+    model, _, payload = requests[0]
+    assert model.endswith(":generateContent")
+    assert "【タイトル】\nタイトル" in payload["contents"][0]["parts"][0]["text"]
+
+
+def test_async_single_flight_shares_one_execution():
+    flight = AsyncSingleFlight()
+    executions = []
+
+    async def work():
+        executions.append(1)
+        await asyncio.sleep(0.01)
+        return "summary"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do(("1", "medium"), work) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["summary"] * 5
+    assert len(executions) == 1
+    assert flight.stats()["coalesced"] == 4
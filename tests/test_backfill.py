@@ -0,0 +1,137 @@
+import json
+
+from bot.app.backfill import Backfill, BackfillCheckpoint, build_search_query
+from bot.app.summary_cache import SummaryCache
+
+
+class FakeEsa:
+    def __init__(self, count):
+        self.posts = [
+            {"number": n, "name": f"記事{n}", "body_md": f"# 本文\n記事{n}の内容", "revision_number": 1, "url": f"https://t.esa.io/posts/{n}"}
+            for n in range(1, count + 1)
+        ]
+        self.pages = []
+
+    def list_posts(self, q="", page=1, per_page=100, sort="number", order="asc"):
+        self.pages.append(page)
+        start = (page - 1) * per_page
+        has_next = start + per_page < len(self.posts)
+        return {"posts": self.posts[start:start + per_page], "next_page": page + 1 if has_next else None,
+                "total_count": len(self.posts)}
+
+
+class FakeGemini:
+    model_name = "fake"
+    prompt_version = "v1"
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.calls = []
+
+    def summarize(self, title, body, category="", length="medium", style="bullet"):
+        self.calls.append(title)
+        if title in self.fail:
+            raise RuntimeError("503")
+        return f"- {title}の要約"
+
+    def usage(self):
+        return {"prompt_tokens": 10 * len(self.calls), "output_tokens": 2 * len(self.calls)}
+
+
+def _backfill(esa, gemini, checkpoint, cache, **kwargs):
+    return Backfill(checkpoint.query, checkpoint, esa_client=esa, gemini_client=gemini, summary_cache=cache,
+                    per_page=2, concurrency=2, progress_interval=60, **kwargs)
+
+
+def test_build_search_query():
+    assert build_search_query("研究/論文/", ["輪読", "ML Ops"], "2024-04-01", "", "created", "wip:false") == (
+        'in:研究/論文 tag:輪読 tag:"ML Ops" created:>2024-04-01 wip:false'
+    )
+    assert build_search_query() == ""
+
+
+def test_interrupted_backfill_resumes_from_checkpoint(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    cache = SummaryCache(path="")
+    esa, gemini = FakeEsa(5), FakeGemini(fail={"記事2"})
+
+    first = _backfill(esa, gemini, BackfillCheckpoint.load(path, "tag:x", {}), cache, limit=3).run()
+    assert first["done"] == 2 and first["failed"] == 1
+    saved = json.load(open(path, encoding="utf-8"))
+    assert saved["done"] == [1, 3] and list(saved["failed"]) == ["2"]
+    assert saved["totals"]["prompt_tokens"] == 30
+
+    # 再開: 失敗した記事と未処理の記事だけを要約する
+    gemini.fail.clear()
+    resumed = _backfill(esa, gemini, BackfillCheckpoint.load(path, "tag:x", {}), cache).run()
+    assert sorted(gemini.calls[3:]) == ["記事2", "記事4", "記事5"]
+    assert resumed["done"] == 5 and resumed["failed"] == 0 and resumed["summarized"] == 5
+    assert resumed["prompt_tokens"] == 60
+
+    # 条件の違う実行ではチェックポイントを使わない
+    try:
+        BackfillCheckpoint.load(path, "tag:y", {})
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("別の条件のチェックポイントを読み込んだ")
+
+
+def test_backfill_posts_only_new_summaries():
+    class FakeSlack:
+        def __init__(self):
+            self.posted = []
+
+        def chat_postMessage(self, channel, **payload):
+            self.posted.append((channel, payload["text"].splitlines()[0]))
+            return {"ok": True}
+
+    cache, slack = SummaryCache(path=""), FakeSlack()
+    esa, gemini = FakeEsa(3), FakeGemini()
+    cache_only = _backfill(esa, gemini, BackfillCheckpoint("", "", {}), cache).run()
+    assert cache_only["summarized"] == 3 and slack.posted == []
+
+    posted = _backfill(esa, gemini, BackfillCheckpoint("", "", {}), cache, channel_ids=["C1"], slack_client=slack).run()
+    assert posted["reused"] == 3 and posted["posted"] == 3
+    assert len(gemini.calls) == 3
+    assert sorted(slack.posted) == [("C1", "記事1"), ("C1", "記事2"), ("C1", "記事3")]
+
+
+def test_backfill_cli_refuses_memory_only_cache(tmp_path):
+    from bot.backfill import main
+
+    # キャッシュのファイルが無いと要約が残らないので、記事一覧を読む前に断る
+    assert main(["--archive-only", "--cache-path", "", "--checkpoint", str(tmp_path / "checkpoint.json")]) == 2
+    assert not (tmp_path / "checkpoint.json").exists()
+
+
+def test_backfill_resume_posts_only_to_failed_channels(tmp_path):
+    class FlakySlack:
+        def __init__(self):
+            self.posted = []
+            self.down = {"C2"}
+
+        def chat_postMessage(self, channel, **payload):
+            if channel in self.down:
+                raise ValueError("channel_not_found")
+            self.posted.append((channel, payload["text"].splitlines()[0]))
+            return {"ok": True}
+
+    path = str(tmp_path / "checkpoint.json")
+    cache, slack = SummaryCache(path=""), FlakySlack()
+    esa, gemini = FakeEsa(2), FakeGemini()
+
+    first = _backfill(esa, gemini, BackfillCheckpoint.load(path, "tag:x", {}), cache,
+                      channel_ids=["C1", "C2"], slack_client=slack).run()
+    assert first["failed"] == 2 and first["posted"] == 2
+    saved = json.load(open(path, encoding="utf-8"))
+    assert saved["delivered"] == {"1": ["C1"], "2": ["C1"]}
+
+    # 再開: C1 には投稿し直さず、失敗した C2 にだけ投稿する
+    slack.down.clear()
+    resumed = _backfill(esa, gemini, BackfillCheckpoint.load(path, "tag:x", {}), cache,
+                        channel_ids=["C1", "C2"], slack_client=slack).run()
+    assert resumed["done"] == 2 and resumed["failed"] == 0 and resumed["posted"] == 4
+    assert sorted(slack.posted) == [("C1", "記事1"), ("C1", "記事2"), ("C2", "記事1"), ("C2", "記事2")]
+    assert len(gemini.calls) == 2
+    assert json.load(open(path, encoding="utf-8"))["delivered"] == {}
@@ -0,0 +1,58 @@
+import threading
+import time
+
+from bot.app.channel_fanout import ChannelFanout
+
+
+def test_fanout_runs_channels_concurrently():
+    fanout = ChannelFanout(max_parallel=4)
+    payload = {"blocks": [{"type": "section"}]}
+    seen = []
+
+    def send(channel):
+        time.sleep(0.1)
+        seen.append(payload["blocks"])
+        return channel.lower()
+
+    start = time.monotonic()
+    report = fanout.deliver(send, ["C1", "C2", "C3", "C4"])
+    assert time.monotonic() - start < 0.3
+    assert [d.result for d in report.deliveries] == ["c1", "c2", "c3", "c4"]
+    # 同じペイロードをコピーせずに使い回す
+    assert all(blocks is payload["blocks"] for blocks in seen)
+    fanout.shutdown()
+
+
+def test_fanout_bounds_parallelism():
+    fanout = ChannelFanout(max_parallel=2)
+    lock = threading.Lock()
+    active = [0, 0]
+
+    def send(channel):
+        with lock:
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+
+    fanout.deliver(send, [f"C{i}" for i in range(6)])
+    assert active[1] == 2
+    fanout.shutdown()
+
+
+def test_failure_is_isolated_per_channel():
+    fanout = ChannelFanout(max_parallel=3)
+
+    def send(channel):
+        if channel == "C2":
+            raise RuntimeError("channel_not_found")
+        return "ok"
+
+    report = fanout.deliver(send, ["C1", "C2", "C3"])
+    assert [d.channel for d in report.succeeded] == ["C1", "C3"]
+    summary = report.summary()
+    assert summary["failed"] == 1
+    assert summary["errors"] == {"C2": "channel_not_found"}
+    assert all(d.latency >= 0 for d in report.deliveries)
+    fanout.shutdown()
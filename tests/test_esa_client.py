@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from bot.app.esa_client import EsaClient, EsaError
+
+
+class FakeResponse:
+    def __init__(self, status_code, json_data=None, headers=None):
+        self.status_code = status_code
+        self._json = json_data
+        self.headers = headers or {}
+
+    def json(self):
+        return self._json
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.exceptions.HTTPError(f"{self.status_code}")
+
+
+def test_revalidates_cached_post_with_etag(monkeypatch):
+    client = EsaClient()
+    calls = []
+    responses = [
+        FakeResponse(200, {"number": 1, "body_md": "body"}, {"ETag": '"abc"'}),
+        FakeResponse(304),
+    ]
+
+    def fake_get(url, headers=None, timeout=None):
+        calls.append(headers)
+        return responses.pop(0)
+
+    monkeypatch.setattr(client.session, "get", fake_get)
+    first = client.get_post_by_number(1)
+    second = client.get_post_by_number(1)
+    assert first == second == {"number": 1, "body_md": "body"}
+    assert calls[0] == {}
+    assert calls[1] == {"If-None-Match": '"abc"'}
+    assert client.cache_revalidated == 1
+
+
+def test_rate_limit_delay_spreads_remaining_quota(monkeypatch):
+    client = EsaClient()
+    reset = time.time() + 100
+    client._update_rate_limit(FakeResponse(200, headers={
+        "X-RateLimit-Limit": "75", "X-RateLimit-Remaining": "50", "X-RateLimit-Reset": str(reset),
+    }))
+    assert client.rate_limit_delay() == 0.0
+    client._update_rate_limit(FakeResponse(200, headers={"X-RateLimit-Remaining": "5"}))
+    assert 15 < client.rate_limit_delay() <= 20
+    client._update_rate_limit(FakeResponse(200, headers={"X-RateLimit-Remaining": "0"}))
+    assert 90 < client.rate_limit_delay() <= 100
+
+
+def test_long_rate_limit_wait_fails_fast_as_retryable(monkeypatch):
+    client = EsaClient()
+    client._update_rate_limit(FakeResponse(200, headers={
+        "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(time.time() + 300),
+    }))
+    monkeypatch.setattr(client.session, "get", lambda *args, **kwargs: pytest.fail("上限を待たずに送信した"))
+    with pytest.raises(EsaError) as excinfo:
+        client.get_post_by_number(1)
+    assert excinfo.value.retryable and 290 < excinfo.value.retry_after <= 300
+    assert client.breaker.snapshot()["state"] == "closed"
@@ -0,0 +1,39 @@
+from bot.app.event_dedup import EventDeduplicator, event_dedup_keys
+
+
+def test_keys_cover_event_id_client_msg_id_and_channel_ts():
+    event = {"channel": "C1", "ts": "1000.0", "client_msg_id": "m-1"}
+    keys = event_dedup_keys("message", event, {"event_id": "Ev1"})
+    assert keys == ["message:id:Ev1", "message:msg:m-1", "message:ts:C1:1000.0"]
+    # 同じメッセージでもイベント種別が違えば別物
+    assert not set(keys) & set(event_dedup_keys("app_mention", event, {"event_id": "Ev1"}))
+
+
+def test_retry_with_same_event_is_duplicate():
+    dedup = EventDeduplicator(ttl=60, max_entries=100, path="")
+    event = {"channel": "C1", "ts": "1000.0"}
+    assert not dedup.is_duplicate(event_dedup_keys("message", event, {"event_id": "Ev1"}))
+    # Slackの再送は event_id が同じ
+    assert dedup.is_duplicate(event_dedup_keys("message", event, {"event_id": "Ev1"}))
+    # event_id が変わっても channel+ts が同じなら重複
+    assert dedup.is_duplicate(event_dedup_keys("message", event, {"event_id": "Ev2"}))
+    assert dedup.stats()["duplicates"] == 2
+
+
+def test_memory_bound_and_persistence(tmp_path):
+    path = str(tmp_path / "dedup.sqlite3")
+    dedup = EventDeduplicator(ttl=60, max_entries=2, path=path)
+    for i in range(5):
+        dedup.is_duplicate([f"k{i}"])
+    assert dedup.stats()["entries"] == 2
+    # メモリから追い出されても SQLite で検出できる
+    assert dedup.is_duplicate(["k0"])
+    # 再起動後も有効
+    assert EventDeduplicator(ttl=60, max_entries=2, path=path).is_duplicate(["k3"])
+
+
+def test_expired_keys_are_forgotten():
+    dedup = EventDeduplicator(ttl=60, max_entries=10, path="")
+    dedup.is_duplicate(["k"])
+    dedup._seen[next(iter(dedup._seen))] = 0
+    assert not dedup.is_duplicate(["k"])
@@ -0,0 +1,91 @@
+import threading
+
+from bot.app.gemini_client import GeminiClient, build_prompt
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class RecordingModel:
+    def __init__(self):
+        self.prompts = []
+        self.lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self.lock:
+            self.prompts.append(prompt)
+        return _Response(f"partial-{len(self.prompts)}")
+
+
+class _Usage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+
+
+class _Chunk:
+    def __init__(self, text, usage=None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class StreamingModel:
+    def generate_content(self, prompt, stream=False):
+        return iter([_Chunk("要約の"), _Chunk("前半", _Usage(120, 3)), _Chunk("後半", _Usage(120, 9))])
+
+
+def test_build_prompt_includes_options_and_body():
+    prompt = build_prompt("T", "本文 {braces}", "", "short", "paragraph")
+    assert "【タイトル】\nT" in prompt
+    assert "本文 {braces}" in prompt
+    assert "なし" in prompt
+    assert "段落形式" in prompt
+
+
+def test_short_body_uses_single_prompt():
+    client = GeminiClient()
+    client.model = RecordingModel()
+    client.map_reduce_threshold = 1000
+    assert client.summarize("T", "short body") == "partial-1"
+    assert len(client.model.prompts) == 1
+
+
+def test_long_body_is_mapped_then_reduced():
+    client = GeminiClient()
+    client.model = RecordingModel()
+    client.map_reduce_threshold = 100
+    client.chunk_size = 120
+    body = "\n".join(f"## Part {i}\n" + "x" * 80 for i in range(4))
+    client.summarize("T", body, "cat", "long", "bullet")
+    prompts = client.model.prompts
+    # 4チャンクの map と 1回の reduce
+    assert len(prompts) == 5
+    assert all("/4）" in p for p in prompts[:4])
+    assert "パート1/4" in prompts[-1] and "パート4/4" in prompts[-1]
+
+
+class JsonModel:
+    def __init__(self):
+        self.kwargs = None
+
+    def generate_content(self, prompt, **kwargs):
+        self.kwargs = kwargs
+        return _Response('[{"id": "d2", "summary": "B"}, {"id": "d1", "summary": "A"}]')
+
+
+def test_summarize_batch_splits_results_in_input_order():
+    client = GeminiClient()
+    client.model = JsonModel()
+    posts = [{"name": "a", "body_md": "aa"}, {"name": "b", "body_md": "bb"}, {"name": "c", "body_md": "cc"}]
+    assert client.summarize_batch(posts) == ["A", "B", None]
+    assert client.model.kwargs["generation_config"]["response_mime_type"] == "application/json"
+
+
+def test_summarize_stream_records_usage_from_last_chunk():
+    client = GeminiClient()
+    client.model = StreamingModel()
+    client.map_reduce_threshold = 1000
+    assert "".join(client.summarize_stream("T", "short body")) == "要約の前半後半"
+    assert client.usage() == {"prompt_tokens": 120, "output_tokens": 9}
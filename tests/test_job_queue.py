@@ -0,0 +1,54 @@
+import time
+
+from bot.app.job_queue import DONE, FAILED, PENDING, POSTING, JobQueue
+
+
+def test_job_survives_restart_and_keeps_deliveries(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(path=path, retry_delay=0)
+    job_id = queue.enqueue("auto_summary", {"url": "https://t.esa.io/posts/1"}, dedup_key="C1:1.0:1")
+    assert queue.enqueue("auto_summary", {"url": "https://t.esa.io/posts/1"}, dedup_key="C1:1.0:1") is None
+
+    job = queue.claim()
+    assert job.id == job_id and job.attempts == 1
+    assert queue.claim() is None
+    queue.advance(job.id, POSTING)
+    queue.record_delivery(job.id, "C2")
+    queue.close()
+
+    # 再起動: 処理中だったジョブは pending に戻り、投稿済みのチャンネルを引き継ぐ
+    restarted = JobQueue(path=path, retry_delay=0)
+    assert restarted.recover() == 1
+    resumed = restarted.claim()
+    assert resumed.id == job_id
+    assert resumed.payload == {"url": "https://t.esa.io/posts/1"}
+    assert resumed.delivered == ["C2"]
+    assert resumed.attempts == 2
+    restarted.complete(resumed.id)
+    assert restarted.counts()[DONE] == 1
+    assert restarted.claim() is None
+
+
+def test_failed_job_retries_until_max_attempts():
+    queue = JobQueue(path="", max_attempts=2, retry_delay=0)
+    job_id = queue.enqueue("auto_summary", {})
+
+    assert queue.fail(queue.claim().id, "503") is True
+    assert queue.get(job_id)["state"] == PENDING
+    assert queue.fail(queue.claim().id, "503") is False
+    assert queue.get(job_id)["state"] == FAILED
+    assert queue.get(job_id)["last_error"] == "503"
+
+    other = queue.enqueue("auto_summary", {})
+    assert queue.fail(queue.claim().id, "404", retry=False) is False
+    assert queue.get(other)["attempts"] == 1
+
+
+def test_claimed_job_reappears_after_visibility_timeout():
+    queue = JobQueue(path="", visibility_timeout=1.0)
+    job_id = queue.enqueue("auto_summary", {})
+    assert queue.claim().id == job_id
+    assert queue.ready_count() == 0
+    time.sleep(1.05)
+    assert queue.ready_count() == 1
+    assert queue.claim().attempts == 2
@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+from bot.app.lease import LeaseBackend, SqliteLeaseBackend, build_lease_backend
+
+
+class IncompleteBackend(LeaseBackend):
+    def acquire(self, key, owner, ttl):
+        return None
+
+
+def test_only_one_replica_holds_a_post_revision(tmp_path):
+    path = str(tmp_path / "leases.sqlite3")
+    replica_a, replica_b = SqliteLeaseBackend(path), SqliteLeaseBackend(path)
+    key = "esa:team:123:r4"
+
+    lease = replica_a.acquire(key, "a", ttl=60)
+    assert lease is not None and lease.token == 1
+    assert replica_b.acquire(key, "b", ttl=60) is None
+    assert replica_b.is_done(key) is False
+
+    assert replica_a.complete(lease) is True
+    assert replica_b.is_done(key) is True
+    assert replica_b.acquire(key, "b", ttl=60) is None
+    # 別の版は別のリース
+    assert replica_b.acquire("esa:team:123:r5", "b", ttl=60) is not None
+
+
+def test_expired_lease_is_fenced_off(tmp_path):
+    path = str(tmp_path / "leases.sqlite3")
+    replica_a, replica_b = SqliteLeaseBackend(path), SqliteLeaseBackend(path)
+    key = "esa:team:123:r4"
+
+    stale = replica_a.acquire(key, "a", ttl=0.05)
+    time.sleep(0.1)
+    fresh = replica_b.acquire(key, "b", ttl=60)
+    assert fresh.token == stale.token + 1
+
+    # 期限切れに気付かず動いていた持ち主は、延長・投稿・完了のどれもできない
+    assert replica_a.is_valid(stale) is False
+    assert replica_a.renew(stale, ttl=60) is None
+    assert replica_a.complete(stale) is False
+    assert replica_b.is_valid(fresh) is True
+
+
+def test_released_lease_can_be_taken_over(tmp_path):
+    backend = SqliteLeaseBackend(str(tmp_path / "leases.sqlite3"))
+    lease = backend.acquire("k", "a", ttl=60)
+    backend.release(lease)
+    assert backend.acquire("k", "b", ttl=60).token == 2
+
+
+def test_plugged_in_backend_must_implement_every_operation():
+    with pytest.raises(TypeError):
+        build_lease_backend(f"{__name__}:IncompleteBackend")
+    with pytest.raises(ValueError):
+        build_lease_backend("time:sleep")
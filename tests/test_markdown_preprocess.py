@@ -0,0 +1,52 @@
+from bot.app.markdown_preprocess import estimate_tokens, preprocess_markdown
+
+
+def test_removes_images_html_and_base64():
+    md = (
+        "本文 ![図1](https://img.esa.io/uploads/a.png) と ![](https://x/y.png)\n"
+        '<img src="https://x/z.png" width="300"> <span style="color:red">強調</span><br>次\n'
+        "<!-- メモ -->\n"
+        "data:image/png;base64," + "A" * 500 + "\n"
+    )
+    out, stats = preprocess_markdown(md)
+    assert "https://" not in out
+    assert "[画像: 図1]" in out
+    assert "強調" in out and "<span" not in out
+    assert "メモ" not in out
+    assert "AAAA" not in out and "[base64省略]" in out
+    assert stats.saved_chars > 0 and stats.saved_tokens > 0
+
+
+def test_caps_code_blocks_but_keeps_their_content_untouched():
+    code = "\n".join(f"    x = {i}  # <b>" for i in range(50))
+    out, _ = preprocess_markdown(f"```python\n{code}\n```\nafter", code_max_lines=5)
+    lines = out.splitlines()
+    assert lines[0] == "```python"
+    assert lines[1] == "    x = 0  # <b>"
+    assert "残り45行省略" in out
+    assert lines[-2] == "```" and lines[-1] == "after"
+
+
+def test_compacts_tables_and_whitespace():
+    rows = ["| 名前   |   値 |", "|:------|-----:|"] + [f"| item{i} |  {i} |" for i in range(10)]
+    md = "\n".join(rows) + "\n\n\n\n末尾     の文"
+    out, _ = preprocess_markdown(md, table_max_rows=3)
+    lines = out.splitlines()
+    assert lines[0] == "|名前|値|"
+    assert lines[1:4] == ["|item0|0|", "|item1|1|", "|item2|2|"]
+    assert "残り7行省略" in lines[4]
+    assert "\n\n\n" not in out
+    assert out.endswith("末尾 の文")
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd" * 10) == 10
+    assert estimate_tokens("日本語") == 3
+
+
+def test_keeps_inline_code_and_generics():
+    out, _ = preprocess_markdown("型は `List<String>` と `std::vector<int>` を使う。<b>注意</b>: Map<K, V> も同様")
+    assert out == "型は `List<String>` と `std::vector<int>` を使う。注意: Map<K, V> も同様"
+    # インラインコードの中の空白・画像記法も変えない
+    assert preprocess_markdown("``a  `<div>`  b`` と <div>本文</div>")[0] == "``a  `<div>`  b`` と 本文"
@@ -0,0 +1,26 @@
+from bot.app.markdown_sections import chunk_markdown, split_sections
+
+
+def test_split_sections_on_headings_outside_code():
+    md = "intro\n# A\nbody a\n```\n# not heading\n```\n## B\nbody b"
+    sections = split_sections(md)
+    assert [s.heading for s in sections] == ["", "A", "B"]
+    assert [s.level for s in sections] == [0, 1, 2]
+    assert "# not heading" in sections[1].text
+
+
+def test_chunk_markdown_respects_limit_and_keeps_content():
+    md = "\n".join(f"## Section {i}\n" + "text " * 40 for i in range(20))
+    chunks = chunk_markdown(md, 500)
+    assert len(chunks) > 1
+    assert all(len(c) <= 500 for c in chunks)
+    # 見出しの境界で切られている
+    assert all(c.startswith("## Section") for c in chunks)
+    assert "Section 19" in chunks[-1]
+
+
+def test_chunk_markdown_splits_oversized_section():
+    md = "# Huge\n" + "\n".join("line %d" % i for i in range(500))
+    chunks = chunk_markdown(md, 300)
+    assert all(len(c) <= 300 for c in chunks)
+    assert "line 499" in chunks[-1]
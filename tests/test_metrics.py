@@ -0,0 +1,88 @@
+import urllib.error
+import urllib.request
+
+from bot.app.metrics import MetricsRegistry, MetricsServer
+
+
+def test_renders_prometheus_text():
+    registry = MetricsRegistry(prefix="t_")
+    events = registry.counter("events_total", "events")
+    events.inc(type="message")
+    events.inc(2, type="message")
+    registry.gauge("queue_depth", "depth").set_function(lambda: 7)
+    latency = registry.histogram("stage_seconds", "latency", buckets=(0.1, 1.0))
+    latency.observe(0.05, stage="esa_fetch")
+    latency.observe(0.5, stage="esa_fetch")
+    text = registry.render()
+    assert "# TYPE t_events_total counter" in text
+    assert 't_events_total{type="message"} 3' in text
+    assert "t_queue_depth 7" in text
+    assert 't_stage_seconds_bucket{stage="esa_fetch",le="0.1"} 1' in text
+    assert 't_stage_seconds_bucket{stage="esa_fetch",le="1"} 2' in text
+    assert 't_stage_seconds_bucket{stage="esa_fetch",le="+Inf"} 2' in text
+    assert 't_stage_seconds_count{stage="esa_fetch"} 2' in text
+
+
+def test_step_records_duration_and_errors():
+    # debug_utils が記録するのと同じメトリクスを参照する
+    from bot.app.debug_utils import stage_errors, stage_seconds, step
+
+    before = stage_seconds.count(stage="test_stage")
+    with step("test_stage"):
+        pass
+    try:
+        with step("test_stage"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert stage_seconds.count(stage="test_stage") == before + 2
+    assert stage_errors.value(stage="test_stage") >= 1
+
+
+def test_health_endpoints_reflect_checks():
+    registry = MetricsRegistry(prefix="t_")
+    registry.counter("events_total", "events").inc()
+    state = {"ready": False}
+    server = MetricsServer(0, host="127.0.0.1", metrics_registry=registry,
+                           readiness=lambda: (state["ready"], "ok" if state["ready"] else "socket mode disconnected")).start()
+    base = f"http://127.0.0.1:{server.port}"
+    try:
+        assert urllib.request.urlopen(f"{base}/healthz").status == 200
+        try:
+            urllib.request.urlopen(f"{base}/readyz")
+            assert False, "not ready yet"
+        except urllib.error.HTTPError as e:
+            assert e.code == 503
+            assert b"socket mode disconnected" in e.read()
+        state["ready"] = True
+        assert urllib.request.urlopen(f"{base}/readyz").status == 200
+        assert b"t_events_total 1" in urllib.request.urlopen(f"{base}/metrics").read()
+    finally:
+        server.stop()
+
+
+def test_post_routes_share_the_port():
+    seen = {}
+
+    def handle(body, headers, query):
+        seen.update(body=body, signature=headers.get("X-Slack-Signature"), query=query)
+        return 200, {"Content-Type": "application/json"}, '{"ok": true}'
+
+    server = MetricsServer(0, host="127.0.0.1", metrics_registry=MetricsRegistry(prefix="t_"))
+    server.add_post_route("/slack/events", handle)
+    server.start()
+    try:
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{server.port}/slack/events?x=1", data=b'{"type":"event_callback"}',
+            headers={"X-Slack-Signature": "v0=abc"},
+        )
+        response = urllib.request.urlopen(request)
+        assert (response.status, response.read()) == (200, b'{"ok": true}')
+        assert seen == {"body": b'{"type":"event_callback"}', "signature": "v0=abc", "query": "x=1"}
+        try:
+            urllib.request.urlopen(urllib.request.Request(f"http://127.0.0.1:{server.port}/other", data=b"{}"))
+            assert False, "unknown route"
+        except urllib.error.HTTPError as e:
+            assert e.code == 404
+    finally:
+        server.stop()
@@ -0,0 +1,37 @@
+from bot.app.mrkdwn_renderer import MrkdwnRenderer, chunk_mrkdwn, normalize_numbering
+
+
+def test_renders_blocks_and_inline_in_one_pass():
+    out = MrkdwnRenderer().render("# **Title**\n- A **b**\n+ [link](https://x.y)\n__i__\n```\n**raw**\n```").text
+    assert out.splitlines() == ["*Title*", "• A *b*", "• <https://x.y|link>", "_i_", "```", "**raw**", "```"]
+
+
+def test_nested_lists_keep_depth():
+    out = MrkdwnRenderer().render("- a\n  - b\n    - c\n  - d\n- e").text
+    assert out.splitlines() == ["• a", "    ◦ b", "        ▪ c", "    ◦ d", "• e"]
+
+
+def test_tables_use_pluggable_renderer():
+    renderer = MrkdwnRenderer(table_renderer=lambda rows: [";".join(row) for row in rows])
+    out = renderer.render("| 名前 | 値 |\n|---|---:|\n| a | 1 |\n後").text
+    assert out.splitlines() == ["名前;値", "a;1", "後"]
+
+
+def test_custom_inline_rule():
+    renderer = MrkdwnRenderer()
+    renderer.add_inline_rule("strike", r"~~(.+?)~~", lambda m: f"~{m.group(1)}~", trigger="~~")
+    assert renderer.render("~~old~~ **new**").text == "~old~ *new*"
+
+
+def test_chunks_match_section_limit():
+    text = "\n".join(f"- item {i} " + "x" * 30 for i in range(200))
+    rendered = MrkdwnRenderer(chunk_size=500).render(text)
+    assert len(rendered.chunks) > 1
+    assert all(len(chunk) <= 500 for chunk in rendered.chunks)
+    assert "\n".join(rendered.chunks) == rendered.text
+    # 改行の無い長い行は上限で切る
+    assert [len(c) for c in chunk_mrkdwn("y" * 1200, 500)] == [500, 500, 200]
+
+
+def test_normalize_numbering():
+    assert normalize_numbering("\\1. a\n\\1. b\nc") == "1. a\n2. b\nc"
@@ -0,0 +1,65 @@
+import time
+
+from bot.app.rate_limiter import RateLimiter, TokenBucket
+from bot.app.slack_client import slack_bucket_name
+
+
+def test_bucket_allows_burst_then_paces():
+    bucket = TokenBucket("t", rate=20.0, capacity=2)
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+    assert 0.0 < bucket.wait_time() <= 0.05
+    start = time.monotonic()
+    waited = bucket.acquire()
+    assert waited > 0
+    assert time.monotonic() - start >= waited * 0.9
+    assert bucket.snapshot()["waits"] == 1
+
+
+def test_amount_larger_than_capacity_is_capped():
+    bucket = TokenBucket("tokens", rate=1000.0, capacity=10)
+    assert bucket.acquire(50) == 0.0
+    assert bucket.wait_time(1) > 0
+
+
+def test_limiter_templates_and_unknown_buckets():
+    limiter = RateLimiter()
+    limiter.add_template("slack.post", rate=1.0, capacity=1)
+    limiter.acquire("slack.post:C1")
+    # チャンネルごとに別バケット
+    assert limiter.wait_time("slack.post:C2") == 0.0
+    assert limiter.wait_time("slack.post:C1") > 0.5
+    # 未登録の名前は制限しない
+    assert limiter.acquire("unknown") == 0.0
+    assert set(limiter.snapshot()) == {"slack.post:C1", "slack.post:C2"}
+
+
+def test_bucket_gauges_follow_new_buckets():
+    from bot.app.metrics import MetricsRegistry
+
+    registry = MetricsRegistry(prefix="t_")
+    tokens = registry.gauge("rate_limit_tokens", "tokens")
+    wait = registry.gauge("rate_limit_wait_seconds", "wait")
+    limiter = RateLimiter()
+    limiter.add_bucket("esa", rate=1.0, capacity=2)
+    limiter.add_template("slack.post", rate=1.0, capacity=1)
+
+    def watch(bucket):
+        tokens.set_function(bucket.level, bucket=bucket.name)
+        wait.set_function(bucket.wait_time, bucket=bucket.name)
+
+    limiter.watch_buckets(watch)
+    limiter.acquire("esa")
+    # テンプレートから後で作られたバケットも公開される
+    limiter.acquire("slack.post:C1")
+    assert 0.9 <= tokens.value(bucket="esa") < 1.1
+    assert wait.value(bucket="esa") == 0.0
+    assert tokens.value(bucket="slack.post:C1") < 0.1
+    assert 0.9 < wait.value(bucket="slack.post:C1") <= 1.0
+    assert 't_rate_limit_wait_seconds{bucket="slack.post:C1"}' in registry.render()
+
+
+def test_slack_bucket_names():
+    assert slack_bucket_name("chat.postMessage", "C1") == "slack.post:C1"
+    assert slack_bucket_name("chat.update", "C1") == "slack.update"
+    assert slack_bucket_name("conversations.info", "C1") == "slack.web"
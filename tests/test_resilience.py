@@ -0,0 +1,176 @@
+import asyncio
+
+import pytest
+import requests
+
+from bot.app.esa_client import EsaClient
+from bot.app.gemini_client import GeminiClient
+from bot.app.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    EsaError,
+    GeminiError,
+    RetryPolicy,
+    call_with_retry,
+    call_with_retry_async,
+    classify_esa_error,
+    classify_gemini_error,
+)
+
+NO_WAIT = RetryPolicy(max_attempts=3, base_delay=0.0, max_delay=1.0)
+
+
+class StatusError(Exception):
+    def __init__(self, code):
+        super().__init__(f"status {code}")
+        self.code = code
+
+
+def test_retries_transient_errors_then_succeeds():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise StatusError(503)
+        return "ok"
+
+    assert call_with_retry(flaky, CircuitBreaker("t"), classify_gemini_error, NO_WAIT) == "ok"
+    assert len(calls) == 3
+
+
+def test_permanent_error_is_not_retried_and_typed():
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise StatusError(400)
+
+    with pytest.raises(GeminiError) as info:
+        call_with_retry(bad_request, CircuitBreaker("t"), classify_gemini_error, NO_WAIT)
+    assert not info.value.retryable and info.value.status == 400
+    assert len(calls) == 1
+
+
+def test_breaker_opens_and_fails_fast():
+    breaker = CircuitBreaker("t", failure_threshold=3, reset_timeout=60)
+    calls = []
+
+    def down():
+        calls.append(1)
+        raise StatusError(500)
+
+    with pytest.raises(GeminiError):
+        call_with_retry(down, breaker, classify_gemini_error, NO_WAIT)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        call_with_retry(down, breaker, classify_gemini_error, NO_WAIT)
+    # 遮断中は上流を呼ばない
+    assert len(calls) == 3
+
+
+def test_breaker_half_open_recovers():
+    breaker = CircuitBreaker("t", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()  # 試行中は1件だけ
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_trial_releases_half_open_breaker():
+    breaker = CircuitBreaker("t", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+
+    async def cancelled():
+        raise asyncio.CancelledError()
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(call_with_retry_async(cancelled, breaker, classify_gemini_error, NO_WAIT))
+
+    def interrupted():
+        raise KeyboardInterrupt()
+
+    with pytest.raises(KeyboardInterrupt):
+        call_with_retry(interrupted, breaker, classify_gemini_error, NO_WAIT)
+    # 試行が返されているので、次の呼び出しが試行して復帰できる
+    assert call_with_retry(lambda: "ok", breaker, classify_gemini_error, NO_WAIT) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_gemini_retry_after_is_parsed():
+    response = requests.Response()
+    response.headers["Retry-After"] = "7"
+    error = StatusError(429)
+    error.response = response
+    assert classify_gemini_error(error).retry_after == 7.0
+
+    class Duration:
+        seconds, nanos = 3, 500_000_000
+
+    class RetryInfo:
+        retry_delay = Duration()
+
+    error = StatusError(429)
+    error.details = [RetryInfo()]
+    classified = classify_gemini_error(error)
+    assert classified.retryable and classified.retry_after == 3.5
+    assert classify_gemini_error(StatusError(503)).retry_after is None
+
+
+def test_retry_after_is_honored_and_long_waits_give_up():
+    policy = RetryPolicy(max_attempts=3, base_delay=0.0, max_delay=5.0)
+    assert policy.delay(1, retry_after=2.0) == 2.0
+    response = requests.Response()
+    response.status_code = 429
+    response.headers["Retry-After"] = "600"
+    error = classify_esa_error(requests.exceptions.HTTPError(response=response))
+    assert error.retryable and error.retry_after == 600.0
+    calls = []
+
+    def limited():
+        calls.append(1)
+        raise error
+
+    with pytest.raises(EsaError):
+        call_with_retry(limited, CircuitBreaker("t"), classify_esa_error, policy)
+    assert len(calls) == 1
+
+
+class _Response:
+    def __init__(self, status_code, json_data=None):
+        self.status_code = status_code
+        self._json = json_data
+        self.headers = {}
+
+    def json(self):
+        return self._json
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code}", response=self)
+
+
+def test_esa_client_retries_and_returns_none_for_missing_post(monkeypatch):
+    client = EsaClient(breaker=CircuitBreaker("esa"), retry_policy=NO_WAIT)
+    responses = [_Response(502), _Response(200, {"number": 1}), _Response(404)]
+    monkeypatch.setattr(client.session, "get", lambda url, headers=None, timeout=None: responses.pop(0))
+    assert client.get_post_by_number(1) == {"number": 1}
+    assert client.get_post_by_number(2) is None
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_gemini_summarize_raises_typed_error():
+    class DownModel:
+        def generate_content(self, prompt):
+            raise StatusError(503)
+
+    client = GeminiClient(breaker=CircuitBreaker("gemini"), retry_policy=NO_WAIT)
+    client.model = DownModel()
+    # gemini_client は app.resilience 経由で読み込まれるためクラス名で確認する
+    with pytest.raises(Exception) as info:
+        client.summarize("T", "body")
+    assert type(info.value).__name__ == GeminiError.__name__
+    assert info.value.retryable
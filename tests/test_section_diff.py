@@ -0,0 +1,55 @@
+from bot.app.gemini_client import build_incremental_prompt
+from bot.app.post_snapshots import FULL, INCREMENTAL, TRIVIAL, UNCHANGED, PostSnapshot, PostSnapshotStore, plan_update
+from bot.app.section_diff import ADDED, MODIFIED, REMOVED, diff_sections
+
+BODY = """# 背景
+既存手法は長文で精度が落ちる。
+
+# 手法
+チャンクごとに要約して統合する。
+
+# 結果
+ROUGE-L が 3.2 ポイント向上した。
+"""
+
+
+def test_diff_sections_reports_changed_sections_only():
+    edited = BODY.replace("3.2 ポイント", "4.1 ポイント").replace("# 背景\n", "# 背景\n\n") + "\n# 今後の課題\n多言語で評価する。\n"
+    edited = edited.replace("# 手法\nチャンクごとに要約して統合する。\n\n", "")
+
+    diff = diff_sections(BODY, edited)
+    assert [(c.kind, c.heading) for c in diff.changes] == [(REMOVED, "手法"), (MODIFIED, "結果"), (ADDED, "今後の課題")]
+    assert diff.changes[1].old_text.strip().endswith("3.2 ポイント向上した。")
+    # 空行の追加は変更に数えない
+    assert diff_sections(BODY, BODY.replace("\n\n", "\n\n\n")).changes == []
+    assert 0 < diff.ratio < 1
+
+
+def test_plan_update_skips_trivial_edits_and_limits_chains():
+    snapshot = PostSnapshot("r1", BODY, "- 要約", 0)
+    assert plan_update(None, "r1", BODY).mode == FULL
+    assert plan_update(snapshot, "r1", BODY).mode == UNCHANGED
+    # 短い記事では1行の修正でも割合が大きいので要約し直す
+    assert plan_update(snapshot, "r2", BODY.replace("3.2", "3.3")).mode == INCREMENTAL
+    long_body = BODY + "\n# 詳細\n" + "実験はすべて同じ乱数シードで3回ずつ行い、平均値を報告する。\n" * 50
+    assert plan_update(snapshot._replace(body=long_body), "r2", long_body.replace("3.2", "3.3")).mode == TRIVIAL
+
+    long_snapshot = snapshot._replace(body=long_body)
+    edited = long_body + "\n# 考察\n" + "分割の粒度を見出し単位にしたことで文脈の欠落が減った。" * 3 + "\n"
+    plan = plan_update(long_snapshot, "r2", edited)
+    assert plan.mode == INCREMENTAL
+    assert [c.kind for c in plan.diff.changes] == [ADDED]
+    assert plan_update(long_snapshot._replace(increments=5), "r2", edited, max_chain=5).mode == FULL
+    assert plan_update(snapshot, "r2", "# 全面改稿\n" + "別の内容。" * 100).mode == FULL
+
+    prompt = build_incremental_prompt("タイトル", "- 要約", plan.diff.changes)
+    assert "[追加] 考察" in prompt and "- 要約" in prompt and "ROUGE-L" not in prompt
+
+
+def test_snapshot_store_persists_latest_snapshot(tmp_path):
+    path = str(tmp_path / "snapshots.sqlite3")
+    store = PostSnapshotStore(path=path)
+    store.set("k", PostSnapshot("r1", BODY, "- 要約", 0))
+    store.set("k", PostSnapshot("r2", BODY, "- 要約2", 1))
+    assert PostSnapshotStore(path=path).get("k") == PostSnapshot("r2", BODY, "- 要約2", 1)
+    assert store.get("missing") is None
@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+
+from bot.app.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    sf = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    executions = []
+    results = []
+
+    def work():
+        executions.append(1)
+        started.set()
+        release.wait(5)
+        return "summary"
+
+    leader = threading.Thread(target=lambda: results.append(sf.do(("1", "medium"), work)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(sf.do(("1", "medium"), work))) for _ in range(3)]
+    for t in followers:
+        t.start()
+    while sf._calls[("1", "medium")].waiters < 3:
+        pass
+    release.set()
+    for t in [leader, *followers]:
+        t.join(5)
+
+    assert results == ["summary"] * 4
+    assert len(executions) == 1
+    assert sf.stats() == {"calls": 4, "executions": 1, "coalesced": 3, "in_flight": 0}
+
+
+def test_errors_are_propagated_and_key_released():
+    sf = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        sf.do("k", fail)
+    assert sf.do("k", lambda: 42) == 42
+    assert sf.executions == 2
@@ -0,0 +1,161 @@
+import os
+import threading
+
+import pytest
+
+from bot.app.gemini_client import GeminiClient
+from bot.app.job_queue import DONE, POSTING, JobQueue
+from bot.app.lease import SqliteLeaseBackend
+from bot.app.post_snapshots import PostSnapshotStore
+from bot.app.resilience import CircuitBreaker
+from bot.app.slack_handler import AUTO_SUMMARY_JOB, SlackBot, registry
+from bot.app.summary_cache import SummaryCache
+
+URL = "https://t.esa.io/posts/1"
+
+
+class FakeEsa:
+    def __init__(self, body="# 概要\n研究の内容\n# 結果\n精度が上がった", revision=1, barrier=None):
+        self.post = {"number": 1, "name": "週報", "body_md": body, "revision_number": revision, "url": URL}
+        self.barrier = barrier
+
+    def extract_post_number_from_url(self, url):
+        return int(url.rsplit("/", 1)[1])
+
+    def get_post_from_url(self, url):
+        if self.barrier is not None:
+            # 両方のインスタンスが記事を取得し終えてから、同時にリースを取り合う
+            self.barrier.wait(timeout=5)
+        return dict(self.post)
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class RecordingModel:
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return _Response(f"- 要約{len(self.prompts)}")
+
+
+class FakeSlack:
+    def __init__(self, down=()):
+        self.down = set(down)
+        self.posted = []
+        self.lock = threading.Lock()
+
+    def chat_postMessage(self, channel, **payload):
+        if channel in self.down:
+            raise ValueError("channel_not_found")
+        with self.lock:
+            self.posted.append(channel)
+        return {"ok": True, "channel": channel, "ts": f"{len(self.posted)}.0"}
+
+
+@pytest.fixture
+def make_bot(monkeypatch):
+    os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-test")
+    os.environ.setdefault("SLACK_APP_TOKEN", "xapp-test")
+    monkeypatch.setattr("bot.app.slack_handler.ESA_SUMMARY_CHANNEL_IDS", ["C1", "C2"])
+
+    def make(esa, job_queue=None, leases=None):
+        """上流をフェイクに差し替えた SlackBot（別々に作ったものは別のインスタンスとして動く）"""
+        bot = SlackBot()
+        bot.esa_client = esa
+        bot.gemini_client = GeminiClient(breaker=CircuitBreaker("gemini"))
+        bot.gemini_client.model = RecordingModel()
+        bot.summary_cache = SummaryCache(path="")
+        bot.post_snapshots = PostSnapshotStore(path="")
+        bot.summary_batcher = None
+        bot.breakers = dict(bot.breakers, slack=CircuitBreaker("slack"))
+        if job_queue is not None:
+            bot.job_queue = job_queue
+        if leases is not None:
+            bot.leases = leases
+        return bot
+
+    return make
+
+
+def test_job_resumes_after_restart_without_reposting(tmp_path, make_bot):
+    path = str(tmp_path / "jobs.sqlite3")
+    esa, slack = FakeEsa(), FakeSlack(down={"C2"})
+    first = make_bot(esa, JobQueue(path=path, retry_delay=0))
+    job_id = first.job_queue.enqueue(AUTO_SUMMARY_JOB, {"url": URL, "channel": "C0"})
+
+    # 停止処理中に C2 への投稿が失敗した（ジョブは投稿中のまま次の起動に持ち越される）
+    first._draining = True
+    first._process_auto_summary(URL, slack, "C0", job=first.job_queue.claim())
+    assert slack.posted == ["C1"]
+    assert first.job_queue.get(job_id)["state"] == POSTING
+    first.job_queue.close()
+
+    # 再起動: 起動時の recover() でジョブが再開待ちに戻り、C1 には投稿し直さない
+    restarted = make_bot(esa, JobQueue(path=path, retry_delay=0))
+    assert restarted.job_queue.recover() == 1
+    slack.down.clear()
+    job = restarted.job_queue.claim()
+    assert job.id == job_id and job.delivered == ["C1"]
+    restarted._process_auto_summary(URL, slack, "C0", job=job)
+    assert slack.posted == ["C1", "C2"]
+    assert restarted.job_queue.get(job_id)["state"] == DONE
+
+
+def test_two_bots_sharing_a_lease_file_post_once(tmp_path, make_bot):
+    path = str(tmp_path / "leases.sqlite3")
+    esa, slack = FakeEsa(barrier=threading.Barrier(2)), FakeSlack()
+    # 同じリースのファイルを別々の接続で開く（同じホストの2プロセスに相当）
+    bots = [make_bot(esa, leases=SqliteLeaseBackend(path=path)) for _ in range(2)]
+
+    threads = [threading.Thread(target=bot._process_auto_summary, args=(URL, slack, "C0")) for bot in bots]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    # リースを取れた1つだけが要約して全チャンネルに投稿し、もう1つは Gemini を呼ばずにスキップする
+    assert sorted(len(bot.gemini_client.model.prompts) for bot in bots) == [0, 1]
+    assert sorted(slack.posted) == ["C1", "C2"]
+    assert bots[0].leases.is_done(bots[0]._lease_key(esa.post))
+
+
+def _sections(**texts):
+    return "\n".join(f"# {name}\n{text}" for name, text in texts.items())
+
+
+def test_edits_are_skipped_or_summarized_from_the_changed_sections(make_bot):
+    texts = {name: "\n".join(f"{name}-original の内容です（{i}）。" for i in range(8))
+             for name in ("Alpha", "Beta", "Gamma", "Delta", "Epsilon")}
+    esa, slack = FakeEsa(body=_sections(**texts)), FakeSlack()
+    bot = make_bot(esa)
+    prompts = bot.gemini_client.model.prompts
+    bot._process_auto_summary(URL, slack, "C0")
+    assert len(prompts) == 1 and sorted(slack.posted) == ["C1", "C2"]
+    snapshot_key = bot._snapshot_key(esa.post, "medium", "bullet")
+
+    # 軽微な編集: Gemini を呼ばず、投稿もしない
+    esa.post.update(revision_number=2, body_md=_sections(**dict(texts, Beta=texts["Beta"].replace("内容", "中身", 1))))
+    bot._process_auto_summary(URL, slack, "C0")
+    assert len(prompts) == 1 and sorted(slack.posted) == ["C1", "C2"]
+
+    # 1セクションの書き換え: 変更されたセクションと前回の要約だけから要約し直す
+    esa.post.update(revision_number=3, body_md=_sections(**dict(texts, Gamma="\n".join(f"Gamma-rewritten の結果です（{i}）。" for i in range(8)))))
+    bot._process_auto_summary(URL, slack, "C0")
+    assert len(prompts) == 2 and sorted(slack.posted) == ["C1", "C1", "C2", "C2"]
+    assert "Gamma-rewritten" in prompts[1] and "- 要約1" in prompts[1]
+    assert not any(f"{name}-original" in prompts[1] for name in ("Alpha", "Beta", "Delta", "Epsilon"))
+    assert bot.post_snapshots.get(snapshot_key).increments == 1
+
+
+def test_rate_limit_buckets_are_exported(make_bot):
+    bot = make_bot(FakeEsa())
+    # チャンネルごとのバケットは Bot の起動後に作られても公開される
+    bot.rate_limiter.acquire("slack.post:CMETRICS")
+    text = registry.render()
+    assert 'esa_summarizer_rate_limit_tokens{bucket="slack.post:CMETRICS"}' in text
+    assert 'esa_summarizer_rate_limit_wait_seconds{bucket="gemini.requests"}' in text
@@ -0,0 +1,42 @@
+from slack_sdk.errors import SlackApiError
+
+from bot.app.slack_stream import StreamingMessage
+
+
+class FakeClient:
+    def __init__(self, fail_with=None):
+        self.updates = []
+        self.fail_with = fail_with
+
+    def chat_postMessage(self, **kwargs):
+        return {"channel": kwargs["channel"], "ts": "1.0"}
+
+    def chat_update(self, **kwargs):
+        if self.fail_with:
+            error, self.fail_with = self.fail_with, None
+            raise error
+        self.updates.append(kwargs)
+
+
+class RateLimitedResponse(dict):
+    headers = {"Retry-After": "30"}
+
+
+def test_updates_are_throttled_but_finish_always_applies():
+    client = FakeClient()
+    message = StreamingMessage.post(client, "C1", "placeholder", interval=60)
+    assert message.update("first")
+    assert not message.update("second")  # 間隔内は更新しない
+    message._next_update_at = 0
+    assert message.finish(text="final", blocks=[])
+    assert [u["text"] for u in client.updates] == ["first", "final"]
+    assert client.updates[-1]["blocks"] == []
+
+
+def test_ratelimited_update_backs_off_for_retry_after():
+    error = SlackApiError("ratelimited", RateLimitedResponse(error="ratelimited"))
+    client = FakeClient(fail_with=error)
+    message = StreamingMessage(client, "C1", "1.0", interval=0)
+    assert not message.update("partial")
+    assert not message.due()
+    assert client.updates == []
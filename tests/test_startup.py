@@ -0,0 +1,67 @@
+from slack_bolt import App
+from slack_bolt.request import BoltRequest
+from slack_sdk import WebClient
+
+from bot.app.startup import AuthCache, CachedAuthorize, StartupTimer, _auth_response
+
+
+class FakeAuthClient(WebClient):
+    def __init__(self, token):
+        super().__init__(token=token)
+        self.calls = 0
+
+    def auth_test(self, **kwargs):
+        self.calls += 1
+        return _auth_response(self, {"ok": True, "user_id": "UBOT", "team_id": "T1", "bot_id": "B1"}, "chat:write")
+
+
+def test_auth_cache_reuses_result_per_token(tmp_path):
+    cache = AuthCache(path=str(tmp_path / "auth.json"), ttl=60)
+    client = FakeAuthClient("xoxb-first")
+
+    first, first_cached = cache.auth_test(client)
+    second, second_cached = cache.auth_test(client)
+    assert (first_cached, second_cached) == (False, True)
+    assert second.get("user_id") == "UBOT"
+    assert second.headers.get("x-oauth-scopes") == "chat:write"
+    assert client.calls == 1
+
+    # トークンが変われば保存済みの結果は使わない
+    other = FakeAuthClient("xoxb-second")
+    assert cache.auth_test(other)[1] is False
+    assert other.calls == 1
+
+    # 有効期限切れなら呼び直す
+    assert AuthCache(path=cache.path, ttl=0).load(client) is None
+
+
+def test_cached_authorize_calls_auth_test_once():
+    client = FakeAuthClient("xoxb-first")
+    authorization = CachedAuthorize(lambda: authorization.set(client.token, client.auth_test()))
+    app = App(client=client, signing_secret="secret", authorize=authorization, process_before_response=True)
+    seen = []
+
+    @app.event("app_mention")
+    def handle(context):
+        seen.append((context.bot_user_id, context.bot_token))
+
+    body = {"type": "event_callback", "team_id": "T1", "api_app_id": "A1",
+            "event": {"type": "app_mention", "user": "U1", "text": "<@UBOT> hi", "channel": "C1", "ts": "1.0"}}
+    assert client.calls == 0
+    # 起動時に取得できていなければ最初のイベントで1回だけ取得し、以降は使い回す
+    for _ in range(2):
+        app.dispatch(BoltRequest(body=body, mode="socket_mode"))
+    assert seen == [("UBOT", "xoxb-first")] * 2
+    assert client.calls == 1
+
+
+def test_startup_timer_records_phases():
+    timer = StartupTimer(started_at=0.0)
+    timer.reset(timer.started_at)
+    timer.mark("import")
+    with timer.phase("auth"):
+        pass
+    timer.ready()
+    snapshot = timer.snapshot()
+    assert list(snapshot) == ["import", "auth", "total"]
+    assert "import" in timer.summary()
@@ -0,0 +1,49 @@
+import threading
+
+from bot.app.summary_batcher import SummaryBatcher
+
+
+def _post(n, size=10):
+    return {"number": n, "name": f"post{n}", "body_md": "x" * size}
+
+
+def test_posts_within_window_are_summarized_in_one_call():
+    calls = []
+
+    def summarize_batch(posts, length, style):
+        calls.append([p["number"] for p in posts])
+        return [f"summary{p['number']}" for p in posts]
+
+    batcher = SummaryBatcher(summarize_batch, window=0.2, max_posts=10, max_chars=1000)
+    futures = [batcher.submit(_post(i), "medium", "bullet") for i in range(3)]
+    assert [f.result(timeout=5) for f in futures] == ["summary0", "summary1", "summary2"]
+    assert calls == [[0, 1, 2]]
+    batcher.close()
+
+
+def test_size_budget_and_max_posts_split_batches():
+    calls = []
+    lock = threading.Lock()
+
+    def summarize_batch(posts, length, style):
+        with lock:
+            calls.append(sorted(p["number"] for p in posts))
+        return [None] * len(posts)
+
+    batcher = SummaryBatcher(summarize_batch, window=0.2, max_posts=2, max_chars=25)
+    futures = [batcher.submit(_post(i), "medium", "bullet") for i in range(4)]
+    # 上限で区切られ、応答に無い記事は None（個別要約にフォールバック）
+    assert [f.result(timeout=5) for f in futures] == [None] * 4
+    assert sorted(calls) == [[0, 1], [2, 3]]
+    batcher.close()
+
+
+def test_single_post_and_failures_fall_back_to_individual_summaries():
+    def failing(posts, length, style):
+        raise RuntimeError("boom")
+
+    batcher = SummaryBatcher(failing, window=0.05, max_posts=5, max_chars=1000)
+    assert batcher.submit(_post(1), "medium", "bullet").result(timeout=5) is None
+    futures = [batcher.submit(_post(i), "short", "bullet") for i in range(2)]
+    assert [f.result(timeout=5) for f in futures] == [None, None]
+    batcher.close()
@@ -0,0 +1,48 @@
+import time
+
+from bot.app.summary_cache import SummaryCache, make_cache_key, post_revision
+
+
+def test_cache_key_depends_on_every_component():
+    base = make_cache_key(1, "r3", "medium", "bullet", "model-a", "v1")
+    assert base == make_cache_key(1, "r3", "medium", "bullet", "model-a", "v1")
+    assert base != make_cache_key(2, "r3", "medium", "bullet", "model-a", "v1")
+    assert base != make_cache_key(1, "r4", "medium", "bullet", "model-a", "v1")
+    assert base != make_cache_key(1, "r3", "short", "bullet", "model-a", "v1")
+    assert base != make_cache_key(1, "r3", "medium", "paragraph", "model-a", "v1")
+    assert base != make_cache_key(1, "r3", "medium", "bullet", "model-b", "v1")
+    assert base != make_cache_key(1, "r3", "medium", "bullet", "model-a", "v2")
+
+
+def test_post_revision_prefers_revision_number():
+    assert post_revision({"revision_number": 5, "updated_at": "2025-01-01"}) == "r5"
+    assert post_revision({"updated_at": "2025-01-01"}) == "2025-01-01"
+
+
+def test_memory_and_disk_tiers(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SummaryCache(path=path, ttl=3600, memory_size=1, max_entries=10)
+    assert cache.get("a") is None
+    cache.set("a", "summary A")
+    assert cache.get("a") == "summary A"
+    assert cache.memory_hits == 1
+
+    # 別インスタンス（再起動相当）ではディスク層から読める
+    reopened = SummaryCache(path=path, ttl=3600, memory_size=1, max_entries=10)
+    assert reopened.get("a") == "summary A"
+    assert reopened.disk_hits == 1
+    assert reopened.stats()["misses"] == 0
+
+
+def test_ttl_and_size_eviction(tmp_path):
+    cache = SummaryCache(path=str(tmp_path / "cache.sqlite3"), ttl=1, memory_size=2, max_entries=2)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    cache.set("c", "C")
+    # ディスク層は2件まで（最も古い a が削除される）
+    assert cache._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0] == 2
+    assert cache.get("a") is None
+
+    cache._memory["b"] = (time.time() - 10, "B")
+    cache._conn.execute("UPDATE summaries SET created_at = ?", (time.time() - 10,))
+    assert cache.get("b") is None
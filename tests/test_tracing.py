@@ -0,0 +1,71 @@
+import json
+import threading
+
+from bot.app.tracing import TraceExporter, Tracer, current_trace_id, in_current_context, otlp_payload, set_attributes
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+def test_spans_nest_and_follow_work_to_other_threads():
+    exporter = ListExporter()
+    tracer = Tracer(exporter)
+    seen = {}
+
+    def job():
+        seen["trace_id"] = current_trace_id()
+        with tracer.span("esa.get_post", post_number=241):
+            set_attributes(body_length=9442)
+
+    with tracer.start_trace("slack.message", channel="C1") as root:
+        thread = threading.Thread(target=in_current_context(job))
+        thread.start()
+        thread.join()
+    assert current_trace_id() == "-"
+    assert seen["trace_id"] == root.trace_id
+    child = next(s for s in exporter.spans if s.name == "esa.get_post")
+    assert child.trace_id == root.trace_id and child.parent_id == root.span_id
+    assert child.attributes == {"post_number": 241, "body_length": 9442}
+
+
+def test_errors_mark_span_and_sampling_skips_export():
+    exporter = ListExporter()
+    tracer = Tracer(exporter)
+    try:
+        with tracer.start_trace("job"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert exporter.spans[0].status == 2
+    assert "boom" in exporter.spans[0].status_message
+
+    unsampled = Tracer(exporter, sample_rate=0.0)
+    with unsampled.start_trace("job") as span:
+        with unsampled.span("child") as child:
+            assert child.trace_id == span.trace_id
+    assert len(exporter.spans) == 1
+
+
+def test_exports_otlp_json_lines(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = TraceExporter(path=str(path), interval=60)
+    tracer = Tracer(exporter)
+    with tracer.start_trace("slack.message"):
+        with tracer.span("gemini.generate_content", prompt_tokens=1200, cache_hit=False, ratio=0.5):
+            pass
+    exporter.shutdown()
+    payload = json.loads(path.read_text(encoding="utf-8").splitlines()[0])
+    resource = payload["resourceSpans"][0]
+    assert resource["resource"]["attributes"][0]["key"] == "service.name"
+    spans = {s["name"]: s for s in resource["scopeSpans"][0]["spans"]}
+    child = spans["gemini.generate_content"]
+    assert len(child["traceId"]) == 32 and len(child["spanId"]) == 16
+    assert child["parentSpanId"] == spans["slack.message"]["spanId"]
+    assert {"key": "prompt_tokens", "value": {"intValue": "1200"}} in child["attributes"]
+    assert {"key": "cache_hit", "value": {"boolValue": False}} in child["attributes"]
+    assert otlp_payload([])["resourceSpans"][0]["scopeSpans"][0]["spans"] == []
@@ -0,0 +1,43 @@
+import json
+import os
+
+from bot.app.url_extractor import extract_esa_posts, scan_event
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "fixtures", "esa_notifications.json")
+
+
+def test_extracts_and_normalizes_post_urls():
+    posts = extract_esa_posts(
+        "<https://team.esa.io/posts/241/revisions/79/diff|title> and https://team.esa.io/posts/241 "
+        "and (https://other.esa.io/posts/7) https://example.com/posts/1"
+    )
+    assert [(p.team, p.number, p.url) for p in posts] == [
+        ("team", 241, "https://team.esa.io/posts/241"),
+        ("other", 7, "https://other.esa.io/posts/7"),
+    ]
+
+
+def test_scan_event_walks_text_blocks_and_attachments_once():
+    event = {
+        "text": "",
+        "blocks": [
+            {"type": "rich_text", "elements": [{"type": "rich_text_section", "elements": [
+                {"type": "text", "text": "公開: "},
+                {"type": "link", "url": "https://team.esa.io/posts/5"},
+            ]}]},
+        ],
+        "attachments": [{"title_link": "https://team.esa.io/posts/6#comment-1", "fallback": "https://team.esa.io/posts/5"}],
+    }
+    scan = scan_event(event)
+    assert scan.block_text == "公開:  https://team.esa.io/posts/5"
+    assert [p.number for p in scan.posts] == [5, 6]
+
+
+def test_notification_corpus():
+    with open(FIXTURES, encoding="utf-8") as f:
+        events = json.load(f)
+    numbers = [[p.number for p in scan_event(e).posts] for e in events]
+    assert numbers[0] == [241]
+    assert numbers[5] == [12, 13, 14]
+    # 人間の発言や他アプリの通知からは拾わない
+    assert numbers[6] == numbers[7] == numbers[9] == []
@@ -0,0 +1,51 @@
+import threading
+import time
+
+from bot.app.worker_pool import WorkerPool
+
+
+def test_submit_returns_immediately_and_runs_in_background():
+    pool = WorkerPool(workers=2, queue_size=10)
+    release = threading.Event()
+    done = []
+
+    def slow_job(n):
+        release.wait(5)
+        done.append(n)
+
+    start = time.monotonic()
+    assert pool.submit(slow_job, 1)
+    assert pool.submit(slow_job, 2)
+    # 投入は処理の完了を待たない
+    assert time.monotonic() - start < 0.5
+    release.set()
+    assert pool.shutdown(timeout=5)
+    assert sorted(done) == [1, 2]
+
+
+def test_submit_rejects_when_queue_full():
+    pool = WorkerPool(workers=1, queue_size=1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocking_job():
+        started.set()
+        release.wait(5)
+
+    assert pool.submit(blocking_job)
+    started.wait(5)
+    assert pool.submit(blocking_job)  # キューで待機
+    assert not pool.submit(blocking_job)  # 満杯
+    assert pool.rejected == 1
+    release.set()
+    assert pool.shutdown(timeout=5)
+
+
+def test_shutdown_drains_queue_and_stops_accepting():
+    pool = WorkerPool(workers=1, queue_size=10)
+    done = []
+    for i in range(5):
+        pool.submit(lambda i=i: done.append(i))
+    assert pool.shutdown(timeout=5)
+    assert done == [0, 1, 2, 3, 4]
+    assert not pool.submit(lambda: None)